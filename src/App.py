@@ -1,6 +1,8 @@
+import atexit
 import pyxel
 from scene import Scene, StartScene, init_sound
 from global_state import GlobalState
+from maze_pool import MazePool
 
 class App:
     """
@@ -16,18 +18,33 @@ class App:
         __init__(): コンストラクタ。
         update(): ゲームの状態更新。
         draw(): 画面の描画。
+        quit(): 迷路のプールと準備用のワーカースレッドを終了してアプリケーションを終了する。
     """
     def __init__(self, width, height):
         self.width = width
         self.height = height
-        self.global_state = GlobalState()
-        pyxel.init(width, height, title="3D Maze")
+        # 次に遊ぶ迷路はバックグラウンドのプロセスで事前に生成しておく
+        self.global_state = GlobalState(maze_pool=MazePool())
+        # 例外などでpyxelの外から終了する場合も、生成中のワーカープロセスと準備中の迷路を待たずに止める
+        atexit.register(self.global_state.shutdown)
+        # ESCキーでの終了もquit()を通すため、pyxelの終了キーは使わない
+        pyxel.init(width, height, title="3D Maze", quit_key=pyxel.KEY_NONE)
         init_sound()
         self.scene:Scene = StartScene(self.global_state)
         pyxel.run(self.update, self.draw)
 
     def update(self):
+        if pyxel.btnp(pyxel.KEY_ESCAPE):
+            self.quit()
         self.scene = self.scene.update()
+        if self.scene is None:
+            # GameSceneでQキーが押された
+            self.quit()
+
+    def quit(self):
+        """迷路のプールと次の迷路を準備するワーカースレッドを終了してから、アプリケーションを終了する"""
+        self.global_state.shutdown()
+        pyxel.quit()
 
     def draw(self):
         self.scene.draw()
@@ -0,0 +1,125 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from global_state import GlobalState
+from maze_env import Action, MazeEnv, MazeVecEnv
+from maze_generator import BATCH_ALGORITHMS, MazeAlgorithm, MazeGenerator, generate_maze_batch
+from scene import GameScene
+
+# リスタートの計測で想定する、スコア画面を表示している秒数
+SCORE_SCREEN_SECONDS = 1.0
+# まとめて生成する計測で、1回に生成する迷路のマス数の合計の目安
+BATCH_CELLS = 1 << 24
+# 環境の計測で進めるステップ数と、ベクトル版の環境の数の上限
+ENV_STEPS = 2000
+VEC_ENVS = 1024
+
+def measure(function, repeat: int) -> float:
+    """functionをrepeat回実行し、最も速かった回の秒数を返す"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def benchmark_generation(sizes: list[int], repeat: int):
+    """迷路の大きさごとに、各アルゴリズムの生成時間とスループット（マス/秒）を表示する"""
+    print(f"{'size':>6} {'algorithm':>12} {'seconds':>9} {'Mcells/s':>9}")
+    for size in sizes:
+        for algorithm in MazeAlgorithm:
+            seconds = measure(lambda: MazeGenerator(size, size).generate_grid(seed=0, algorithm=algorithm),
+                              repeat)
+            print(f"{size:>6} {algorithm.value:>12} {seconds:>9.4f} {size * size / seconds / 1e6:>9.2f}")
+
+def benchmark_batch(sizes: list[int], repeat: int):
+    """
+    迷路の大きさごとに、generate_maze_batch()でまとめて生成した場合と
+    MazeGenerator.generate()をループで呼んだ場合の1秒あたりの迷路数を表示する
+    """
+    print(f"{'size':>6} {'algorithm':>12} {'count':>7} {'batch/s':>10} {'loop/s':>10}")
+    for size in sizes:
+        count = max(1, BATCH_CELLS // (size * size))
+        loop_count = min(count, 100)
+        for algorithm in BATCH_ALGORITHMS:
+            batch = measure(lambda: generate_maze_batch(count, size, size, seed=0, algorithm=algorithm), repeat)
+            loop = measure(lambda: [MazeGenerator(size, size).generate(seed=i, algorithm=algorithm)
+                                    for i in range(loop_count)], repeat)
+            print(f"{size:>6} {algorithm.value:>12} {count:>7} {count / batch:>10.1f} {loop_count / loop:>10.1f}")
+
+def benchmark_env(sizes: list[int], repeat: int):
+    """
+    迷路の大きさごとに、MazeEnvとMazeVecEnvで一様乱数の行動を進めた場合の1秒あたりのステップ数を表示する
+    迷路の生成（リセット）の時間は含めない
+    """
+    print(f"{'size':>6} {'envs':>6} {'single/s':>10} {'vec/s':>12}")
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        env = MazeEnv((size, size), max_steps=None)
+        env.reset(seed=0)
+        actions = rng.integers(len(Action), size=ENV_STEPS)
+        single = measure(lambda: [env.step(action) for action in actions], repeat)
+
+        num_envs = min(VEC_ENVS, max(1, BATCH_CELLS // (size * size)))
+        vec_env = MazeVecEnv(num_envs, (size, size), max_steps=None)
+        vec_env.reset(seed=0)
+        vec_steps = max(1, ENV_STEPS // num_envs * 10)
+        vec_actions = rng.integers(len(Action), size=(vec_steps, num_envs))
+        vec = measure(lambda: [vec_env.step(step_actions) for step_actions in vec_actions], repeat)
+        print(f"{size:>6} {num_envs:>6} {ENV_STEPS / single:>10.0f} {vec_steps * num_envs / vec:>12.0f}")
+
+def measure_prepared_restart(global_state: GlobalState, size: int, repeat: int) -> float:
+    """
+    ScoreSceneと同じくワーカースレッドで次の迷路を準備し、SCORE_SCREEN_SECONDS秒後にRキーが押された場合の待ち時間を返す
+    repeat回のうち最も短かった回の秒数を返す
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(GameScene.prepare_map, global_state, (size, size))
+            time.sleep(SCORE_SCREEN_SECONDS)
+            start = time.perf_counter()
+            future.result()
+            best = min(best, time.perf_counter() - start)
+    return best
+
+def benchmark_restart(sizes: list[int], repeat: int):
+    """
+    迷路の大きさごとに、スコア画面でRキーを押してから次の迷路が使えるまでの時間を表示する
+    syncはその場で準備した場合、preparedはスコア画面の表示中にワーカースレッドで準備した場合
+    """
+    global_state = GlobalState()
+    print(f"{'size':>6} {'sync [s]':>9} {'prepared [s]':>13}")
+    for size in sizes:
+        sync = measure(lambda: GameScene.prepare_map(global_state, (size, size)), repeat)
+        prepared = measure_prepared_restart(global_state, size, repeat)
+        print(f"{size:>6} {sync:>9.4f} {prepared:>13.4f}")
+
+# 名前と実行する関数の対応。引数は (sizes, repeat)
+BENCHMARKS = {
+    'generation': benchmark_generation,
+    'restart': benchmark_restart,
+    'batch': benchmark_batch,
+    'env': benchmark_env,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="迷路の生成などの処理時間を計測する")
+    parser.add_argument('names', nargs='*',
+                        help=f"実行するベンチマーク（{', '.join(BENCHMARKS)}。省略時はすべて）")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[15, 51, 101, 201, 501, 1001],
+                        help="迷路の一辺のマス数")
+    parser.add_argument('--repeat', type=int, default=3, help="計測の繰り返し回数（最速の回を表示）")
+    args = parser.parse_args()
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark '{name}'")
+    for name in args.names or BENCHMARKS:
+        print(f"== {name} ==")
+        BENCHMARKS[name](args.sizes, args.repeat)
+
+if __name__ == "__main__":
+    main()
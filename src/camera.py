@@ -17,6 +17,9 @@ class Camera:
         mouse_sensivity (float): マウス感度。
         view_based_movement (bool): 移動操作を視点ベースで行うかどうか。
         map (Map|None): 当カメラに関連づけられたゲーム空間マップ。
+        move_speed (float): 1フレームあたりの移動量。
+        collision_radius (float): 壁との衝突判定に用いるプレイヤーの半径。
+        last_move_result (MoveResult|None): 直前の移動で得られた衝突解決の結果（通過したコイン・ゴール）。
         
     Methods:
         __init__(): カメラの初期化。
@@ -30,7 +33,7 @@ class Camera:
         get_view_matrix_inline(): ビュー行列の取得 (インライン版)。
         get_projection_matrix(): 投影行列の取得。
     """
-    def __init__(self, position: np.ndarray, yaw: float, pitch: float, aspect: float, fov: float, z_near: float, z_far: float, mouse_sensivity: float = 0.01, prev_mouse_pos: tuple[int, int] = None, view_based_movement: bool = True, map_instance: Map = None):
+    def __init__(self, position: np.ndarray, yaw: float, pitch: float, aspect: float, fov: float, z_near: float, z_far: float, mouse_sensivity: float = 0.01, prev_mouse_pos: tuple[int, int] = None, view_based_movement: bool = True, map_instance: Map = None, move_speed: float = 8, collision_radius: float = 0.0):
         self.position = position
         self.yaw = yaw
         self.pitch = pitch
@@ -43,6 +46,9 @@ class Camera:
         self.view_based_movement = view_based_movement  # 移動モードフラグを初期化
         self.is_shifting = False
         self.map = map_instance  # Mapインスタンスを保持
+        self.move_speed = move_speed
+        self.collision_radius = collision_radius
+        self.last_move_result = None
         
     def init_mouse_pos(self, pos: tuple[int, int]):
         self.prev_mouse_pos = pos
@@ -90,9 +96,9 @@ class Camera:
             if keyboard_state['down']:
                 up -= 1
 
-        forward *= 8
-        right *= 8
-        up *= 8
+        forward *= self.move_speed
+        right *= self.move_speed
+        up *= self.move_speed
 
         if (global_state and not global_state.is_master_view) or self.view_based_movement:
             # 視点ベースの移動
@@ -127,32 +133,35 @@ class Camera:
             up_vec = np.array([0, 1, 0])
 
         is_coin_collected = False
+        self.last_move_result = None
 
-        if self.map and not global_state.is_master_view:
+        is_master_view = global_state is not None and global_state.is_master_view
+        if self.map:
             # 現在の位置を保存
             current_pos = self.position.copy()
-            
-            # X方向とZ方向の移動を分離して試行
-            # まずX方向
-            tentative_x = current_pos[0] + (forward_vec[0] * forward + right_vec[0] * right)
-            if self.map.set_camera_position_and_check_coin_collection(tentative_x, current_pos[2]):
-                is_coin_collected = True
-            
-            # 次にZ方向
-            tentative_z = current_pos[2] + (forward_vec[2] * forward + right_vec[2] * right)
-            if self.map.set_camera_position_and_check_coin_collection(self.map.camera_position[0], tentative_z):
-                is_coin_collected = True
-            
+
+            # 移動量を1度にスイープして壁との衝突を解決（1フレームで複数マス進んでもすり抜けない）
+            # マスタービューで高速に移動しても、水平方向は同じく壁で止める
+            start = current_pos if is_master_view else self.map.get_camera_position()
+            movement = forward_vec * forward + right_vec * right + up_vec * up
+            result = self.map.sweep_move(start[0], start[2], movement[0], movement[2], self.collision_radius)
+            self.map.camera_position[0] = result.x
+            self.map.camera_position[2] = result.z
+            self.last_move_result = result
+            is_coin_collected = len(result.coin_cells) > 0
+
             # 最終的な位置を取得
-            new_pos = self.map.get_camera_position()
-            self.position[0] = new_pos[0]
-            self.position[2] = new_pos[2]
+            self.position[0] = result.x
+            self.position[2] = result.z
             
-            # Y座標は固定（マスタービューでない場合）
-            if not global_state.is_master_view:
+            if is_master_view:
+                # マスタービューでは上下方向のみ制限なく移動できる
+                self.position[1] = current_pos[1] + movement[1]
+            else:
+                # Y座標は固定（マスタービューでない場合）
                 self.position[1] = current_pos[1]
         else:
-            # マスタービューモードの場合は制限なし
+            # マップが無い場合は制限なし
             self.position += forward_vec * forward + right_vec * right + up_vec * up
 
         self.position = self.position.astype(float)
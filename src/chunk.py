@@ -0,0 +1,459 @@
+import math
+from collections import OrderedDict
+import numpy as np
+
+from draw_object import DrawObject
+from tri_sprite import TriSprite
+from tile import TileType
+
+class StaticMesh(DrawObject):
+    """
+    頂点・面・色の配列をそのまま保持する静的なメッシュ。複数のDrawObjectを1つにまとめて描画する。
+
+    Members:
+        vertices (np.ndarray): (頂点数, 4) の同次座標の頂点配列。
+        faces (np.ndarray): (面数, 3) の頂点インデックス配列。
+        colors (np.ndarray): 面ごとの描画色。
+
+    Methods:
+        __init__(): コンストラクタ。配列から直接メッシュを作る。
+        merge(): 複数のDrawObjectを結合したメッシュを返す。
+        _generate_vertices(): 保持している頂点配列を返す。
+        _generate_faces(): 保持している面と色の配列を返す。
+        get_tri_sprites(): 頂点をまとめて射影変換し、三角形スプライトを生成。
+    """
+    def __init__(self, vertices: np.ndarray, faces: np.ndarray, colors: np.ndarray, center_position=None):
+        self._vertices = np.asarray(vertices, dtype=float).reshape(-1, 4)
+        self._faces = np.asarray(faces, dtype=np.int32).reshape(-1, 3)
+        self._colors = np.asarray(colors, dtype=np.int32).reshape(-1)
+        if center_position is None:
+            center_position = self._vertices[:, :3].mean(axis=0) if len(self._vertices) else [0, 0, 0]
+        super().__init__(center_position)
+
+    @classmethod
+    def merge(cls, objects: list[DrawObject]) -> 'StaticMesh':
+        """複数のDrawObjectの頂点・面・色を1つのメッシュに結合"""
+        vertices, faces, colors = [], [], []
+        vertex_count = 0
+        for obj in objects:
+            obj_vertices = np.asarray(obj.vertices, dtype=float).reshape(-1, 4)
+            vertices.append(obj_vertices)
+            faces.append(np.asarray(obj.faces, dtype=np.int32).reshape(-1, 3) + vertex_count)
+            colors.append(np.asarray(obj.colors, dtype=np.int32).reshape(-1))
+            vertex_count += len(obj_vertices)
+        if not vertices:
+            return cls(np.zeros((0, 4)), np.zeros((0, 3)), np.zeros(0))
+        return cls(np.concatenate(vertices), np.concatenate(faces), np.concatenate(colors))
+
+    def _generate_vertices(self):
+        return self._vertices
+
+    def _generate_faces(self):
+        return self._faces, self._colors
+
+    def get_tri_sprites(self, view_projection_matrix, width, height) -> list[TriSprite]:
+        # 全頂点を1回の行列積で変換
+        transformed = self.vertices @ np.asarray(view_projection_matrix).T
+        tri_sprites = []
+        for (i1, i2, i3), color in zip(self.faces.tolist(), self.colors.tolist()):
+            tri = TriSprite(
+                tuple(transformed[i1]),
+                tuple(transformed[i2]),
+                tuple(transformed[i3]),
+                color
+            )
+            tri_sprites.extend(tri.clip_triangle(width, height))
+        return tri_sprites
+
+class BakedMeshes:
+    """
+    チャンクごとの床・壁メッシュを連結した配列にまとめたもの。ファイルへの保存や、保存済みメッシュの再利用に使う。
+    配列はnp.memmapでもよく、チャンクを構築する時に必要な範囲だけが読み込まれる。
+
+    Members:
+        chunk_size (int): メッシュを作った時の1チャンクの一辺のマス数。
+        keys (np.ndarray): (チャンク数, 2) のチャンク座標。
+        table (np.ndarray): (チャンク数, 8) の範囲表。床・壁ごとに (頂点の開始, 頂点数, 面の開始, 面数)。
+        vertices (np.ndarray): (頂点数, 4) の全メッシュの頂点。
+        faces (np.ndarray): (面数, 3) のメッシュごとの頂点インデックス。
+        colors (np.ndarray): 面ごとの描画色。
+        index (dict[tuple[int,int], int]): チャンク座標からtableの行への対応。
+
+    Methods:
+        __init__(): コンストラクタ。
+        from_chunk_grid(): 構築済みのChunkGridからメッシュを集める。
+        to_arrays(): 保存用に名前付きの配列の辞書を返す。
+        __contains__(): チャンクのメッシュを保持しているかを判定。
+        get_meshes(): チャンクの床・壁メッシュを返す。
+    """
+    ARRAY_NAMES = ('chunk_keys', 'chunk_table', 'vertices', 'faces', 'colors')
+
+    def __init__(self, chunk_size: int, keys: np.ndarray, table: np.ndarray,
+                 vertices: np.ndarray, faces: np.ndarray, colors: np.ndarray):
+        self.chunk_size = chunk_size
+        self.keys = keys
+        self.table = table
+        self.vertices = vertices
+        self.faces = faces
+        self.colors = colors
+        self.index = {(int(cx), int(cz)): i for i, (cx, cz) in enumerate(np.asarray(keys).tolist())}
+
+    @classmethod
+    def from_chunk_grid(cls, chunk_grid: 'ChunkGrid') -> 'BakedMeshes':
+        """構築済みのChunkGridの全チャンクのメッシュを連結する"""
+        keys, table = [], []
+        vertices, faces, colors = [], [], []
+        vertex_count = face_count = 0
+        for chunk in chunk_grid.get_chunks():
+            if chunk.dirty:
+                chunk_grid.build_chunk(chunk)
+            row = []
+            for mesh in (chunk.floor_mesh, chunk.wall_mesh):
+                if mesh is None:
+                    row.extend((vertex_count, 0, face_count, 0))
+                    continue
+                row.extend((vertex_count, len(mesh.vertices), face_count, len(mesh.faces)))
+                vertices.append(mesh.vertices)
+                faces.append(mesh.faces)
+                colors.append(mesh.colors)
+                vertex_count += len(mesh.vertices)
+                face_count += len(mesh.faces)
+            keys.append(chunk.key)
+            table.append(row)
+        return cls(
+            chunk_grid.chunk_size,
+            np.array(keys, dtype=np.int32).reshape(-1, 2),
+            np.array(table, dtype=np.int64).reshape(-1, 8),
+            np.concatenate(vertices).astype(np.float32) if vertices else np.zeros((0, 4), dtype=np.float32),
+            np.concatenate(faces).astype(np.int32) if faces else np.zeros((0, 3), dtype=np.int32),
+            np.concatenate(colors).astype(np.uint8) if colors else np.zeros(0, dtype=np.uint8),
+        )
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """保存用に、ARRAY_NAMESの名前をキーとした配列の辞書を返す"""
+        return dict(zip(self.ARRAY_NAMES, (self.keys, self.table, self.vertices, self.faces, self.colors)))
+
+    def __contains__(self, key: tuple[int, int]) -> bool:
+        return key in self.index
+
+    def get_meshes(self, key: tuple[int, int]) -> tuple[StaticMesh | None, StaticMesh | None]:
+        """チャンクの (床メッシュ, 壁メッシュ) を返す。メッシュの無い側はNone"""
+        row = self.table[self.index[key]].tolist()
+        meshes = []
+        for vertex_start, vertex_count, face_start, face_count in (row[:4], row[4:]):
+            if face_count == 0:
+                meshes.append(None)
+                continue
+            meshes.append(StaticMesh(
+                self.vertices[vertex_start:vertex_start + vertex_count],
+                self.faces[face_start:face_start + face_count],
+                self.colors[face_start:face_start + face_count],
+            ))
+        return meshes[0], meshes[1]
+
+def is_box_visible(view_projection_matrix, bounds_min, bounds_max, width: float, height: float) -> bool:
+    """
+    軸平行な箱(AABB)が視錐台と交わる可能性があるかを判定
+    8頂点すべてが同じクリップ平面の外側にある場合のみFalse（保守的な判定）
+    """
+    corners = np.array([
+        [x, y, z, 1]
+        for x in (bounds_min[0], bounds_max[0])
+        for y in (bounds_min[1], bounds_max[1])
+        for z in (bounds_min[2], bounds_max[2])
+    ])
+    clip = corners @ np.asarray(view_projection_matrix).T
+    x, y, w = clip[:, 0], clip[:, 1], clip[:, 3]
+    # w除算後に画面範囲(±width/2, ±height/2)へ入る条件を同次座標の半空間で表す
+    half_w = w * width / 2
+    half_h = w * height / 2
+    return not (np.all(w <= 0) or
+                np.all(x > half_w) or np.all(x < -half_w) or
+                np.all(y > half_h) or np.all(y < -half_h))
+
+class Chunk:
+    """
+    マップをchunk_size四方のマスごとに区切った静的ジオメトリの単位。
+
+    Members:
+        key (tuple[int,int]): チャンク座標(cx, cz)。
+        col_range (tuple[int,int]): 含むマスの列範囲 [開始, 終了)。
+        row_range (tuple[int,int]): 含むマスの行範囲 [開始, 終了)。
+        floor_mesh (StaticMesh|None): 床をまとめたメッシュ。床が無ければNone。
+        wall_mesh (StaticMesh|None): 壁をまとめたメッシュ。壁が無ければNone。
+        bounds_min (np.ndarray): ワールド座標でのAABBの最小点。
+        bounds_max (np.ndarray): ワールド座標でのAABBの最大点。
+        dirty (bool): 再構築が必要かどうか。
+
+    Methods:
+        __init__(): コンストラクタ。
+        get_center(): AABBの中心座標を返す。
+    """
+    def __init__(self, key, col_range, row_range, bounds_min, bounds_max):
+        self.key = key
+        self.col_range = col_range
+        self.row_range = row_range
+        self.floor_mesh = None
+        self.wall_mesh = None
+        self.bounds_min = bounds_min
+        self.bounds_max = bounds_max
+        self.dirty = True
+
+    def get_center(self) -> np.ndarray:
+        """AABBの中心座標を返す"""
+        return (self.bounds_min + self.bounds_max) / 2
+
+class ChunkGrid:
+    """
+    Mapの静的ジオメトリ（床・壁）をチャンク単位で構築・管理するクラス。
+    stream_radiusを指定するとストリーミングモードになり、注目点の周囲のチャンクのみを構築して保持する。
+
+    Members:
+        map (Map): 対象のマップ。
+        chunk_size (int): 1チャンクの一辺のマス数。
+        chunk_cols (int): 横方向のチャンク数。
+        chunk_rows (int): 縦方向のチャンク数。
+        chunks (OrderedDict[tuple[int,int], Chunk]): 保持しているチャンク。ストリーミング時は古く使われた順。
+        stream_radius (float|None): ストリーミング時に構築するワールド座標での半径。Noneなら全チャンクを構築。
+        max_resident_chunks (int|None): ストリーミング時に保持するチャンク数の上限。
+        focus_key (tuple[int,int]|None): 最後に注目したチャンク座標。
+        baked (BakedMeshes|None): 保存済みのメッシュ。変更の無いチャンクはここから読み込む。
+        pristine (dict[tuple[int,int], tuple[StaticMesh|None, StaticMesh|None]]): 壁が壊される前のチャンクの (床, 壁) メッシュ。
+
+    Methods:
+        __init__(): コンストラクタ。非ストリーミング時は全チャンクを作成して構築する。
+        is_streaming(): ストリーミングモードかどうかを返す。
+        chunk_key(): マスが属するチャンク座標を返す。
+        _create_chunk(): チャンクの範囲とAABBを計算して作成。
+        build_chunk(): チャンクの床・壁メッシュを構築（保存済みメッシュがあればそれを使う）。
+        update_focus(): 注目点の周囲のチャンクを読み込み、遠いチャンクをLRUで破棄する。
+        _evict(): 上限を超えたチャンクを古く使われた順に破棄する。
+        mark_dirty(): マスの変更に影響するチャンクを再構築対象にする。
+        rebuild_dirty(): 再構築対象のチャンクのみ作り直す。
+        restore_pristine(): 壁を戻したマスのチャンクを、壊される前のメッシュに戻す。
+        shift_rows(): マップの行が前に詰められた分だけチャンク座標をずらす。
+        get_chunks(): 保持している全チャンクを返す。
+        get_chunks_at(): 指定したチャンクを（無ければ構築して）返す。
+        get_visible_chunks(): 視錐台と交わるチャンクのみ返す。
+        get_floor_meshes(): チャンク群の床メッシュを返す。
+        get_wall_meshes(): チャンク群の壁メッシュを返す。
+    """
+    def __init__(self, map_instance, chunk_size: int = 8,
+                 stream_radius: float = None, max_resident_chunks: int = None,
+                 baked: BakedMeshes = None):
+        self.map = map_instance
+        self.chunk_size = chunk_size
+        self.chunk_cols = -(-self.map.cols // chunk_size)
+        self.chunk_rows = -(-self.map.rows // chunk_size)
+        self.chunks = OrderedDict()
+        self.stream_radius = stream_radius
+        self.focus_key = None
+        # チャンクの大きさが異なる保存済みメッシュは使えない
+        self.baked = baked if baked is not None and baked.chunk_size == chunk_size else None
+        self._baked_keys = set(self.baked.index) if self.baked is not None else set()
+        self.pristine = {}
+
+        if self.is_streaming():
+            # 注目点を中心とした正方形に含まれるチャンク数の2倍を既定の上限とする
+            radius_in_chunks = math.ceil(stream_radius / (chunk_size * self.map.tile_size))
+            self.max_resident_chunks = max_resident_chunks or 2 * (2 * radius_in_chunks + 1) ** 2
+            return
+
+        self.max_resident_chunks = None
+        for cz in range(self.chunk_rows):
+            for cx in range(self.chunk_cols):
+                self.chunks[(cx, cz)] = self._create_chunk((cx, cz))
+        self.rebuild_dirty()
+
+    def is_streaming(self) -> bool:
+        """ストリーミングモードかどうかを返す"""
+        return self.stream_radius is not None
+
+    def chunk_key(self, col: int, row: int) -> tuple[int, int]:
+        """マス(col, row)が属するチャンク座標を返す"""
+        return col // self.chunk_size, row // self.chunk_size
+
+    def _create_chunk(self, key) -> Chunk:
+        """チャンクの範囲とAABBを計算して作成"""
+        cx, cz = key
+        col_range = (cx * self.chunk_size, min((cx + 1) * self.chunk_size, self.map.cols))
+        row_range = (cz * self.chunk_size, min((cz + 1) * self.chunk_size, self.map.rows))
+        half = self.map.tile_size / 2
+        x0, z0 = self.map.grid_to_world(col_range[0], row_range[0])
+        x1, z1 = self.map.grid_to_world(col_range[1] - 1, row_range[1] - 1)
+        wall_y = self.map.origin_pos[1]
+        floor_y = self.map.get_floor_height()
+        bounds_min = np.array([x0 - half, min(wall_y - half, floor_y), z0 - half])
+        bounds_max = np.array([x1 + half, max(wall_y + half, floor_y), z1 + half])
+        return Chunk(key, col_range, row_range, bounds_min, bounds_max)
+
+    def build_chunk(self, chunk: Chunk):
+        """チャンクの床・壁メッシュを構築"""
+        if chunk.key in self._baked_keys:
+            chunk.floor_mesh, chunk.wall_mesh = self.baked.get_meshes(chunk.key)
+            chunk.dirty = False
+            return
+
+        (c0, c1), (r0, r1) = chunk.col_range, chunk.row_range
+        window = self.map.grid[r0:r1, c0:c1]
+
+        # 下りの階段のマスは床を張らず、下の階が見える開口部にする
+        rows, cols = np.nonzero((window != TileType.WALL) & (window != TileType.STAIRS_DOWN))
+        floors = [self.map._make_floor_object(col, row)
+                  for row, col in zip((rows + r0).tolist(), (cols + c0).tolist())]
+        chunk.floor_mesh = StaticMesh.merge(floors) if floors else None
+
+        rows, cols = np.nonzero(window == TileType.WALL)
+        if len(rows):
+            wall_cells = (rows + r0) * self.map.cols + (cols + c0)
+            chunk.wall_mesh = StaticMesh.merge([self.map._build_wall(wall_cells)])
+        else:
+            chunk.wall_mesh = None
+        chunk.dirty = False
+
+    def update_focus(self, x: float, z: float) -> int:
+        """
+        ワールド座標(x, z)からstream_radius以内にあるチャンクを読み込み、
+        上限を超えた分は最も長く使われていないチャンクから破棄する
+        注目するチャンクが変わった時のみ処理し、新たに構築したチャンク数を返す
+        """
+        if not self.is_streaming():
+            return 0
+        col, row = self.map.world_to_grid(x, z)
+        focus_key = self.chunk_key(col, row)
+        if focus_key == self.focus_key:
+            return 0
+        self.focus_key = focus_key
+
+        chunk_extent = self.chunk_size * self.map.tile_size
+        radius = math.ceil(self.stream_radius / chunk_extent)
+        built = 0
+        # 近いチャンクから順に読み込み、LRUの末尾（最近使用）へ移す
+        nearby = [(cx, cz)
+                  for cz in range(max(0, focus_key[1] - radius), min(self.chunk_rows, focus_key[1] + radius + 1))
+                  for cx in range(max(0, focus_key[0] - radius), min(self.chunk_cols, focus_key[0] + radius + 1))]
+        nearby.sort(key=lambda key: -((key[0] - focus_key[0]) ** 2 + (key[1] - focus_key[1]) ** 2))
+        for key in nearby:
+            chunk = self.chunks.get(key)
+            if chunk is None:
+                chunk = self._create_chunk(key)
+                self.chunks[key] = chunk
+            if chunk.dirty:
+                self.build_chunk(chunk)
+                built += 1
+            self.chunks.move_to_end(key)
+        self._evict()
+        return built
+
+    def _evict(self):
+        """保持数の上限を超えたチャンクを、最も長く使われていないものから破棄する"""
+        while len(self.chunks) > self.max_resident_chunks:
+            self.chunks.popitem(last=False)
+
+    def mark_dirty(self, col: int, row: int):
+        """
+        マス(col, row)の変更に影響するチャンクを再構築対象にする
+        隣接マスの壁の面も変わるため、チャンク境界のマスなら隣のチャンクも対象にする
+        """
+        for dx, dz in ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)):
+            key = self.chunk_key(col + dx, row + dz)
+            # 変更のあったチャンクは保存済みメッシュを使わずグリッドから作り直す
+            self._baked_keys.discard(key)
+            chunk = self.chunks.get(key)
+            if chunk is not None:
+                # 変更前のメッシュはrestore_pristine()で使い回すために残しておく
+                if not chunk.dirty and key not in self.pristine:
+                    self.pristine[key] = (chunk.floor_mesh, chunk.wall_mesh)
+                chunk.dirty = True
+
+    def rebuild_dirty(self) -> int:
+        """再構築対象のチャンクのみ作り直し、作り直した数を返す"""
+        rebuilt = 0
+        for chunk in self.chunks.values():
+            if chunk.dirty:
+                self.build_chunk(chunk)
+                rebuilt += 1
+        return rebuilt
+
+    def restore_pristine(self, cells: list[tuple[int, int]]):
+        """
+        マップの変更がすべて元に戻され、cellsのマスに壁が戻った時に呼ぶ
+        変更前のメッシュを残しているチャンクはそれに戻し、残っていないチャンクのみ再構築対象にする
+        """
+        for col, row in cells:
+            for dx, dz in ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)):
+                key = self.chunk_key(col + dx, row + dz)
+                if self.baked is not None and key in self.baked:
+                    self._baked_keys.add(key)
+                chunk = self.chunks.get(key)
+                if chunk is None:
+                    continue
+                if key in self.pristine:
+                    chunk.floor_mesh, chunk.wall_mesh = self.pristine[key]
+                    chunk.dirty = False
+                else:
+                    chunk.dirty = True
+        self.pristine = {}
+        self.rebuild_dirty()
+
+    def shift_rows(self, count: int):
+        """
+        マップの先頭count行が取り除かれ、末尾に同じ行数が追加された時に呼ぶ（countはchunk_sizeの倍数）
+        ワールド座標は変わらないため、残るチャンクはメッシュとAABBをそのまま使い、チャンク座標と行範囲だけずらす
+        非ストリーミング時は追加された行のチャンクを作って構築する
+        """
+        shift = count // self.chunk_size
+        chunks = OrderedDict()
+        for (cx, cz), chunk in self.chunks.items():
+            if cz >= shift:
+                chunk.key = (cx, cz - shift)
+                chunk.row_range = (chunk.row_range[0] - count, chunk.row_range[1] - count)
+                chunks[chunk.key] = chunk
+        self.chunks = chunks
+        # 保存済みメッシュは元のチャンク座標のものなので使えない
+        self.baked = None
+        self._baked_keys = set()
+        self.pristine = {}
+        self.focus_key = None
+        if self.is_streaming():
+            return
+        for cz in range(self.chunk_rows):
+            for cx in range(self.chunk_cols):
+                if (cx, cz) not in self.chunks:
+                    self.chunks[(cx, cz)] = self._create_chunk((cx, cz))
+        self.rebuild_dirty()
+
+    def get_chunks(self) -> list[Chunk]:
+        """保持している全チャンクを返す"""
+        return list(self.chunks.values())
+
+    def get_chunks_at(self, keys) -> list[Chunk]:
+        """
+        チャンク座標のリストで指定したチャンクを返す。保持していないチャンクは作成・構築する
+        注目点から離れたチャンク（別の階の階段の周りなど）を描画する場合に使う
+        """
+        chunks = []
+        for key in keys:
+            chunk = self.chunks.get(key)
+            if chunk is None:
+                chunk = self._create_chunk(key)
+                self.chunks[key] = chunk
+            if chunk.dirty:
+                self.build_chunk(chunk)
+            chunks.append(chunk)
+        return chunks
+
+    def get_visible_chunks(self, view_projection_matrix, width: float, height: float) -> list[Chunk]:
+        """視錐台と交わるチャンクのみ返す"""
+        return [chunk for chunk in self.chunks.values()
+                if is_box_visible(view_projection_matrix, chunk.bounds_min, chunk.bounds_max, width, height)]
+
+    def get_floor_meshes(self, chunks: list[Chunk] = None) -> list[StaticMesh]:
+        """チャンク群（省略時は全チャンク）の床メッシュを返す"""
+        chunks = self.get_chunks() if chunks is None else chunks
+        return [chunk.floor_mesh for chunk in chunks if chunk.floor_mesh is not None]
+
+    def get_wall_meshes(self, chunks: list[Chunk] = None) -> list[StaticMesh]:
+        """チャンク群（省略時は全チャンク）の壁メッシュを返す"""
+        chunks = self.get_chunks() if chunks is None else chunks
+        return [chunk.wall_mesh for chunk in chunks if chunk.wall_mesh is not None]
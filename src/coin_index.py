@@ -0,0 +1,66 @@
+import math
+
+class CoinIndex:
+    """
+    コインをマス座標で引ける索引。近傍検索用にbucket_size四方のバケットにも分けて保持する。
+
+    Members:
+        bucket_size (int): 1バケットの一辺のマス数。
+        positions (dict[tuple[int,int], list[float]]): コインのあるマス(col, row)と球体の座標。
+        buckets (dict[tuple[int,int], set[tuple[int,int]]]): バケット座標ごとのコインのマス。
+
+    Methods:
+        __init__(): コンストラクタ。
+        __contains__(): マスにコインがあるかを判定。
+        __len__(): コインの数を返す。
+        add(): コインを追加。
+        remove(): コインを取り除く。
+        query(): 指定マスから一定範囲内のコインを返す。
+    """
+    def __init__(self, positions: dict[tuple[int, int], list[float]] = None, bucket_size: int = 8):
+        self.bucket_size = bucket_size
+        self.positions = {}
+        self.buckets = {}
+        for cell, pos in (positions or {}).items():
+            self.add(cell, pos)
+
+    def __contains__(self, cell: tuple[int, int]) -> bool:
+        return cell in self.positions
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def _bucket_key(self, cell: tuple[int, int]) -> tuple[int, int]:
+        return cell[0] // self.bucket_size, cell[1] // self.bucket_size
+
+    def add(self, cell: tuple[int, int], position: list[float]):
+        """マス(col, row)にコインを追加"""
+        self.positions[cell] = position
+        self.buckets.setdefault(self._bucket_key(cell), set()).add(cell)
+
+    def remove(self, cell: tuple[int, int]) -> bool:
+        """マス(col, row)のコインを取り除く。コインが無ければFalse"""
+        if self.positions.pop(cell, None) is None:
+            return False
+        key = self._bucket_key(cell)
+        bucket = self.buckets[key]
+        bucket.discard(cell)
+        if not bucket:
+            del self.buckets[key]
+        return True
+
+    def query(self, col: int, row: int, radius: float) -> list[tuple[int, int]]:
+        """
+        マス(col, row)からradiusマス以内にあるコインのマスを返す
+        範囲に重なるバケットのみを調べるため、コインの総数には依存しない
+        """
+        bucket_radius = math.ceil(radius / self.bucket_size)
+        center_x, center_z = self._bucket_key((col, row))
+        radius_sq = radius * radius
+        cells = []
+        for bz in range(center_z - bucket_radius, center_z + bucket_radius + 1):
+            for bx in range(center_x - bucket_radius, center_x + bucket_radius + 1):
+                for cell in self.buckets.get((bx, bz), ()):
+                    if (cell[0] - col) ** 2 + (cell[1] - row) ** 2 <= radius_sq:
+                        cells.append(cell)
+        return cells
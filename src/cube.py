@@ -108,6 +108,7 @@ class RotatingCube(Cube):
     Methods:
         __init__(): コンストラクタ。
         update(): フレームごとに回転角度を更新。
+        set_rotation_angle(): 回転角度を指定して頂点を再計算。
         _generate_vertices(): 回転を適用した頂点を生成。
     """
     def __init__(self, position, size=100, color=None):
@@ -129,6 +130,11 @@ class RotatingCube(Cube):
         # 頂点を更新
         self.vertices = self._generate_vertices()
 
+    def set_rotation_angle(self, angle: float):
+        """回転角度を指定して頂点を再計算（経過時間から求めた角度で描画する場合に使う）"""
+        self.rotation_angle = angle % (2 * np.pi)
+        self.vertices = self._generate_vertices()
+
     def _generate_vertices(self):
         """回転を適用した頂点を生成"""
         if self.base_vertices is None:
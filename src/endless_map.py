@@ -0,0 +1,98 @@
+import random
+import numpy as np
+
+from map import Map, MapChangeKind
+from maze_generator import eller_rows
+from tile import TileType
+
+class EndlessMap(Map):
+    """
+    進むほど迷路が続いていく「終わりのない回廊」のマップ（ゴールは無い）。
+    eller_rows()で生成した行を一定の行数の窓に保持し、プレイヤーが窓の先端に近づくと
+    先頭の行を捨てて同じ行数を末尾に追加する。ワールド座標は変えないため、歩いた距離に関わらずメモリは一定。
+
+    Members:
+        seed (int): 迷路の生成に使ったシード。同じシードなら同じ迷路が続く。
+        shift_rows (int): 1回の更新で窓を進める行数（チャンクの大きさの倍数）。
+        row_origin (int): 窓の先頭の行の、迷路全体での行番号。
+        rows_iter (Iterator[np.ndarray]): 迷路の行を生成するジェネレータ。
+        coin_rng (random.Random): 追加した行にコインを置く乱数生成器。
+
+    Methods:
+        __init__(): コンストラクタ。最初の窓の行を生成する。
+        _next_rows(): 次の行を生成し、コインを置く。
+        update_focus(): プレイヤーが窓の先端に近づいたら窓を進める。
+        _shift(): 窓を進め、行番号に依存する索引やキャッシュを作り直す。
+        get_initial_view_direction(): 迷路が続く方向を返す。
+        get_bird_view(): 窓の中心の真上からの視点を返す。
+    """
+    # 通路のマスにコインを置く確率（generate_grid()の既定のコイン数と同じ割合）
+    COIN_RATE = 1 / 30
+
+    def __init__(self, width: int, origin_pos: list[float], tile_size: float, seed: int = None,
+                 window_rows: int = 64, shift_rows: int = 16):
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.shift_rows = shift_rows
+        self.row_origin = 0
+        self.rows_iter = eller_rows(width, self.seed)
+        self.coin_rng = random.Random(f"{self.seed}:coins")
+        grid = self._next_rows(window_rows)
+        grid[1, 1] = TileType.START
+        super().__init__(grid, origin_pos, tile_size)
+
+    def _next_rows(self, count: int) -> np.ndarray:
+        """迷路の次のcount行を生成し、通路のマスにCOIN_RATEの確率でコインを置いて返す"""
+        rows = np.stack([next(self.rows_iter) for _ in range(count)])
+        cells = np.flatnonzero(rows == TileType.EMPTY).tolist()
+        rows.flat[[cell for cell in cells if self.coin_rng.random() < self.COIN_RATE]] = TileType.COIN
+        return rows
+
+    def update_focus(self, x: float, z: float) -> bool:
+        """
+        プレイヤーのワールド座標(x, z)が窓の末尾からshift_rowsの2倍以内に来たら窓を進め、Trueを返す
+        """
+        _, row = self.world_to_grid(x, z)
+        if row < self.rows - 2 * self.shift_rows:
+            return False
+        self._shift(self.shift_rows)
+        return True
+
+    def _shift(self, count: int):
+        """
+        先頭のcount行を捨てて末尾にcount行を追加し、残るマスの行番号をcountだけずらす
+        グリッドの原点を同じだけ進めるため、カメラや描画済みのメッシュのワールド座標はそのまま使える
+        """
+        self.grid = np.concatenate([self.grid[count:], self._next_rows(count)])
+        # 捨てた行へ戻れないよう、窓の先頭の行を壁で閉じる
+        self.grid[0] = TileType.WALL
+        self.row_origin += count
+        self.grid_offset_z += count * self.tile_size
+        self.tile_counts = np.bincount(self.grid.ravel(), minlength=len(TileType))
+        self.coins = self._build_coin_index()
+
+        # 行番号で持っている索引・キャッシュは作り直す
+        self._floor_objects = None
+        self._floor_index = None
+        self._wall_objects = None
+        self._wall_owner = None
+        self._saved_wall_groups = None
+        self._baked_meshes = None
+        self._goal_distance = None
+        self._distance_passable = None
+        if self._chunk_grid is not None:
+            self._chunk_grid.shift_rows(count)
+            # 壁で閉じた先頭の行を含むチャンクは作り直す
+            for col in range(0, self.cols, self._chunk_grid.chunk_size):
+                self._chunk_grid.mark_dirty(col, 0)
+        self._record_change(MapChangeKind.ROWS_SHIFTED, 0, count)
+        # 捨てた行への変更は元に戻せないため、窓を進める前の変更は忘れる
+        self.edits = []
+
+    def get_initial_view_direction(self) -> tuple[float, float]:
+        """迷路が続く方向（+z）を向く (yaw, pitch) を返す"""
+        return np.pi / 2, -0.1
+
+    def get_bird_view(self) -> tuple[float, float]:
+        """窓の中心の真上から真下を向く視点を返す"""
+        x, z = self.grid_to_world((self.cols - 1) / 2, (self.rows - 1) / 2)
+        return [x, self.origin_pos[1] - 1000, z], (np.pi / 2, np.pi / 2)
@@ -0,0 +1,167 @@
+import numpy as np
+
+from map import MapChangeKind, MazeSpec
+from maze_generator import MazeAlgorithm, StartEndStrategy
+
+# ファイル先頭の識別子とフォーマットのバージョン
+SNAPSHOT_MAGIC = b'SNAP'
+SNAPSHOT_VERSION = 1
+
+# 保存する移動経路の最大の点数（これを超える経路は間引く）
+SNAPSHOT_PATH_POINTS = 1024
+
+# 保存できる変更の種類（インデックスをファイルに書く）
+_EDIT_KINDS = (MapChangeKind.COIN_REMOVED, MapChangeKind.WALL_REMOVED)
+_ALGORITHMS = tuple(MazeAlgorithm)
+_STRATEGIES = tuple(StartEndStrategy)
+
+# ヘッダー（リトルエンディアン固定）。省略可能な整数は-1で無しを表す
+_HEADER_DTYPE = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u2'),
+    ('algorithm', 'u1'),
+    ('strategy', 'u1'),
+    ('width', '<u4'),
+    ('height', '<u4'),
+    ('coin_count', '<i4'),
+    ('min_distance', '<i4'),
+    ('seed', '<u8'),
+    ('tile_size', '<f8'),
+    ('origin', '<f8', (3,)),
+    ('position', '<f8', (3,)),
+    ('yaw', '<f8'),
+    ('pitch', '<f8'),
+    ('elapsed_time', '<f8'),
+    ('coin_total', '<i4'),
+    ('edit_count', '<u4'),
+    ('path_count', '<u4'),
+])
+
+# 迷路に加えられた変更1つ分 (種類, col, row)
+_EDIT_DTYPE = np.dtype([
+    ('kind', 'u1'),
+    ('col', '<i4'),
+    ('row', '<i4'),
+])
+
+# 移動経路の点 (x, y, z)
+_PATH_DTYPE = np.dtype(('<f4', (3,)))
+
+def downsample_path(points: np.ndarray, max_points: int = SNAPSHOT_PATH_POINTS) -> np.ndarray:
+    """(点数, 3以上) の経路を、最初と最後の点を残して等間隔にmax_points個以下へ間引き (点数, 3) で返す"""
+    points = np.asarray(points)[:, :3]
+    if len(points) <= max_points:
+        return points
+    indices = np.linspace(0, len(points) - 1, max_points).round().astype(np.intp)
+    return points[indices]
+
+class GameSnapshot:
+    """
+    プレイ途中のGameSceneを再開するための情報。迷路はグリッドを持たず、生成条件と変更の列だけを持つ。
+
+    ファイルの構成:
+        ヘッダー(_HEADER_DTYPE) -> 変更(_EDIT_DTYPE × edit_count) -> 経路(_PATH_DTYPE × path_count)
+        迷路の大きさに関わらず、大きさは変更の数と経路の点数（SNAPSHOT_PATH_POINTS以下）だけで決まる。
+
+    Members:
+        spec (MazeSpec): 迷路の生成条件。
+        tile_size (float): マップ1マスのサイズ。
+        origin_pos (list[float]): マップ描画基点。
+        edits (list[tuple[MapChangeKind,int,int]]): 生成時から迷路に加えられた変更 (種類, col, row) の列。
+        position (list[float]): プレイヤーの位置 (x, y, z)。
+        yaw (float): プレイヤーの水平方向の向き[rad]。
+        pitch (float): プレイヤーの垂直方向の向き[rad]。
+        elapsed_time (float): 経過時間[秒]。
+        coin_total (int): GameSceneのコインの総数（壁の破壊に使った分を除く）。
+        path (np.ndarray): 間引いた移動経路 (点数, 3)。(点数, 3以上) の配列を渡すと間引いて保持する。
+
+    Methods:
+        __init__(): コンストラクタ。
+        to_bytes(): バイト列に変換する。
+        from_bytes(): バイト列からGameSnapshotを作る。
+        save(): ファイルに保存する。
+        load(): ファイルからGameSnapshotを作る。
+    """
+    def __init__(self, spec: MazeSpec, tile_size: float, origin_pos: list[float], edits: list,
+                 position: list[float], yaw: float, pitch: float, elapsed_time: float, coin_total: int,
+                 path: np.ndarray):
+        self.spec = spec
+        self.tile_size = tile_size
+        self.origin_pos = list(origin_pos)
+        self.edits = [(MapChangeKind(kind), int(col), int(row)) for kind, col, row in edits]
+        self.position = list(position)
+        self.yaw = yaw
+        self.pitch = pitch
+        self.elapsed_time = elapsed_time
+        self.coin_total = coin_total
+        self.path = downsample_path(np.asarray(path, dtype=float))
+
+    def to_bytes(self) -> bytes:
+        """ヘッダー・変更・経路の順に並べたバイト列を返す"""
+        spec = self.spec
+        header = np.zeros(1, dtype=_HEADER_DTYPE)
+        header['magic'] = SNAPSHOT_MAGIC
+        header['version'] = SNAPSHOT_VERSION
+        header['algorithm'] = _ALGORITHMS.index(spec.algorithm)
+        header['strategy'] = _STRATEGIES.index(spec.strategy)
+        header['width'], header['height'] = spec.width, spec.height
+        header['coin_count'] = spec.coin_count if spec.coin_count is not None else -1
+        header['min_distance'] = spec.min_distance if spec.min_distance is not None else -1
+        header['seed'] = spec.seed
+        header['tile_size'] = self.tile_size
+        header['origin'] = self.origin_pos
+        header['position'] = self.position
+        header['yaw'], header['pitch'] = self.yaw, self.pitch
+        header['elapsed_time'] = self.elapsed_time
+        header['coin_total'] = self.coin_total
+        header['edit_count'] = len(self.edits)
+        header['path_count'] = len(self.path)
+
+        edits = np.zeros(len(self.edits), dtype=_EDIT_DTYPE)
+        if self.edits:
+            kinds, cols, rows = zip(*self.edits)
+            edits['kind'] = [_EDIT_KINDS.index(kind) for kind in kinds]
+            edits['col'], edits['row'] = cols, rows
+        return header.tobytes() + edits.tobytes() + self.path.astype(_PATH_DTYPE.base).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'GameSnapshot':
+        """to_bytes()で作ったバイト列からGameSnapshotを作る"""
+        if len(data) < _HEADER_DTYPE.itemsize:
+            raise ValueError("snapshot is truncated")
+        header = np.frombuffer(data, dtype=_HEADER_DTYPE, count=1)[0]
+        if header['magic'] != SNAPSHOT_MAGIC:
+            raise ValueError("not a game snapshot")
+        if header['version'] > SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported snapshot version {int(header['version'])}")
+        edit_count, path_count = int(header['edit_count']), int(header['path_count'])
+        if len(data) != _HEADER_DTYPE.itemsize + edit_count * _EDIT_DTYPE.itemsize + path_count * _PATH_DTYPE.itemsize:
+            raise ValueError("snapshot is truncated")
+
+        offset = _HEADER_DTYPE.itemsize
+        edits = np.frombuffer(data, dtype=_EDIT_DTYPE, count=edit_count, offset=offset)
+        offset += edits.nbytes
+        path = np.frombuffer(data, dtype=_PATH_DTYPE, count=path_count, offset=offset)
+
+        coin_count, min_distance = int(header['coin_count']), int(header['min_distance'])
+        spec = MazeSpec(int(header['width']), int(header['height']),
+                        coin_count if coin_count >= 0 else None,
+                        _STRATEGIES[header['strategy']],
+                        min_distance if min_distance >= 0 else None,
+                        int(header['seed']),
+                        _ALGORITHMS[header['algorithm']])
+        return cls(spec, float(header['tile_size']), header['origin'].tolist(),
+                   [(_EDIT_KINDS[kind], col, row) for kind, col, row in edits.tolist()],
+                   header['position'].tolist(), float(header['yaw']), float(header['pitch']),
+                   float(header['elapsed_time']), int(header['coin_total']), path.astype(float))
+
+    def save(self, path):
+        """ファイルに保存する"""
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path) -> 'GameSnapshot':
+        """save()で保存したファイルからGameSnapshotを作る"""
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
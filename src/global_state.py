@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import pyxel
 
 class GlobalState:
@@ -9,6 +11,9 @@ class GlobalState:
         is_master_view (bool): マスタービュー（自由移動）かどうか。
         is_view_wireframe (bool): ワイヤーフレーム表示のオン/オフ。
         is_view_based_movement (bool): ビュー依存視点移動のオン/オフ。
+        maze_pool (MazePool|None): 迷路を事前に生成しておくプール。使わない場合はNone。
+        next_level (Future|None): スコア画面で準備したが使われなかった次の迷路（GameScene.prepare_map()の結果）。
+        level_executor (ThreadPoolExecutor): 次の迷路をバックグラウンドで準備するワーカースレッド。
 
     Methods:
         __init__(): コンストラクタ。
@@ -16,12 +21,16 @@ class GlobalState:
         toggle_wireframe(): ワイヤーフレーム表示の切り替え。
         toggle_master_view(): マスタービューの切り替え。
         toggle_view_based_movement(): ビュー依存視点移動の切り替え。
+        shutdown(): 次の迷路を準備するワーカースレッドと迷路のプールを終了する。
     """
-    def __init__(self):
+    def __init__(self, maze_pool=None):
         self.is_view_wireframe = False # CTRL + Wで切り替え
         self.is_master_view = False # CTRL + Mで切り替え
         self.is_view_based_movement = False # マスタービュー時のみ M で切り替え
         self.keyboard_state = {}
+        self.maze_pool = maze_pool
+        self.next_level = None
+        self.level_executor = ThreadPoolExecutor(max_workers=1)
         
     def update(self):
         # ワイヤーフレーム表示切り替え
@@ -55,4 +64,10 @@ class GlobalState:
         self.is_master_view = not self.is_master_view
 
     def toggle_view_based_movement(self):
-        self.is_view_based_movement = not self.is_view_based_movement
\ No newline at end of file
+        self.is_view_based_movement = not self.is_view_based_movement
+
+    def shutdown(self):
+        """次の迷路を準備するワーカースレッドと迷路のプールを終了する（準備中の迷路は待たない）"""
+        self.level_executor.shutdown(wait=False, cancel_futures=True)
+        if self.maze_pool is not None:
+            self.maze_pool.shutdown()
@@ -1,30 +1,391 @@
+import math
+from collections import deque
+from enum import Enum
+from typing import NamedTuple
 import numpy as np
 from plane import Plane, EdgePlane
 from sphere import Sphere
 import pyxel
-from maze_generator import MazeGenerator, StartEndStrategy
+from maze_generator import MazeAlgorithm, MazeGenerator, StartEndStrategy
+from tile import TileType, PASSABLE_TILES, rows_to_grid, grid_to_rows
+from coin_index import CoinIndex
+from packed_grid import PackedTileGrid
+
+def label_connected_cells(mask: np.ndarray) -> tuple[np.ndarray, list[np.ndarray]]:
+    """
+    4近傍でつながったTrueのマスを連結成分ごとにラベル付けする（Union-Find）
+    戻り値は (ラベルのグリッド(対象外は-1), 成分ごとのフラットインデックス配列のリスト)
+    """
+    rows, cols = mask.shape
+    index = np.arange(rows * cols).reshape(rows, cols)
+
+    # 横方向・縦方向に隣接するマスのペアをまとめて求める
+    horizontal = mask[:, :-1] & mask[:, 1:]
+    vertical = mask[:-1, :] & mask[1:, :]
+    first = np.concatenate([index[:, :-1][horizontal], index[:-1, :][vertical]]).tolist()
+    second = np.concatenate([index[:, 1:][horizontal], index[1:, :][vertical]]).tolist()
+
+    parent = list(range(rows * cols))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]  # 経路半減
+            x = parent[x]
+        return x
+
+    for a, b in zip(first, second):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            # 小さいインデックスを代表にする
+            if root_a < root_b:
+                parent[root_b] = root_a
+            else:
+                parent[root_a] = root_b
+
+    cells = np.flatnonzero(mask)
+    roots = np.array([find(cell) for cell in cells.tolist()], dtype=np.intp)
+    labels = np.full(rows * cols, -1, dtype=np.int32)
+    if len(cells) == 0:
+        return labels.reshape(rows, cols), []
+
+    # 代表マスごとにまとめ、出現順（フラットインデックス順）にグループを並べる
+    unique_roots, inverse = np.unique(roots, return_inverse=True)
+    labels[cells] = inverse
+    order = np.argsort(inverse, kind='stable')
+    boundaries = np.flatnonzero(np.diff(inverse[order])) + 1
+    groups = np.split(cells[order], boundaries)
+    return labels.reshape(rows, cols), groups
+
+def relax_grid_distances(distance: np.ndarray, passable: np.ndarray, frontier: np.ndarray,
+                         width: int) -> np.ndarray:
+    """
+    幅width（外周1マスを通行不可で埋めたもの）のフラットな距離配列をfrontierから幅優先で緩和する
+    未到達(-1)か、より遠い距離を持つ通行可能なマスのみを更新し、距離配列を書き換えて返す
+    各段のfrontierを配列のまま広げるため、ループ回数は最大距離分、処理量は更新したマス数に比例する
+    """
+    offsets = np.array([1, -1, width, -width], dtype=np.intp)
+    frontier = np.asarray(frontier, dtype=np.intp)
+    while len(frontier):
+        next_distance = distance[frontier] + 1
+        neighbors = (frontier[:, None] + offsets).ravel()
+        candidate = np.repeat(next_distance, len(offsets))
+        current = distance[neighbors]
+        improve = passable[neighbors] & ((current < 0) | (current > candidate))
+        neighbors, candidate = neighbors[improve], candidate[improve]
+        if len(neighbors) == 0:
+            break
+        # 同じマスに複数の候補がある場合は最も近いものを採用する
+        order = np.lexsort((candidate, neighbors))
+        neighbors, candidate = neighbors[order], candidate[order]
+        first = np.ones(len(neighbors), dtype=bool)
+        first[1:] = neighbors[1:] != neighbors[:-1]
+        frontier = neighbors[first]
+        distance[frontier] = candidate[first]
+    return distance
+
+class MapChangeKind(Enum):
+    """
+    Mapに加えられる変更の種類。
+
+    Values:
+        COIN_REMOVED: コインが取得された
+        WALL_REMOVED: 壁が破壊された
+        ROWS_SHIFTED: 先頭の行が取り除かれ、残りのマスの行番号がrowだけ小さくなった
+    """
+    COIN_REMOVED = "coin_removed"
+    WALL_REMOVED = "wall_removed"
+    ROWS_SHIFTED = "rows_shifted"
+
+class MapChange(NamedTuple):
+    """
+    Mapに加えられた1マス分の変更。versionは変更適用後のMap.version
+    ROWS_SHIFTEDの場合はrowがずれた行数で、colは0
+    """
+    kind: MapChangeKind
+    col: int
+    row: int
+    version: int
+
+class MoveResult(NamedTuple):
+    """
+    Map.sweep_move()による移動の結果。
+    coin_cellsは経路上で取得したコインのマス、goal_cellsは経路上で通過したゴールのマス
+    """
+    x: float
+    z: float
+    coin_cells: list[tuple[int, int]]
+    goal_cells: list[tuple[int, int]]
+    blocked_x: bool
+    blocked_z: bool
+
+class MazeSpec(NamedTuple):
+    """
+    Map.generate_maze_map()で同じ迷路を再現するための生成条件（シードを指定して生成した場合のみ）
+    """
+    width: int
+    height: int
+    coin_count: int | None
+    strategy: StartEndStrategy
+    min_distance: int | None
+    seed: int
+    algorithm: MazeAlgorithm
+
+class RayHit(NamedTuple):
+    """
+    Map.raycast()で光線が最初に当たった壁。
+    faceは光線が入った面の名前（wall.FACE_NAMES）で、始点が壁の中ならNone
+    """
+    col: int
+    row: int
+    face: str | None
+    distance: float
+
+class RayHits(NamedTuple):
+    """
+    Map.raycast_batch()の結果。光線ごとの配列で、当たらなかった光線はhitがFalse、distanceがinf
+    facesはwall.FACE_NAMESのインデックスで、始点が壁の中なら-1
+    """
+    hit: np.ndarray
+    cols: np.ndarray
+    rows: np.ndarray
+    faces: np.ndarray
+    distances: np.ndarray
+
+# 壁に押し戻す際に境界から離す距離
+_SWEEP_EPSILON = 1e-6
+# コインの判定範囲（マスの中心からの距離の、タイルサイズに対する割合）
+_COIN_DETECTION_RATIO = 1 / 4
+
+# タイルコード -> 通路として移動可能か のルックアップテーブル
+_PASSABLE_LUT = np.zeros(len(TileType), dtype=bool)
+_PASSABLE_LUT[list(PASSABLE_TILES)] = True
+
+# 以下のグリッドを引く関数は、gridに (rows, cols) のタイルグリッド（PackedTileGridも可）を渡すか、
+# 同じ大きさの迷路を重ねた (枚数, rows, cols) の配列と要素ごとの何枚目かを表すlayersを渡して使う
+# MapとMazeVecEnvが同じ関数を呼ぶことで、移動・コイン・ゴール・壁破壊の規則を1か所にまとめる
+# grid_offset_x, grid_offset_zはマス(0, 0)の中心のワールド座標
+
+def world_to_cell(position, offset: float, tile_size: float):
+    """1軸のワールド座標をマスの番号に変換（スカラーならint、配列ならintpの配列）"""
+    if np.isscalar(position):
+        return math.floor((position - offset) / tile_size + 0.5)
+    return np.floor((np.asarray(position) - offset) / tile_size + 0.5).astype(np.intp)
+
+def tiles_at(grid, cols: np.ndarray, rows: np.ndarray, layers: np.ndarray = None) -> np.ndarray:
+    """マス(cols, rows)のタイルコードの配列を返す。マップの範囲外は壁"""
+    height, width = grid.shape[-2:]
+    inside = (0 <= cols) & (cols < width) & (0 <= rows) & (rows < height)
+    tiles = np.full(inside.shape, TileType.WALL, dtype=np.uint8)
+    if layers is None:
+        tiles[inside] = grid[rows[inside], cols[inside]]
+    else:
+        tiles[inside] = grid[layers[inside], rows[inside], cols[inside]]
+    return tiles
+
+def sweep_axis(grid, along: np.ndarray, across: np.ndarray, delta: np.ndarray, radius: float, along_x: bool,
+               grid_offset_x: float, grid_offset_z: float, tile_size: float,
+               layers: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    半径radiusのプレイヤーを1軸方向にdeltaだけ動かし、最初にぶつかる壁の手前で止める
+    前縁が新たに入るマスの列（または行）だけを順に調べるため、1マス以上の移動でもすり抜けない
+    along_xがTrueならX方向（列）、FalseならZ方向（行）の移動
+    全プレイヤーを1マスずつまとめて進めるため、ループ回数は最も多くのマスを進むプレイヤーのマス数になる
+    戻り値は (移動後の座標, 壁にぶつかったか) の配列
+    """
+    along_offset, across_offset = (grid_offset_x, grid_offset_z) if along_x else (grid_offset_z, grid_offset_x)
+    # プレイヤーが横方向に重なっているマスの範囲
+    across_lo = world_to_cell(across - radius, across_offset, tile_size)
+    across_hi = world_to_cell(across + radius, across_offset, tile_size)
+
+    direction = np.where(delta > 0, 1, -1)
+    edge = along + direction * radius
+    edge_start = world_to_cell(edge, along_offset, tile_size)
+    edge_end = world_to_cell(edge + delta, along_offset, tile_size)
+    cells = np.where(delta != 0, (edge_end - edge_start) * direction, 0)
+
+    result = np.where(delta != 0, along + delta, along)
+    blocked = np.zeros(len(along), dtype=bool)
+    for step in range(1, int(cells.max(initial=0)) + 1):
+        index = edge_start + direction * step
+        active = (cells >= step) & ~blocked
+        hit = np.zeros(len(along), dtype=bool)
+        for offset in range(int((across_hi - across_lo).max()) + 1):
+            across_index = across_lo + offset
+            cols, rows = (index, across_index) if along_x else (across_index, index)
+            hit |= active & (across_index <= across_hi) & ~_PASSABLE_LUT[tiles_at(grid, cols, rows, layers)]
+        # ぶつかったマスの手前側の境界まで戻す
+        boundary = along_offset + index * tile_size - direction * tile_size / 2
+        result = np.where(hit, boundary - direction * (radius + _SWEEP_EPSILON), result)
+        blocked |= hit
+    return result, blocked
+
+def collect_path_events(grid, start: np.ndarray, end: np.ndarray, across: np.ndarray, along_x: bool,
+                        grid_offset_x: float, grid_offset_z: float, tile_size: float,
+                        layers: np.ndarray = None) -> tuple[tuple, tuple]:
+    """
+    中心が1軸方向にstartからendまで通過したマスを調べ、
+    コインの判定範囲（中心からタイルサイズの1/4）を横切ったコインのマスと、通過したゴールのマスを返す
+    戻り値は (コイン, ゴール) で、それぞれ通過した順に並べた (プレイヤーの番号, cols, rows) の配列
+    """
+    along_offset, across_offset = (grid_offset_x, grid_offset_z) if along_x else (grid_offset_z, grid_offset_x)
+    detection_size = tile_size * _COIN_DETECTION_RATIO
+    across_index = world_to_cell(across, across_offset, tile_size)
+    near_across = np.abs(across - (across_offset + across_index * tile_size)) <= detection_size
+    lo, hi = np.minimum(start, end), np.maximum(start, end)
+    first = world_to_cell(start, along_offset, tile_size)
+    last = world_to_cell(end, along_offset, tile_size)
+    step = np.where(last >= first, 1, -1)
+    cells = np.abs(last - first)
+
+    coins, goals = [], []
+    for offset in range(int(cells.max(initial=0)) + 1):
+        index = first + step * offset
+        cols, rows = (index, across_index) if along_x else (across_index, index)
+        valid = cells >= offset
+        tile = tiles_at(grid, cols, rows, layers)
+        along_center = along_offset + index * tile_size
+        coin = (valid & (tile == TileType.COIN) & near_across &
+                (lo <= along_center + detection_size) & (hi >= along_center - detection_size))
+        for events, found in ((coins, coin), (goals, valid & (tile == TileType.GOAL))):
+            players = np.flatnonzero(found)
+            events.append((players, cols[players], rows[players]))
+    return (tuple(np.concatenate(part) for part in zip(*coins)),
+            tuple(np.concatenate(part) for part in zip(*goals)))
+
+def ray_setup(x, z, dx, dz, grid_offset_x: float, grid_offset_z: float, tile_size: float) -> list[tuple]:
+    """
+    グリッドDDAの初期値を求める（スカラーと配列の両方に対応）
+    戻り値は 各軸の (開始マス, 進む向き, 次の境界までの距離, 1マス進む距離)
+    """
+    with np.errstate(divide='ignore'):
+        result = []
+        for position, offset, delta in ((x, grid_offset_x, dx), (z, grid_offset_z, dz)):
+            # マスの境界が整数になる座標系
+            grid_position = (np.asarray(position, dtype=float) - offset) / tile_size + 0.5
+            cell = np.floor(grid_position).astype(np.intp)
+            step = np.where(np.asarray(delta) > 0, 1, -1)
+            delta = np.abs(np.asarray(delta, dtype=float))
+            boundary = np.where(step > 0, cell + 1 - grid_position, grid_position - cell)
+            # 軸に平行な光線はその軸の境界に到達しない
+            t_delta = np.where(delta > 0, tile_size / delta, np.inf)
+            t_max = np.where(delta > 0, boundary * t_delta, np.inf)
+            result.append((cell, step, t_max, t_delta))
+    return result
+
+def march_rays(grid, setup: list[tuple], max_dist: float, active: np.ndarray,
+               layers: np.ndarray = None) -> tuple[np.ndarray, ...]:
+    """
+    ray_setup()で求めた光線（activeがTrueのもの）を、壁に当たるかマップの外に出るか距離がmax_distを越えるまで進める
+    全光線を配列のまま1マスずつ進めるため、ループ回数は最も長い光線が通過するマス数になる
+    戻り値は (壁に当たったか, 最後に調べたマスのcols, rows, 距離, 最後に越えた境界の軸) の配列で、
+    軸はX方向なら0、Z方向なら1、始点のマスから進まなかった光線は-1
+    """
+    (cols, step_x, t_max_x, t_delta_x), (rows, step_z, t_max_z, t_delta_z) = setup
+    cols, rows, t_max_x, t_max_z = cols.copy(), rows.copy(), t_max_x.copy(), t_max_z.copy()
+    height, width = grid.shape[-2:]
+    count = len(cols)
+    active = active.copy()
+    hit = np.zeros(count, dtype=bool)
+    axes = np.full(count, -1, dtype=np.int8)
+    distances = np.zeros(count)
+    while active.any():
+        active &= (0 <= cols) & (cols < width) & (0 <= rows) & (rows < height) & (distances <= max_dist)
+        wall = np.zeros(count, dtype=bool)
+        wall[active] = tiles_at(grid, cols[active], rows[active],
+                                None if layers is None else layers[active]) == TileType.WALL
+        hit |= wall
+        active &= ~wall
+
+        # 近い方の境界を越えて隣のマスへ進む
+        move_x = active & (t_max_x < t_max_z)
+        move_z = active & ~move_x
+        distances[move_x], distances[move_z] = t_max_x[move_x], t_max_z[move_z]
+        cols[move_x] += step_x[move_x]
+        rows[move_z] += step_z[move_z]
+        t_max_x[move_x] += t_delta_x[move_x]
+        t_max_z[move_z] += t_delta_z[move_z]
+        axes[move_x], axes[move_z] = 0, 1
+    return hit, cols, rows, distances, axes
+
+def find_destroyable_walls(grid, x: np.ndarray, z: np.ndarray, yaw: np.ndarray,
+                           grid_offset_x: float, grid_offset_z: float, tile_size: float,
+                           layers: np.ndarray = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    位置(x, z)から向きyawへ光線を飛ばし、1マス以内で当たった壁が壊せるかを求める
+    外周の壁と、通路(' 'または'.')に接していない壁は壊せない
+    戻り値は (壊せる壁があるか, 当たった壁のcols, rows) の配列
+    """
+    setup = ray_setup(x, z, np.cos(yaw), np.sin(yaw), grid_offset_x, grid_offset_z, tile_size)
+    hit, cols, rows, _, _ = march_rays(grid, setup, tile_size, np.ones(len(x), dtype=bool), layers)
+    # 端の壁はスキップ
+    height, width = grid.shape[-2:]
+    hit &= (0 < cols) & (cols < width - 1) & (0 < rows) & (rows < height - 1)
+    # 隣接が ' ' または '.' の場所があるかチェック
+    open_neighbor = np.zeros(len(hit), dtype=bool)
+    for dx, dz in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+        tiles = tiles_at(grid, cols + dx, rows + dz, layers)
+        open_neighbor |= (tiles == TileType.EMPTY) | (tiles == TileType.COIN)
+    return hit & open_neighbor, cols, rows
 
 class Map:
     """
     迷路やコインの配置、スタート・ゴール位置を管理。
 
     Members:
-        map_data (list[str]): 壁や床を文字で定義したマップデータ。
+        grid (np.ndarray|PackedTileGrid): タイルコード(TileType)を格納した (rows, cols) のuint8配列。マップの実体。
+            大きな迷路では、壁を1マス1ビットで持つPackedTileGridになる（同じ添字で読み書きできる）。
+        rows (int): マップの行数。
+        cols (int): マップの列数。
+        tile_counts (np.ndarray): タイルコードごとのマス数。gridの更新に合わせて維持される。
+        map_data (list[str]): 壁や床を文字で定義したマップデータ（gridから生成する互換用ビュー）。
         tile_size (float): マップ1マスのサイズ。
         origin_pos (list[float]): マップ描画基点(ワールド座標)。
         camera_position (np.ndarray): カメラの現在位置を反映する。
-        sphere_positions (list[np.ndarray]): ステージ上の球体の座標リスト。
-        floor_objects (list[Plane]): 床オブジェクトのリスト。
-        wall_positions (list[np.ndarray]): 壁の位置座標リスト。
+        coins (CoinIndex): コインのあるマスの索引。コイン取得判定と近傍検索に使う。
+        sphere_positions (list[list[float]]): ステージ上の球体の座標リスト（coinsから生成）。
+        floor_objects (list[Plane]): 床オブジェクトのリスト（初回アクセス時に生成）。
+        version (int): マップが変更されるたびに増えるカウンタ。キャッシュの無効化に使う。
+        pending_changes (list[MapChange]): まだ取り出されていない変更のリスト。
+        edits (list[MapChange]): 生成・読み込み時の状態から加えられた変更のリスト（restore_pristine()で元に戻す）。
+        spec (MazeSpec|None): 迷路の生成条件。シードから再現できない迷路ではNone。
+        wall_positions (list[list[float]]): 壁の位置座標リスト（gridから生成）。
         start_position (list[float]): スタート位置の座標。
         goal_position (list[float]): ゴール位置の座標。
 
     Methods:
         generate_maze_map(): 迷路を生成してMapインスタンスを返す。
+        export_geometry(): 壁グループとチャンクメッシュを保存用の配列として返す（ビット詰めのグリッドでは使えない）。
+        import_geometry(): 保存済みの壁グループとチャンクメッシュを読み込む。
+        save(): マップをバイナリファイルに保存する。
+        load(): バイナリファイルからMapインスタンスを作る。
         __init__(): コンストラクタ。
-        _process_map(): マップデータからオブジェクト生成。
-        get_wall_groups(): 隣接する壁をグループ化。
+        _find_tile(): 指定したタイルコードの最初のマスを返す。
+        _process_map(): マップデータからスタート・ゴール位置を求める。
+        _grid_bands(): グリッドを行の帯ごとにuint8で返す。
+        _wall_cells(): 壁（または壁以外）のマスを行の帯ごとに調べて返す。
+        _build_floor_objects(): 全マスの床オブジェクトを生成。
+        get_floor_height(): 床面のY座標を返す。
+        _make_floor_object(): 1マス分の床オブジェクトを生成。
+        world_to_grid(): ワールド座標をグリッド座標に変換（配列にも対応）。
+        grid_to_world(): グリッド座標をタイル中心のワールド座標に変換（配列にも対応）。
+        is_in_bounds(): グリッド座標がマップ範囲内かを判定。
+        get_tile(): 指定マスのタイルコードを返す。
+        set_tile(): 指定マスのタイルコードを書き換え、タイル数を更新する。
+        remove_coin(): 指定マスのコインを取り除き、変更を記録する。
+        remove_wall(): 指定マスの壁を取り除き、床と壁グループだけを更新して変更を記録する。
+        drain_changes(): 記録された変更を取り出してクリアする。
+        restore_pristine(): 加えられた変更を元に戻し、生成・読み込み時の状態にする。
+        replay_edits(): 記録しておいた変更を順に加え直す。
+        update_focus(): プレイヤーの位置に合わせてマップを更新する（固定の迷路では何もしない）。
+        _build_coin_index(): グリッドからコインの索引を作る。
+        get_coin_positions(): コインのあるマスと球体の座標の対応を返す。
+        get_coins_near(): 指定座標の近くにあるコインを返す。
+        get_wall_groups(): 隣接する壁を連結成分ラベリングでグループ化（ビット詰めのグリッドでは使えない）。
+        cells_to_positions(): フラットインデックスの配列をワールド座標リストに変換。
+        _wall_hidden_faces(): グリッドを引いて壁マスごとの描画不要な面を求める。
+        _build_wall(): 壁マス群から隠れる面を除いたWallオブジェクトを生成。
         get_draw_objects(): 描画オブジェクトのリストを返す。
+        get_chunk_grid(): 床・壁をチャンク単位にまとめたChunkGridを返す。
         get_floor_objects(): 床オブジェクトのリストを返す。
         get_wall_objects(): 壁オブジェクトのリストを返す。
         get_sphere_objects(): Sphereオブジェクトのリストを返す。
@@ -34,35 +395,181 @@ class Map:
         is_position_passable(): 指定された座標が移動可能かどうかを確認。
         check_coin_collection(): コイン取得判定を行う。
         check_goal_reached(): カメラ位置がゴールタイル上にあるかを判定。
+        raycast(): 光線が最初に当たる壁のマス・面・距離をグリッドDDAで求める。
+        raycast_batch(): 複数の光線をまとめてraycast()する。
+        find_destroyable_wall(): 正面1マス以内にある、壊せる壁のマスを返す。
+        _sweep_axis(): 1軸方向の移動を、通過するマスだけを調べて壁の手前で止める。
+        _collect_path_events(): 移動経路上のコインとゴールのマスを記録する。
+        sweep_move(): 半径付きのプレイヤーの移動を壁に沿って解決し、通過したコイン・ゴールを返す。
         set_camera_position_and_check_coin_collection(): カメラの新しい位置を設定し、衝突判定とコイン取得判定を行う。
+        _padded_index(): 距離場のフラット配列でのマスのインデックスを返す。
+        _build_goal_distance(): ゴールからの幅優先探索の距離場を計算。
+        _open_distance_cell(): 通路になったマスから距離場を差分更新する。
+        get_goal_distance_field(): ゴールからの距離場を返す。
+        get_goal_distance(): マスからゴールまでの距離をO(1)で返す。
+        get_next_step_to_goal(): ゴールへ最短で向かう隣のマスを返す。
+        get_path_to_goal(): ゴールまでの最短経路を返す。
         get_remaining_coins(): 残りのコイン数を返す。
         get_camera_position(): 現在のカメラの位置を取得。
     """
+    # マス数がこれを超える迷路は、生成したビット詰めのグリッドを展開せずにそのまま使う
+    PACKED_GRID_CELLS = 1 << 22
+    # グリッド全体を調べる処理で、一度にuint8に展開する行の帯のマス数
+    BAND_CELLS = 1 << 20
+
     @classmethod
     def generate_maze_map(cls, width, height, origin_pos, tile_size, 
                          coin_count=None, strategy=StartEndStrategy.DIAGONAL,
-                         start_pos=None, end_pos=None, min_distance=None):
-        """迷路を生成してMapインスタンスを返す"""
+                         start_pos=None, end_pos=None, min_distance=None,
+                         seed=None, rng=None, cache=None,
+                         algorithm=MazeAlgorithm.DEPTH_FIRST):
+        """
+        迷路を生成してMapインスタンスを返す
+        seedを指定すると同じ迷路を再現でき、さらにcache(MazeCache)を渡すと
+        生成済みのグリッドと静的メッシュをディスクから読み込んで生成・構築を省略する
+        大きな迷路はalgorithmにMazeAlgorithm.KRUSKALを指定すると速く生成できる
+        """
+        spec = None
+        if seed is not None and rng is None and start_pos is None and end_pos is None:
+            spec = MazeSpec(width, height, coin_count, strategy, min_distance, seed, algorithm)
+        key = None
+        if cache is not None and seed is not None:
+            key = cache.make_key(seed, (width, height), strategy, coin_count, tile_size, origin_pos,
+                                 start_pos=start_pos, end_pos=end_pos, min_distance=min_distance,
+                                 algorithm=algorithm.value)
+            cached = cache.load(key, origin_pos, tile_size, map_class=cls)
+            if cached is not None:
+                cached.spec = spec
+                return cached
+
         generator = MazeGenerator(width, height)
-        map_data = generator.generate(
+        map_data = generator.generate_grid(
             coin_count=coin_count,
             strategy=strategy,
             start_pos=start_pos,
             end_pos=end_pos,
-            min_distance=min_distance
+            min_distance=min_distance,
+            seed=seed,
+            rng=rng,
+            algorithm=algorithm
         )
-        return cls(map_data, origin_pos, tile_size)
+        # 小さな迷路は高速に参照できるuint8のグリッドに展開する
+        if map_data.rows * map_data.cols <= cls.PACKED_GRID_CELLS:
+            map_data = np.asarray(map_data)
+        instance = cls(map_data, origin_pos, tile_size)
+        instance.spec = spec
+        if key is not None:
+            cache.store(key, instance)
+        return instance
+
+    def export_geometry(self, chunk_size: int = 8) -> dict[str, np.ndarray]:
+        """
+        壁グループとチャンクメッシュを事前計算し、名前付きの配列として返す（保存用）
+        壁グループは wall_cells / wall_offsets、チャンクメッシュは BakedMeshes.ARRAY_NAMES の名前になる
+        ビット詰めのグリッドでは全体の壁グループとメッシュが大きくなりすぎるため、ValueErrorを送出する
+        """
+        from chunk import BakedMeshes, ChunkGrid
+        if isinstance(self.grid, PackedTileGrid):
+            raise ValueError("geometry cannot be exported for a PackedTileGrid map")
+        groups = self.get_wall_groups()
+        arrays = {
+            'wall_cells': np.concatenate(groups) if groups else np.zeros(0, dtype=np.int64),
+            'wall_offsets': np.cumsum([0] + [len(group) for group in groups], dtype=np.int64),
+        }
+        chunk_grid = self._chunk_grid
+        if chunk_grid is None or chunk_grid.is_streaming() or chunk_grid.chunk_size != chunk_size:
+            chunk_grid = ChunkGrid(self, chunk_size)
+        arrays.update(BakedMeshes.from_chunk_grid(chunk_grid).to_arrays())
+        return arrays
+
+    def import_geometry(self, arrays: dict[str, np.ndarray], chunk_size: int):
+        """
+        export_geometry()で作った配列を読み込み、壁グループとチャンクメッシュを再計算せずに使う
+        壁が壊されると、影響する部分のみグリッドから作り直される
+        """
+        from chunk import BakedMeshes
+        if 'wall_cells' in arrays:
+            cells, offsets = arrays['wall_cells'], arrays['wall_offsets'].tolist()
+            self._saved_wall_groups = [cells[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+        if all(name in arrays for name in BakedMeshes.ARRAY_NAMES):
+            self._baked_meshes = BakedMeshes(chunk_size, *(arrays[name] for name in BakedMeshes.ARRAY_NAMES))
+
+    def save(self, path, include_geometry: bool = False, chunk_size: int = 8):
+        """
+        マップをバイナリファイルに保存する（形式はmaze_fileを参照）
+        include_geometryがTrueなら、壁グループとチャンクメッシュも事前計算して保存する
+        """
+        from maze_file import write_maze_file
+        write_maze_file(path, self.grid, self.tile_size, self.origin_pos,
+                        start=self._find_tile(TileType.START), goal=self._find_tile(TileType.GOAL),
+                        coins=np.array(list(self.coins.positions), dtype=np.int32).reshape(-1, 2),
+                        tile_counts=self.tile_counts,
+                        chunk_size=chunk_size if include_geometry else None,
+                        extra_sections=self.export_geometry(chunk_size) if include_geometry else None)
+
+    @classmethod
+    def load(cls, path) -> 'Map':
+        """
+        save()で保存したファイルからMapを作る
+        グリッドと事前計算の配列はnp.memmapで開き、タイル数・スタート・ゴールはファイルに保存した値を使うため、
+        大きな迷路でもグリッドを走査せずにすぐ開ける
+        """
+        from maze_file import read_maze_file
+        maze_file = read_maze_file(path)
+        instance = cls(maze_file['grid'], maze_file.origin_pos, maze_file.tile_size,
+                       coin_cells=maze_file['coins'],
+                       tile_counts=maze_file['tile_counts'] if 'tile_counts' in maze_file else None,
+                       start=maze_file.start, goal=maze_file.goal)
+        if maze_file.chunk_size is not None:
+            instance.import_geometry(maze_file.sections, maze_file.chunk_size)
+        return instance
 
-    def __init__(self, map_data: list[str], origin_pos: list[float], tile_size: float):
-        self.map_data = map_data
+    def __init__(self, map_data: list[str] | np.ndarray, origin_pos: list[float], tile_size: float,
+                 coin_cells: np.ndarray = None, tile_counts: np.ndarray = None,
+                 start: tuple[int, int] = None, goal: tuple[int, int] = None):
+        # 文字列のマップデータはタイルコードのグリッドに変換して保持する
+        # ファイルのヘッダーなどでタイル数・スタート・ゴールが分かっている場合は、グリッドを走査しない
+        if isinstance(map_data, (np.memmap, PackedTileGrid)):
+            # ファイルからコピーオンライトで開いたグリッドと、ビット詰めのグリッドはコピーせずに使う
+            self.grid = map_data
+        elif isinstance(map_data, np.ndarray):
+            self.grid = map_data.astype(np.uint8, copy=True)
+        else:
+            self.grid = rows_to_grid(map_data)
+        self.rows, self.cols = self.grid.shape
         self.origin_pos = origin_pos
         self.tile_size = tile_size
-        self.floor_objects = []
-        self.wall_positions = []
-        self.sphere_positions = []
+        # マス(0, 0)の中心のワールド座標（マップの中心を原点に合わせる）
+        self.grid_offset_x = -self.cols * tile_size / 2
+        self.grid_offset_z = -self.rows * tile_size / 2
+        if tile_counts is not None:
+            self.tile_counts = np.array(tile_counts, dtype=np.int64)
+        elif isinstance(self.grid, PackedTileGrid):
+            self.tile_counts = self.grid.count_tiles()
+        else:
+            self.tile_counts = np.bincount(self.grid.ravel(), minlength=len(TileType))
+        self._passable_lut = _PASSABLE_LUT
+        self.coins = self._build_coin_index(coin_cells)
+        # 床・壁オブジェクトは最初に要求された時に生成する
+        self._floor_objects = None
+        self._floor_index = None
+        self._chunk_grid = None
+        # 壁オブジェクトは変更のあったグループのみ作り直す
+        self._wall_objects = None
+        self._wall_owner = None
+        # ファイルから読み込んだ壁グループとチャンクメッシュ（壁が壊されるまで有効）
+        self._saved_wall_groups = None
+        self._baked_meshes = None
+        # ゴールからの距離場（外周1マスを含むフラット配列、最初に要求された時に計算する）
+        self._goal_distance = None
+        self._distance_passable = None
+        self.version = 0
+        self.pending_changes = []
+        self.edits = []
+        self.spec = None
         self.camera_position = None  # 初期化時にはNoneに設定
         self.start_position = None   # スタート位置を保存する変数を追加
-        self._process_map()
+        self._process_map(start, goal)
         
         # スタート位置が見つかった場合、カメラの初期位置として設定
         if self.start_position:
@@ -70,122 +577,367 @@ class Map:
         else:
             self.camera_position = origin_pos.copy()
 
-    def _process_map(self):
-        rows = len(self.map_data)
-        cols = len(self.map_data[0])
-        
-        # マップの中心を原点に合わせるためのオフセットを計算
-        offset_x = -cols * self.tile_size / 2
-        offset_z = -rows * self.tile_size / 2
-
-        for row in range(rows):
-            for col in range(cols):
-                # タイル位置を計算（原点を中心とした配置）
-                x = offset_x + col * self.tile_size
-                z = offset_z + row * self.tile_size
-
-                tile = self.map_data[row][col]
-                if tile == '#':
-                    self.wall_positions.append([x, self.origin_pos[1], z])
-                elif tile == '.':
-                    self.sphere_positions.append([x, self.origin_pos[1] - 10, z])
-                    self.floor_objects.append(
-                        Plane([x, 50, z],
-                              width=self.tile_size,
-                              height=self.tile_size,
-                              color=pyxel.COLOR_NAVY if (row + col) % 2 == 0 else pyxel.COLOR_GRAY)
-                    )
-                elif tile == 's':
-                    # スタート位置を記録（原点からの相対位置）
-                    self.start_position = [x, -5, z]
-                    self.floor_objects.append(
-                        EdgePlane([x, 50, z],
-                                    width=self.tile_size,
-                                    height=self.tile_size,
-                                    center_color=pyxel.COLOR_LIGHT_BLUE,
-                                    edge_color=pyxel.COLOR_NAVY if (row + col) % 2 == 0 else pyxel.COLOR_GRAY,
-                                    edge_width=10)
-                    )
-                elif tile == 'g':
-                    # ゴール位置を記録
-                    self.goal_position = [x, self.origin_pos[1] - 10, z]
-                    # ゴール位置にも床を配置
-                    self.floor_objects.append(
-                        EdgePlane([x, 50, z],
-                                    width=self.tile_size,
-                                    height=self.tile_size,
-                                    center_color=pyxel.COLOR_YELLOW,
-                                    edge_color=pyxel.COLOR_NAVY if (row + col) % 2 == 0 else pyxel.COLOR_GRAY,
-                                    edge_width=10)
-                    )
-                else:  # 空白の場合
-                    self.floor_objects.append(
-                        Plane([x, 50, z],
-                              width=self.tile_size,
-                              height=self.tile_size,
-                              color=pyxel.COLOR_NAVY if (row + col) % 2 == 0 else pyxel.COLOR_GRAY)
-                    )
-
-    def get_wall_groups(self) -> list[list[list[float]]]:
-        """隣接する壁をグループ化"""
-        visited = set()
-        wall_groups = []
-        
-        def get_neighbors(pos):
-            x, y, z = pos
-            neighbors = []
-            for wall_pos in self.wall_positions:
-                if tuple(wall_pos) not in visited and \
-                   ((abs(wall_pos[0] - x) == self.tile_size and wall_pos[2] == z) or
-                    (abs(wall_pos[2] - z) == self.tile_size and wall_pos[0] == x)):
-                    neighbors.append(wall_pos)
-            return neighbors
-
-        for wall_pos in self.wall_positions:
-            if tuple(wall_pos) in visited:
-                continue
-                
-            # 新しいグループを開始
-            group = [wall_pos]
-            visited.add(tuple(wall_pos))
-            stack = get_neighbors(wall_pos)
-            
-            while stack:
-                current = stack.pop()
-                if tuple(current) not in visited:
-                    group.append(current)
-                    visited.add(tuple(current))
-                    stack.extend(get_neighbors(current))
-            
-            wall_groups.append(group)
-        
-        return wall_groups
+    @property
+    def map_data(self) -> list[str]:
+        """文字列のリスト形式のマップデータ（互換用、呼び出しごとにgridから生成）"""
+        return grid_to_rows(np.asarray(self.grid))
+
+    @property
+    def wall_positions(self) -> list[list[float]]:
+        """壁の位置座標リスト"""
+        rows, cols = np.divmod(self._wall_cells(), self.cols)
+        x, z = self.grid_to_world(cols, rows)
+        return np.column_stack([x, np.full(len(x), self.origin_pos[1]), z]).tolist()
+
+    @property
+    def sphere_positions(self) -> list[list[float]]:
+        """コイン(球体)の位置座標リスト"""
+        return list(self.coins.positions.values())
+
+    @property
+    def floor_objects(self) -> list[Plane]:
+        """床オブジェクトのリスト（初回アクセス時に生成）"""
+        if self._floor_objects is None:
+            self._build_floor_objects()
+        return self._floor_objects
+
+    def _find_tile(self, tile: TileType) -> tuple[int, int] | None:
+        """指定したタイルコードの最初のマス(col, row)を返す。無ければNone"""
+        if isinstance(self.grid, PackedTileGrid):
+            cells = self.grid.find(tile)
+        else:
+            cells = np.argwhere(self.grid == tile)
+        if len(cells) == 0:
+            return None
+        return int(cells[0][1]), int(cells[0][0])
+
+    def _process_map(self, start: tuple[int, int] = None, goal: tuple[int, int] = None):
+        """
+        スタート・ゴール位置を求める。マス(col, row)が渡されなかった場合は、
+        タイル数から存在すると分かっている場合のみグリッドを走査して探す
+        """
+        # スタート位置を記録（原点からの相対位置）
+        if start is None and self.tile_counts[TileType.START] > 0:
+            start = self._find_tile(TileType.START)
+        if start is not None:
+            x, z = self.grid_to_world(*start)
+            self.start_position = [x, self.origin_pos[1] - 5, z]
+        # ゴール位置を記録
+        if goal is None and self.tile_counts[TileType.GOAL] > 0:
+            goal = self._find_tile(TileType.GOAL)
+        if goal is not None:
+            x, z = self.grid_to_world(*goal)
+            self.goal_position = [x, self.origin_pos[1] - 10, z]
+
+    def _grid_bands(self):
+        """
+        グリッドを行の帯ごとに (先頭の行, uint8のタイルグリッド) として返す
+        ビット詰めのグリッドも帯ごとに展開するため、全体を一度にuint8へ展開しない
+        """
+        band_rows = max(1, self.BAND_CELLS // max(self.cols, 1))
+        for r0 in range(0, self.rows, band_rows):
+            yield r0, self.grid[r0:r0 + band_rows, :]
+
+    def _wall_cells(self, wall: bool = True) -> np.ndarray:
+        """壁（wallがFalseなら壁以外）のマスのフラットインデックスを、行の帯ごとに調べて返す"""
+        cells = [np.flatnonzero((band == TileType.WALL) == wall) + r0 * self.cols
+                 for r0, band in self._grid_bands()]
+        return np.concatenate(cells) if cells else np.zeros(0, dtype=np.intp)
+
+    def _build_floor_objects(self):
+        """壁以外の全マスの床オブジェクトを生成"""
+        self._floor_objects = []
+        self._floor_index = np.full(self.grid.shape, -1, dtype=np.int32)
+        rows, cols = np.divmod(self._wall_cells(wall=False), self.cols)
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            self._floor_index[row, col] = len(self._floor_objects)
+            self._floor_objects.append(self._make_floor_object(col, row))
+
+    def get_floor_height(self) -> float:
+        """床面のY座標を返す（壁の下端。階を重ねる場合もorigin_posからの相対位置になる）"""
+        return self.origin_pos[1] + self.tile_size / 2
+
+    def _make_floor_object(self, col: int, row: int) -> Plane:
+        """1マス分の床オブジェクトを生成"""
+        x, z = self.grid_to_world(col, row)
+        y = self.get_floor_height()
+        tile = self.grid[row, col]
+        edge_color = pyxel.COLOR_NAVY if (row + col) % 2 == 0 else pyxel.COLOR_GRAY
+        if tile == TileType.START:
+            return EdgePlane([x, y, z],
+                             width=self.tile_size,
+                             height=self.tile_size,
+                             center_color=pyxel.COLOR_LIGHT_BLUE,
+                             edge_color=edge_color,
+                             edge_width=10)
+        if tile == TileType.GOAL:
+            # ゴール位置にも床を配置
+            return EdgePlane([x, y, z],
+                             width=self.tile_size,
+                             height=self.tile_size,
+                             center_color=pyxel.COLOR_YELLOW,
+                             edge_color=edge_color,
+                             edge_width=10)
+        if tile in (TileType.STAIRS_UP, TileType.STAIRS_DOWN):
+            # 階段の位置（下りの階段はチャンクでは床を張らず開口部になる）
+            return EdgePlane([x, y, z],
+                             width=self.tile_size,
+                             height=self.tile_size,
+                             center_color=pyxel.COLOR_LIME if tile == TileType.STAIRS_UP else pyxel.COLOR_PINK,
+                             edge_color=edge_color,
+                             edge_width=10)
+        # 空白・コインの場合
+        return Plane([x, y, z],
+                     width=self.tile_size,
+                     height=self.tile_size,
+                     color=edge_color)
+
+    def world_to_grid(self, x, z):
+        """
+        ワールド座標(x, z)をグリッド座標(col, row)に変換
+        スカラーならintのタプル、配列なら整数配列のタプルを返す
+        """
+        return (world_to_cell(x, self.grid_offset_x, self.tile_size),
+                world_to_cell(z, self.grid_offset_z, self.tile_size))
+
+    def grid_to_world(self, col, row):
+        """グリッド座標(col, row)をタイル中心のワールド座標(x, z)に変換（配列にも対応）"""
+        return (self.grid_offset_x + col * self.tile_size,
+                self.grid_offset_z + row * self.tile_size)
+
+    def is_in_bounds(self, col, row):
+        """グリッド座標がマップ範囲内かを判定（配列にも対応）"""
+        return (0 <= col) & (col < self.cols) & (0 <= row) & (row < self.rows)
+
+    def get_tile(self, col: int, row: int) -> int | None:
+        """指定マスのタイルコードを返す。範囲外ならNone"""
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return self.grid[row, col]
+        return None
+
+    def set_tile(self, col: int, row: int, tile: TileType):
+        """指定マスのタイルコードを書き換え、タイル数を更新する"""
+        old = self.grid[row, col]
+        self.tile_counts[old] -= 1
+        self.tile_counts[tile] += 1
+        self.grid[row, col] = tile
+
+    def _record_change(self, kind: MapChangeKind, col: int, row: int) -> MapChange:
+        """バージョンを進めて変更を記録"""
+        self.version += 1
+        change = MapChange(kind, col, row, self.version)
+        self.pending_changes.append(change)
+        self.edits.append(change)
+        return change
+
+    def remove_coin(self, col: int, row: int) -> MapChange | None:
+        """
+        指定マスのコインを取り除く
+        コインが無ければNoneを返し、マップは変更しない
+        """
+        if not self.coins.remove((col, row)):
+            return None
+        self.set_tile(col, row, TileType.EMPTY)
+        # 該当マスの床のみ差し替える（コインは静的ジオメトリに含まれないためチャンクはそのまま）
+        if self._floor_objects is not None:
+            self._floor_objects[self._floor_index[row, col]] = self._make_floor_object(col, row)
+        return self._record_change(MapChangeKind.COIN_REMOVED, col, row)
+
+    def remove_wall(self, col: int, row: int) -> MapChange | None:
+        """
+        指定マスの壁を取り除いて通路にする
+        新しい床を1枚追加し、壁オブジェクトは該当マスを含むグループのみ作り直す
+        チャンクは該当マスに接するものだけを再構築対象にする
+        壁が無ければNoneを返し、マップは変更しない
+        """
+        if self.get_tile(col, row) != TileType.WALL:
+            return None
+        self.set_tile(col, row, TileType.EMPTY)
+        # ファイルから読み込んだ壁グループは使えなくなる
+        self._saved_wall_groups = None
+        if self._floor_objects is not None:
+            self._floor_index[row, col] = len(self._floor_objects)
+            self._floor_objects.append(self._make_floor_object(col, row))
+        # 該当マスを含むチャンクのみ再構築対象にする
+        if self._chunk_grid is not None:
+            self._chunk_grid.mark_dirty(col, row)
+        else:
+            self._baked_meshes = None
+        if self._goal_distance is not None:
+            self._open_distance_cell(col, row)
+
+        if self._wall_objects is not None:
+            owner = self._wall_owner[row, col]
+            self._wall_owner[row, col] = -1
+            cells = np.flatnonzero(self._wall_owner.ravel() == owner)
+            self._wall_objects[owner] = self._build_wall(cells) if len(cells) else None
+        return self._record_change(MapChangeKind.WALL_REMOVED, col, row)
+
+    def drain_changes(self) -> list[MapChange]:
+        """記録された変更を古い順に取り出してクリアする"""
+        changes = self.pending_changes
+        self.pending_changes = []
+        return changes
+
+    def restore_pristine(self):
+        """
+        取得されたコインと壊された壁を新しい順に元に戻し、生成・読み込み時のマップにする
+        グリッドは変更のあったマスのみ書き戻し、チャンクは変更前のメッシュを使い回すため、処理量は変更の数に比例する
+        カメラの位置もスタート位置に戻す（未取り出しの変更は破棄する）
+        """
+        restored_walls = []
+        for change in reversed(self.edits):
+            if change.kind == MapChangeKind.COIN_REMOVED:
+                self.set_tile(change.col, change.row, TileType.COIN)
+                x, z = self.grid_to_world(change.col, change.row)
+                self.coins.add((change.col, change.row), [x, self.origin_pos[1] - 10, z])
+            elif change.kind == MapChangeKind.WALL_REMOVED:
+                self.set_tile(change.col, change.row, TileType.WALL)
+                restored_walls.append((change.col, change.row))
+        self.edits = []
+        self.pending_changes = []
+        self.version += 1
+
+        if restored_walls:
+            # 壁の有無に依存する索引は、次に要求された時に作り直す
+            self._floor_objects = None
+            self._floor_index = None
+            self._wall_objects = None
+            self._wall_owner = None
+            self._goal_distance = None
+            self._distance_passable = None
+            if self._chunk_grid is not None:
+                self._chunk_grid.restore_pristine(restored_walls)
+        if self.start_position:
+            self.camera_position = self.start_position.copy()
+
+    def replay_edits(self, edits):
+        """
+        (MapChangeKind, col, row) の列を古い順に加え直す（保存しておいた変更から途中の状態を再現する）
+        加えた変更はpending_changesにも記録される
+        """
+        for kind, col, row in edits:
+            if kind == MapChangeKind.COIN_REMOVED:
+                self.remove_coin(col, row)
+            elif kind == MapChangeKind.WALL_REMOVED:
+                self.remove_wall(col, row)
+            else:
+                raise ValueError(f"cannot replay {kind}")
+
+    def update_focus(self, x: float, z: float) -> bool:
+        """
+        プレイヤーのワールド座標(x, z)に合わせてマップを更新し、更新したかを返す
+        大きさの決まった迷路では何もしない（EndlessMapが行を追加するために上書きする）
+        """
+        return False
+
+    def _build_coin_index(self, coin_cells: np.ndarray = None) -> CoinIndex:
+        """
+        グリッド上のコインから、マス座標で引けるコインの索引を作る
+        コインのマス(col, row)の配列が与えられた場合はグリッドを走査しない
+        """
+        if coin_cells is None and isinstance(self.grid, PackedTileGrid):
+            rows, cols = self.grid.find(TileType.COIN).T
+        elif coin_cells is None:
+            rows, cols = np.nonzero(self.grid == TileType.COIN)
+        else:
+            coin_cells = np.asarray(coin_cells, dtype=np.intp).reshape(-1, 2)
+            cols, rows = coin_cells[:, 0], coin_cells[:, 1]
+        x, z = self.grid_to_world(cols, rows)
+        return CoinIndex({(col, row): [px, self.origin_pos[1] - 10, pz]
+                          for col, row, px, pz in zip(cols.tolist(), rows.tolist(), x.tolist(), z.tolist())})
+
+    def get_coin_positions(self) -> dict[tuple[int, int], list[float]]:
+        """コインのあるマス(col, row)と球体の座標の対応を返す"""
+        return dict(self.coins.positions)
+
+    def get_coins_near(self, x: float, z: float, radius: float) -> dict[tuple[int, int], list[float]]:
+        """ワールド座標(x, z)から半径radius以内にあるコインのマスと球体の座標を返す"""
+        col, row = self.world_to_grid(x, z)
+        return {cell: self.coins.positions[cell]
+                for cell in self.coins.query(col, row, radius / self.tile_size)}
+
+    def get_wall_groups(self) -> list[np.ndarray]:
+        """
+        隣接する壁をグループ化
+        各グループは壁マスのフラットインデックス(row * cols + col)の配列
+        """
+        if self._saved_wall_groups is not None:
+            return self._saved_wall_groups
+        if isinstance(self.grid, PackedTileGrid):
+            # 連結成分ラベリングは全マス分の表を作るため、ビット詰めの大きな迷路では行わない
+            raise ValueError("wall groups are not available for a PackedTileGrid map; draw it with get_chunk_grid()")
+        _, groups = label_connected_cells(self.grid == TileType.WALL)
+        return groups
+
+    def cells_to_positions(self, flat_indices: np.ndarray, y: float) -> list[list[float]]:
+        """フラットインデックスの配列を高さyのワールド座標リストに変換"""
+        rows, cols = np.divmod(flat_indices, self.cols)
+        x, z = self.grid_to_world(cols, rows)
+        return np.column_stack([x, np.full(len(x), y), z]).tolist()
 
     def get_draw_objects(self) -> list:
         """描画オブジェクトのリストを返す"""
-        from wall import Wall
         draw_objects = []
         
         # 床オブジェクトを追加
         draw_objects.extend(self.floor_objects)
         
-        # 壁グループからWallオブジェクトを生成
-        for group in self.get_wall_groups():
-            draw_objects.append(Wall(group, self.tile_size))
+        # 壁グループのWallオブジェクトを追加
+        draw_objects.extend(self.get_wall_objects())
         
         return draw_objects
 
+    def get_chunk_grid(self, chunk_size: int = 8, stream_radius: float = None,
+                       max_resident_chunks: int = None):
+        """
+        床・壁をチャンク単位にまとめたChunkGridを返す（初回呼び出し時に生成）
+        stream_radiusを指定すると、注目点の周囲のみを構築するストリーミングモードになる
+        """
+        if self._chunk_grid is None:
+            from chunk import ChunkGrid
+            self._chunk_grid = ChunkGrid(self, chunk_size, stream_radius, max_resident_chunks,
+                                         baked=self._baked_meshes)
+        return self._chunk_grid
+
     def get_floor_objects(self) -> list:
         """床オブジェクトのリストを返す"""
         return self.floor_objects
 
     def get_wall_objects(self) -> list:
         """壁オブジェクトのリストを返す"""
+        if self._wall_objects is None:
+            self._wall_objects = []
+            self._wall_owner = np.full(self.grid.shape, -1, dtype=np.int32)
+            for group in self.get_wall_groups():
+                self._wall_owner.ravel()[group] = len(self._wall_objects)
+                self._wall_objects.append(self._build_wall(group))
+        return [wall for wall in self._wall_objects if wall is not None]
+
+    def _wall_hidden_faces(self, flat_indices: np.ndarray) -> np.ndarray:
+        """
+        壁マスごとに描画不要な面を求める（FACE_NAMESの順の真偽値配列）
+        隣接マスが壁の面に加え、マップ外周の外向きの面も見えないため除外する
+        """
+        from wall import FACE_NAMES, FACE_NEIGHBOR_OFFSETS
+        rows, cols = np.divmod(flat_indices, self.cols)
+        hidden = np.zeros((len(flat_indices), len(FACE_NAMES)), dtype=bool)
+        for face_index, face_name in enumerate(FACE_NAMES):
+            if face_name in FACE_NEIGHBOR_OFFSETS:
+                dx, dz = FACE_NEIGHBOR_OFFSETS[face_name]
+                neighbor_rows, neighbor_cols = rows + dz, cols + dx
+                # マップの外側は壁とみなす
+                inside = self.is_in_bounds(neighbor_cols, neighbor_rows)
+                solid = np.ones(len(flat_indices), dtype=bool)
+                solid[inside] = self.grid[neighbor_rows[inside], neighbor_cols[inside]] == TileType.WALL
+                hidden[:, face_index] = solid
+        return hidden
+
+    def _build_wall(self, flat_indices: np.ndarray):
+        """フラットインデックスで指定した壁マス群からWallオブジェクトを生成"""
         from wall import Wall
-        wall_objects = []
-        for group in self.get_wall_groups():
-            wall_objects.append(Wall(group, self.tile_size))
-        return wall_objects
+        return Wall(self.cells_to_positions(flat_indices, self.origin_pos[1]), self.tile_size,
+                    hidden_faces=self._wall_hidden_faces(flat_indices))
 
     def get_sphere_objects(self) -> list[Sphere]:
         """Sphereオブジェクトのリストを返す"""
@@ -195,7 +947,7 @@ class Map:
         """スタート位置の座標を返す"""
         if self.start_position:
             return self.start_position.copy()
-        return [0, -5, 0]  # スタート位置が未設定の場合のデフォルト値
+        return [0, self.origin_pos[1] - 5, 0]  # スタート位置が未設定の場合のデフォルト値
 
     def get_initial_view_direction(self) -> tuple[float, float]:
         """
@@ -229,102 +981,233 @@ class Map:
 
     def is_position_passable(self, x: float, z: float) -> bool:
         """指定された座標が移動可能かどうかを確認"""
-        tile_size = self.tile_size
-        offset = tile_size / 2
-        map_x = int((offset + x + len(self.map_data[0]) * tile_size / 2) / tile_size)
-        map_z = int((offset + z + len(self.map_data) * tile_size / 2) / tile_size)
-        if 0 <= map_x < len(self.map_data[0]) and 0 <= map_z < len(self.map_data):
-            return self.map_data[map_z][map_x] in [' ', '.', 's', 'g']
+        col, row = self.world_to_grid(x, z)
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return bool(self._passable_lut[self.grid[row, col]])
         return False
 
+    def _is_near_tile_center(self, x: float, z: float, col: int, row: int, detection_size: float) -> bool:
+        """座標がマス(col, row)の中心からdetection_size以内にあるかを判定"""
+        center_x, center_z = self.grid_to_world(col, row)
+        return abs(x - center_x) <= detection_size and abs(z - center_z) <= detection_size
+
     def check_coin_collection(self, x: float, z: float) -> bool:
         """コイン取得判定を行う"""
-        tile_size = self.tile_size
-        offset = tile_size / 2
-        
-        # マップ座標への変換（is_position_passableと同じ方式）
-        map_x = int((offset + x + len(self.map_data[0]) * tile_size / 2) / tile_size)
-        map_z = int((offset + z + len(self.map_data) * tile_size / 2) / tile_size)
-        
-        # マップ範囲チェック
-        if not (0 <= map_x < len(self.map_data[0]) and 0 <= map_z < len(self.map_data)):
-            return False
-            
-        # タイル内での相対位置を計算（オフセット付き）
-        tile_pos_x = offset + x + len(self.map_data[0]) * tile_size / 2
-        tile_pos_z = offset + z + len(self.map_data) * tile_size / 2
-        local_x = tile_pos_x % tile_size
-        local_z = tile_pos_z % tile_size
-        
-        # 中心からの距離をチェック（タイルサイズの1/4を判定範囲とする）
-        center_x = tile_size / 2
-        center_z = tile_size / 2
-        detection_size = tile_size / 4
-
-        if (abs(local_x - center_x) <= detection_size and 
-            abs(local_z - center_z) <= detection_size):
-            if self.map_data[map_z][map_x] == '.':
-                # マップデータを更新（コインを空白に変更）
-                self.map_data[map_z] = (
-                    self.map_data[map_z][:map_x] + 
-                    ' ' + 
-                    self.map_data[map_z][map_x+1:]
-                )
-                # マップオブジェクトを更新
-                self.floor_objects = []
-                self.wall_positions = []
-                self.sphere_positions = []
-                self._process_map()
-                return True
+        col, row = self.world_to_grid(x, z)
+
+        # コインの索引を直接引き、中心からの距離をチェック（タイルサイズの1/4を判定範囲とする）
+        if ((col, row) in self.coins and
+            self._is_near_tile_center(x, z, col, row, self.tile_size / 4)):
+            # マップデータを更新（コインを空白に変更）
+            self.remove_coin(col, row)
+            return True
         return False
 
     def check_goal_reached(self, x: float, z: float) -> bool:
         """
         カメラ位置がゴールタイル('g')上にあるかを判定
         """
-        tile_size = self.tile_size
-        offset = tile_size / 2
-        map_x = int((offset + x + len(self.map_data[0]) * tile_size / 2) / tile_size)
-        map_z = int((offset + z + len(self.map_data) * tile_size / 2) / tile_size)
-        
-        # タイル内での相対位置を計算（オフセット付き）
-        tile_pos_x = offset + x + len(self.map_data[0]) * tile_size / 2
-        tile_pos_z = offset + z + len(self.map_data) * tile_size / 2
-        local_x = tile_pos_x % tile_size
-        local_z = tile_pos_z % tile_size
-        
+        col, row = self.world_to_grid(x, z)
+
         # 中心からの距離をチェック（タイルサイズの1/2を判定範囲とする）
-        center_x = tile_size / 2
-        center_z = tile_size / 2
-        detection_size = tile_size / 2
-
-        if (0 <= map_x < len(self.map_data[0]) and 0 <= map_z < len(self.map_data) and
-            abs(local_x - center_x) <= detection_size and 
-            abs(local_z - center_z) <= detection_size):
-            return self.map_data[map_z][map_x] == 'g'
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return (self.grid[row, col] == TileType.GOAL and
+                    self._is_near_tile_center(x, z, col, row, self.tile_size / 2))
         return False
 
-    def set_camera_position_and_check_coin_collection(self, x: float, z: float) -> bool:
+    def raycast(self, origin, direction, max_dist: float) -> RayHit | None:
+        """
+        ワールド座標origin(x, z)から方向direction(dx, dz)へ光線を飛ばし、
+        max_dist以内で最初に当たる壁のマス・入った面・距離をグリッドDDAで求める
+        通過するマスのみを順に調べ、壁に当たらないままマップの外に出た場合はNone
+        """
+        length = math.hypot(direction[0], direction[1])
+        if length == 0:
+            return None
+        dx, dz = direction[0] / length, direction[1] / length
+        setup = ray_setup(origin[0], origin[1], dx, dz, self.grid_offset_x, self.grid_offset_z, self.tile_size)
+        (col, step_x, t_max_x, t_delta_x), (row, step_z, t_max_z, t_delta_z) = (
+            tuple(v.item() for v in axis) for axis in setup)
+        face, distance = None, 0.0
+        while 0 <= col < self.cols and 0 <= row < self.rows:
+            if self.grid[row, col] == TileType.WALL:
+                return RayHit(col, row, face, distance)
+            # 近い方の境界を越えて隣のマスへ進む
+            if t_max_x < t_max_z:
+                distance, col, t_max_x = t_max_x, col + step_x, t_max_x + t_delta_x
+                face = 'left' if step_x > 0 else 'right'
+            else:
+                distance, row, t_max_z = t_max_z, row + step_z, t_max_z + t_delta_z
+                face = 'front' if step_z > 0 else 'back'
+            if distance > max_dist:
+                return None
+        return None
+
+    def raycast_batch(self, origins: np.ndarray, directions: np.ndarray, max_dist: float) -> RayHits:
+        """
+        raycast()の複数光線版。origins, directionsは (光線数, 2) の配列
+        全光線を配列のまま1マスずつ進めるため、ループ回数は最も長い光線が通過するマス数になる
+        """
+        from wall import FACE_NAMES
+        origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+        directions = np.asarray(directions, dtype=float).reshape(-1, 2)
+        lengths = np.hypot(directions[:, 0], directions[:, 1])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dx, dz = directions[:, 0] / lengths, directions[:, 1] / lengths
+        setup = ray_setup(origins[:, 0], origins[:, 1], np.nan_to_num(dx), np.nan_to_num(dz),
+                          self.grid_offset_x, self.grid_offset_z, self.tile_size)
+        hit, cols, rows, distances, axes = march_rays(self.grid, setup, max_dist, lengths > 0)
+        # 光線の入った面の、FACE_NAMES上のインデックス
+        (_, step_x, _, _), (_, step_z, _, _) = setup
+        x_faces = np.where(step_x > 0, FACE_NAMES.index('left'), FACE_NAMES.index('right'))
+        z_faces = np.where(step_z > 0, FACE_NAMES.index('front'), FACE_NAMES.index('back'))
+        faces = np.select([axes == 0, axes == 1], [x_faces, z_faces], -1).astype(np.int8)
+        distances[~hit] = np.inf
+        return RayHits(hit, cols, rows, faces, distances)
+
+    def find_destroyable_wall(self, x: float, z: float, yaw: float) -> tuple[int, int] | None:
+        """
+        位置(x, z)から向きyawへ光線を飛ばし、1マス以内で当たった壁が壊せればそのマス(col, row)を返す
+        外周の壁と、通路(' 'または'.')に接していない壁は壊せない
+        """
+        found, cols, rows = find_destroyable_walls(self.grid, np.array([x], dtype=float), np.array([z], dtype=float),
+                                                   np.array([yaw], dtype=float), self.grid_offset_x,
+                                                   self.grid_offset_z, self.tile_size)
+        return (int(cols[0]), int(rows[0])) if found[0] else None
+
+    def _sweep_axis(self, along: float, across: float, delta: float, radius: float,
+                    along_x: bool) -> tuple[float, bool]:
+        """
+        半径radiusのプレイヤーを1軸方向にdeltaだけ動かし、最初にぶつかる壁の手前で止める
+        前縁が新たに入るマスの列（または行）だけを順に調べるため、1マス以上の移動でもすり抜けない
+        along_xがTrueならX方向（列）、FalseならZ方向（行）の移動
+        戻り値は (移動後の座標, 壁にぶつかったか)
+        """
+        result, blocked = sweep_axis(self.grid, np.array([along], dtype=float), np.array([across], dtype=float),
+                                     np.array([delta], dtype=float), radius, along_x,
+                                     self.grid_offset_x, self.grid_offset_z, self.tile_size)
+        return float(result[0]), bool(blocked[0])
+
+    def _collect_path_events(self, start: float, end: float, across: float, along_x: bool,
+                             coin_cells: list, goal_cells: list):
+        """
+        中心が1軸方向にstartからendまで通過したマスを調べ、
+        コインの判定範囲（中心からタイルサイズの1/4）を横切ったコインとゴールのマスを記録する
+        """
+        (_, coin_cols, coin_rows), (_, goal_cols, goal_rows) = collect_path_events(
+            self.grid, np.array([start], dtype=float), np.array([end], dtype=float), np.array([across], dtype=float),
+            along_x, self.grid_offset_x, self.grid_offset_z, self.tile_size)
+        for cells, cols, rows in ((coin_cells, coin_cols, coin_rows), (goal_cells, goal_cols, goal_rows)):
+            for cell in zip(cols.tolist(), rows.tolist()):
+                if cell not in cells:
+                    cells.append(cell)
+
+    def sweep_move(self, x: float, z: float, dx: float, dz: float, radius: float = 0.0) -> MoveResult:
+        """
+        位置(x, z)から(dx, dz)だけ移動させ、壁との衝突を解決する
+        X方向・Z方向の順に移動することで壁に沿って滑り、通過したマスは1度だけ調べる
+        経路上のコインは取得してcoin_cellsとして、通過したゴールはgoal_cellsとして返す
+        """
+        coin_cells, goal_cells = [], []
+
+        new_x, blocked_x = self._sweep_axis(x, z, dx, radius, along_x=True)
+        self._collect_path_events(x, new_x, z, True, coin_cells, goal_cells)
+
+        new_z, blocked_z = self._sweep_axis(z, new_x, dz, radius, along_x=False)
+        self._collect_path_events(z, new_z, new_x, False, coin_cells, goal_cells)
+
+        for col, row in coin_cells:
+            self.remove_coin(col, row)
+        return MoveResult(new_x, new_z, coin_cells, goal_cells, blocked_x, blocked_z)
+
+    def set_camera_position_and_check_coin_collection(self, x: float, z: float, radius: float = 0.0) -> bool:
         """カメラの新しい位置を設定し、衝突判定とコイン取得判定を行う"""
-        is_collected = False
+        result = self.sweep_move(self.camera_position[0], self.camera_position[2],
+                                 x - self.camera_position[0], z - self.camera_position[2], radius)
+        self.camera_position[0] = result.x
+        self.camera_position[2] = result.z
+        return len(result.coin_cells) > 0
 
-        # X方向の移動をチェック
-        if self.is_position_passable(x, self.camera_position[2]):
-            self.camera_position[0] = x
-            if self.check_coin_collection(x, self.camera_position[2]):
-                is_collected = True
-        
-        # Z方向の移動をチェック
-        if self.is_position_passable(self.camera_position[0], z):
-            self.camera_position[2] = z
-            if self.check_coin_collection(self.camera_position[0], z):
-                is_collected = True
+    def _padded_index(self, col, row):
+        """マス(col, row)の、外周1マスを含むフラット配列でのインデックス"""
+        return (row + 1) * (self.cols + 2) + (col + 1)
+
+    def _build_goal_distance(self):
+        """ゴールからの幅優先探索の距離場を計算（到達できないマスと壁は-1）"""
+        passable = np.zeros((self.rows + 2, self.cols + 2), dtype=bool)
+        for r0, band in self._grid_bands():
+            passable[r0 + 1:r0 + 1 + len(band), 1:-1] = self._passable_lut[band]
+        self._distance_passable = passable.ravel()
+        self._goal_distance = np.full(self._distance_passable.shape, -1, dtype=np.int32)
+        goal = self._find_tile(TileType.GOAL)
+        if goal is None:
+            return
+        goal_index = self._padded_index(*goal)
+        self._goal_distance[goal_index] = 0
+        relax_grid_distances(self._goal_distance, self._distance_passable, [goal_index], self.cols + 2)
+
+    def _open_distance_cell(self, col: int, row: int):
+        """
+        通路になったマスの距離を隣接マスから求め、そこから距離の短くなるマスだけを緩和する
+        マスが通路になっても距離は短くなるだけなので、全体の再計算は不要
+        （到達できなかった領域がつながった場合も、その領域に距離が付く）
+        """
+        index = self._padded_index(col, row)
+        self._distance_passable[index] = True
+        width = self.cols + 2
+        neighbors = self._goal_distance[[index + 1, index - 1, index + width, index - width]]
+        reachable = neighbors[neighbors >= 0]
+        if len(reachable) == 0:
+            return
+        distance, passable = self._goal_distance, self._distance_passable
+        distance[index] = reachable.min() + 1
+        # 更新されるマスは通路に沿って細く続くため、段ごとの配列演算ではなく1マスずつ緩和する
+        queue = deque([index])
+        while queue:
+            current = queue.popleft()
+            next_distance = distance[current] + 1
+            for neighbor in (current + 1, current - 1, current + width, current - width):
+                if passable[neighbor] and (distance[neighbor] < 0 or distance[neighbor] > next_distance):
+                    distance[neighbor] = next_distance
+                    queue.append(neighbor)
+
+    def get_goal_distance_field(self) -> np.ndarray:
+        """ゴールからの通路上の距離を格納した (rows, cols) のint32配列（ビュー）を返す。到達できないマスは-1"""
+        if self._goal_distance is None:
+            self._build_goal_distance()
+        return self._goal_distance.reshape(self.rows + 2, self.cols + 2)[1:-1, 1:-1]
+
+    def get_goal_distance(self, col: int, row: int) -> int | None:
+        """マス(col, row)からゴールまでの通路上のマス数を返す。到達できなければNone"""
+        if not (0 <= col < self.cols and 0 <= row < self.rows):
+            return None
+        if self._goal_distance is None:
+            self._build_goal_distance()
+        distance = int(self._goal_distance[self._padded_index(col, row)])
+        return distance if distance >= 0 else None
+
+    def get_next_step_to_goal(self, col: int, row: int) -> tuple[int, int] | None:
+        """マス(col, row)からゴールへ最短で向かう時の隣のマスを返す。ゴール上または到達できなければNone"""
+        distance = self.get_goal_distance(col, row)
+        if not distance:
+            return None
+        for dx, dz in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            if self.get_goal_distance(col + dx, row + dz) == distance - 1:
+                return col + dx, row + dz
+        return None
 
-        return is_collected
+    def get_path_to_goal(self, col: int, row: int) -> list[tuple[int, int]]:
+        """マス(col, row)からゴールまでの最短経路のマスのリストを返す（到達できなければ空）"""
+        if self.get_goal_distance(col, row) is None:
+            return []
+        path = [(col, row)]
+        while (step := self.get_next_step_to_goal(*path[-1])) is not None:
+            path.append(step)
+        return path
 
     def get_remaining_coins(self) -> int:
         """残りのコイン数を返す"""
-        return sum(row.count('.') for row in self.map_data)
+        return int(self.tile_counts[TileType.COIN])
 
     def get_camera_position(self) -> list[float]:
         """現在のカメラの位置を取得"""
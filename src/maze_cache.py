@@ -0,0 +1,96 @@
+import hashlib
+import os
+import shutil
+import numpy as np
+
+class MazeCache:
+    """
+    シード付きで生成した迷路のグリッドと静的メッシュを保存するディスクキャッシュ。
+    生成条件から求めたハッシュをディレクトリ名とし、配列を1つずつ.npyで保存する（内容アドレス方式）。
+    読み込みはnp.loadのmmap_modeで行うため、必要になった範囲だけがディスクから読まれる。
+
+    Members:
+        directory (str): キャッシュを置くディレクトリ。
+        chunk_size (int): 保存するチャンクメッシュのチャンクの大きさ。
+
+    Methods:
+        __init__(): コンストラクタ。
+        make_key(): 生成条件からキャッシュのキーを求める。
+        _entry_path(): キーに対応するディレクトリのパスを返す。
+        __contains__(): キーのエントリが保存されているかを判定。
+        load(): エントリからMapを作る。無ければNone。
+        store(): Mapのグリッドと静的メッシュを保存する（ビット詰めのグリッドはそのまま保存し、メッシュは保存しない）。
+    """
+    # 保存内容の形式を変えた時に古いエントリを使わないようにするための番号
+    FORMAT_VERSION = 1
+    # ビット詰めのグリッド(PackedTileGrid)を保存する配列の名前の接頭辞
+    PACKED_PREFIX = 'packed_'
+
+    def __init__(self, directory: str, chunk_size: int = 8):
+        self.directory = directory
+        self.chunk_size = chunk_size
+
+    def make_key(self, seed: int, size: tuple[int, int], strategy, coin_count: int, tile_size: float,
+                 origin_pos: list[float], **options) -> str:
+        """
+        生成条件 (seed, size, strategy, coin_count, tile_size, origin_pos) からキーを求める
+        チャンクメッシュはorigin_posの高さで構築して保存するため、描画基点が異なれば別のエントリになる
+        スタート・ゴールの指定など、生成結果に影響する他の引数はoptionsで渡す
+        """
+        strategy = getattr(strategy, 'value', strategy)
+        text = repr((self.FORMAT_VERSION, self.chunk_size, seed, tuple(size), strategy, coin_count,
+                     float(tile_size), tuple(float(value) for value in origin_pos), sorted(options.items())))
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.isdir(self._entry_path(key))
+
+    def load(self, key: str, origin_pos: list[float], tile_size: float, map_class=None):
+        """キーのエントリからMapを作る。グリッドはコピーオンライトで開く。無ければNone"""
+        if key not in self:
+            return None
+        if map_class is None:
+            from map import Map as map_class
+        path = self._entry_path(key)
+        arrays = {}
+        for file_name in os.listdir(path):
+            name, ext = os.path.splitext(file_name)
+            if ext == '.npy':
+                # 書き換えるグリッドはコピーオンライトで開く
+                writable = name == 'grid' or name.startswith(self.PACKED_PREFIX)
+                arrays[name] = np.load(os.path.join(path, file_name), mmap_mode='c' if writable else 'r')
+        if 'grid' in arrays:
+            grid = arrays.pop('grid')
+        else:
+            from packed_grid import PackedTileGrid
+            grid = PackedTileGrid.from_arrays({name[len(self.PACKED_PREFIX):]: arrays.pop(name)
+                                               for name in list(arrays) if name.startswith(self.PACKED_PREFIX)})
+        instance = map_class(grid, origin_pos, tile_size)
+        instance.import_geometry(arrays, self.chunk_size)
+        return instance
+
+    def store(self, key: str, map_instance):
+        """Mapのグリッドと静的メッシュ（壁グループ・チャンクメッシュ）を保存する"""
+        if key in self:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # 書きかけのエントリが読まれないよう、一時ディレクトリに書いてから名前を変える
+        temp_path = self._entry_path(f'{key}.tmp{os.getpid()}')
+        os.makedirs(temp_path, exist_ok=True)
+        from packed_grid import PackedTileGrid
+        if isinstance(map_instance.grid, PackedTileGrid):
+            # ビット詰めのグリッドは展開せずにそのまま保存し、静的メッシュは描画時にチャンクごとに構築する
+            arrays = {self.PACKED_PREFIX + name: array for name, array in map_instance.grid.to_arrays().items()}
+        else:
+            arrays = map_instance.export_geometry(self.chunk_size)
+            arrays['grid'] = map_instance.grid
+        for name, array in arrays.items():
+            np.save(os.path.join(temp_path, f'{name}.npy'), np.asarray(array))
+        try:
+            os.rename(temp_path, self._entry_path(key))
+        except OSError:
+            # 他のプロセスが先に保存した場合はそちらを使う
+            shutil.rmtree(temp_path, ignore_errors=True)
@@ -0,0 +1,374 @@
+from enum import IntEnum
+
+import numpy as np
+
+from camera import Camera
+from global_state import GlobalState
+from map import Map, collect_path_events, find_destroyable_walls, sweep_axis, tiles_at, world_to_cell
+from maze_generator import MazeAlgorithm, generate_maze_batch
+from tile import TileType
+
+class Action(IntEnum):
+    """
+    MazeEnv・MazeVecEnvで1ステップに取る行動。
+
+    Values:
+        NOOP: 何もしない
+        FORWARD: 前進する（Wキー）
+        BACKWARD: 後退する（Sキー）
+        LEFT: 左へ平行移動する（Aキー）
+        RIGHT: 右へ平行移動する（Dキー）
+        TURN_LEFT: 左へTURN_STEPだけ向きを変える
+        TURN_RIGHT: 右へTURN_STEPだけ向きを変える
+        DESTROY_WALL: コインを1枚使って正面の壁を壊す（Fキー+左クリック）
+    """
+    NOOP = 0
+    FORWARD = 1
+    BACKWARD = 2
+    LEFT = 3
+    RIGHT = 4
+    TURN_LEFT = 5
+    TURN_RIGHT = 6
+    DESTROY_WALL = 7
+
+# 1ステップで向きを変える角度[rad]
+TURN_STEP = np.pi / 12
+# 報酬
+COIN_REWARD = 1.0
+GOAL_REWARD = 10.0
+STEP_REWARD = -0.01
+# 観測ベクトルの長さ (列, 行, cos(yaw), sin(yaw), 所持コイン数, 残りコイン数)
+OBSERVATION_SIZE = 6
+
+# 行動ごとの (前進量, 右への移動量) の係数。移動しない行動は0
+_MOVE_FORWARD = np.array([0, 1, -1, 0, 0, 0, 0, 0])
+_MOVE_RIGHT = np.array([0, 0, 0, -1, 1, 0, 0, 0])
+# 行動ごとの向きの変化量
+_TURN = np.array([0, 0, 0, 0, 0, -TURN_STEP, TURN_STEP, 0])
+# 行動ごとに押されているキー
+_ACTION_KEYS = {Action.FORWARD: 'forward', Action.BACKWARD: 'backward', Action.LEFT: 'left', Action.RIGHT: 'right'}
+
+class MazeEnv:
+    """
+    画面を使わずに迷路を進めるgym形式の環境。
+    Map・Camera.move_and_is_coin_collected()とゲームと同じコイン・ゴール・壁破壊のルールで、
+    1ステップをゲームの1フレーム（移動量Camera.move_speed）として進める。
+
+    Members:
+        maze_size (tuple[int,int]): 生成する迷路の大きさ (幅, 高さ)。
+        coin_count (int): 迷路に置くコインの数。
+        tile_size (float): マップ1マスのサイズ。
+        max_steps (int|None): エピソードを打ち切るステップ数。Noneなら打ち切らない。
+        global_state (GlobalState): カメラの移動に渡す状態（マスタービューは使わない）。
+        map (Map|None): 現在の迷路。reset()までNone。
+        camera (Camera|None): プレイヤーの視点。reset()までNone。
+        coins_collected (int): このエピソードで取得したコインの数。
+        coins_spent (int): 壁の破壊に使ったコインの数。
+        steps (int): このエピソードで進めたステップ数。
+
+    Methods:
+        __init__(): コンストラクタ。
+        reset(): 迷路を作り直してエピソードを始め、(観測, 情報) を返す。
+        step(): 行動を1ステップ進め、(観測, 報酬, 終了, 打ち切り, 情報) を返す。
+        _destroy_wall(): コインを1枚使って正面の壁を壊す。
+        _observation(): 観測ベクトルを返す。
+        _info(): 観測に含まれない情報を返す。
+    """
+    # 壁との衝突判定に用いるプレイヤーの半径（GameScene.PLAYER_RADIUSと同じ）
+    PLAYER_RADIUS = 20
+
+    def __init__(self, maze_size: tuple[int, int] = (15, 15), coin_count: int = 3, tile_size: float = 100,
+                 max_steps: int = 30 * 60):
+        self.maze_size = maze_size
+        self.coin_count = coin_count
+        self.tile_size = tile_size
+        self.max_steps = max_steps
+        self.global_state = GlobalState()
+        self.map = None
+        self.camera = None
+        self.coins_collected = 0
+        self.coins_spent = 0
+        self.steps = 0
+
+    def reset(self, seed: int = None, grid: np.ndarray = None) -> tuple[np.ndarray, dict]:
+        """
+        seedから迷路を生成してエピソードを始め、(観測, 情報) を返す
+        gridを渡した場合は生成せずにそのタイルグリッドの迷路を使う
+        """
+        if grid is None:
+            self.map = Map.generate_maze_map(*self.maze_size, [0, 0, 0], self.tile_size,
+                                             coin_count=self.coin_count, seed=seed)
+        else:
+            self.map = Map(grid, [0, 0, 0], self.tile_size)
+        yaw, pitch = self.map.get_initial_view_direction()
+        self.camera = Camera(
+            position=np.array(self.map.get_start_position()),
+            yaw=yaw,
+            pitch=pitch,
+            aspect=1,
+            fov=90,
+            z_near=0.005,
+            z_far=1000,
+            view_based_movement=False,
+            map_instance=self.map,
+            collision_radius=self.PLAYER_RADIUS
+        )
+        self.coins_collected = 0
+        self.coins_spent = 0
+        self.steps = 0
+        return self._observation(), self._info()
+
+    def step(self, action: int) -> tuple[np.ndarray, float, bool, bool, dict]:
+        """
+        行動actionを1ステップ進め、(観測, 報酬, ゴールしたか, 打ち切られたか, 情報) を返す
+        向きを変えてから移動し、移動の後で壁を壊す
+        """
+        action = Action(action)
+        camera = self.camera
+        if _TURN[action]:
+            camera.yaw = (camera.yaw + _TURN[action]) % (2 * np.pi)
+        keyboard_state = dict.fromkeys(('forward', 'backward', 'left', 'right', 'up', 'down'), False)
+        if action in _ACTION_KEYS:
+            keyboard_state[_ACTION_KEYS[action]] = True
+        camera.move_and_is_coin_collected(keyboard_state, self.global_state)
+        result = camera.last_move_result
+
+        reward = STEP_REWARD + COIN_REWARD * len(result.coin_cells)
+        self.coins_collected += len(result.coin_cells)
+        if action == Action.DESTROY_WALL:
+            self._destroy_wall()
+        # 描画オブジェクトが無いため、記録された変更は読み捨てる
+        self.map.drain_changes()
+
+        terminated = len(result.goal_cells) > 0 or self.map.check_goal_reached(camera.position[0], camera.position[2])
+        if terminated:
+            reward += GOAL_REWARD
+        self.steps += 1
+        truncated = not terminated and self.max_steps is not None and self.steps >= self.max_steps
+        return self._observation(), reward, terminated, truncated, self._info()
+
+    def _destroy_wall(self):
+        """コインを1枚以上所持していれば、正面1マス以内の壊せる壁を壊してコインを1枚使う"""
+        if self.coins_collected - self.coins_spent <= 0:
+            return
+        cell = self.map.find_destroyable_wall(self.camera.position[0], self.camera.position[2], self.camera.yaw)
+        if cell is not None and self.map.remove_wall(*cell) is not None:
+            self.coins_spent += 1
+
+    def _observation(self) -> np.ndarray:
+        """(列, 行, cos(yaw), sin(yaw), 所持コイン数, 残りコイン数) のfloat32配列を返す（位置はマス単位）"""
+        x, _, z = self.camera.position
+        return np.array([
+            (x - self.map.grid_offset_x) / self.tile_size,
+            (z - self.map.grid_offset_z) / self.tile_size,
+            np.cos(self.camera.yaw),
+            np.sin(self.camera.yaw),
+            self.coins_collected - self.coins_spent,
+            self.map.get_remaining_coins(),
+        ], dtype=np.float32)
+
+    def _info(self) -> dict:
+        """ワールド座標の位置・向きとコインの取得数などを返す"""
+        return {
+            'x': float(self.camera.position[0]),
+            'z': float(self.camera.position[2]),
+            'yaw': float(self.camera.yaw),
+            'coins_collected': self.coins_collected,
+            'coins_spent': self.coins_spent,
+            'steps': self.steps,
+        }
+
+class MazeVecEnv:
+    """
+    同じ大きさの迷路num_envs個をまとめて進めるMazeEnvのベクトル版。
+    迷路を (環境数, 行数, 列数) のタイルグリッドに重ね、移動・コイン・ゴール・壁破壊をMapと同じ規則で
+    環境ごとのPythonのループを使わずに配列演算で解決する。ゴールまたは打ち切りになった環境は次のステップまでに
+    新しい迷路で自動的に始め直す（返す観測は始め直した後のもの）。
+
+    Members:
+        num_envs (int): 環境の数。
+        maze_size (tuple[int,int]): 生成する迷路の大きさ (幅, 高さ)。
+        coin_count (int): 迷路に置くコインの数。
+        tile_size (float): マップ1マスのサイズ。
+        max_steps (int|None): エピソードを打ち切るステップ数。Noneなら打ち切らない。
+        algorithm (MazeAlgorithm): 迷路の生成に使うアルゴリズム（generate_maze_batch()が対応するもの）。
+        move_speed (float): 1ステップの移動量（Camera.move_speedと同じ）。
+        radius (float): 壁との衝突判定に用いるプレイヤーの半径。
+        np_rng (np.random.Generator): 始め直す迷路のシードを作る乱数生成器。
+        grids (np.ndarray): 各環境のタイルグリッド (環境数, 行数, 列数)。
+        x, z, yaw, pitch (np.ndarray): 各環境のプレイヤーのワールド座標と向き。
+        coins_remaining (np.ndarray): 各環境の迷路に残っているコインの数。
+        coins_collected, coins_spent, steps (np.ndarray): 各環境のコインの取得数・使用数とステップ数。
+
+    Methods:
+        __init__(): コンストラクタ。
+        reset(): 全環境の迷路を作り直し、(観測, 情報) を返す。
+        _reset_envs(): 指定した環境をタイルグリッドから始め直す。
+        step(): 全環境の行動を1ステップ進め、(観測, 報酬, 終了, 打ち切り, 情報) を返す。
+        _collect_path_events(): 経路上のコインを取得し、ゴールを通過したかを返す。
+        _destroy_walls(): 壁を壊す行動を取った環境の正面の壁を壊す。
+        _observation(): 観測ベクトルを返す。
+        _info(): 観測に含まれない情報を返す。
+    """
+    def __init__(self, num_envs: int, maze_size: tuple[int, int] = (15, 15), coin_count: int = 3,
+                 tile_size: float = 100, max_steps: int = 30 * 60,
+                 algorithm: MazeAlgorithm = MazeAlgorithm.SIDEWINDER):
+        self.num_envs = num_envs
+        self.maze_size = maze_size
+        self.coin_count = coin_count
+        self.tile_size = tile_size
+        self.max_steps = max_steps
+        self.algorithm = algorithm
+        self.move_speed = 8
+        self.radius = MazeEnv.PLAYER_RADIUS
+        width, height = maze_size
+        # マス(0, 0)の中心のワールド座標（Mapと同じくマップの中心を原点に合わせる）
+        self.grid_offset_x = -width * tile_size / 2
+        self.grid_offset_z = -height * tile_size / 2
+        self.np_rng = np.random.default_rng()
+        self.grids = np.zeros((num_envs, height, width), dtype=np.uint8)
+        self.x = np.zeros(num_envs)
+        self.z = np.zeros(num_envs)
+        self.yaw = np.zeros(num_envs)
+        self.pitch = np.zeros(num_envs)
+        self.coins_remaining = np.zeros(num_envs, dtype=np.int64)
+        self.coins_collected = np.zeros(num_envs, dtype=np.int64)
+        self.coins_spent = np.zeros(num_envs, dtype=np.int64)
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+
+    def reset(self, seed: int = None, grids: np.ndarray = None) -> tuple[np.ndarray, dict]:
+        """
+        seedから全環境の迷路を生成して始め直し、(観測, 情報) を返す
+        gridsに (環境数, 行数, 列数) のタイルグリッドを渡した場合は生成せずにそれを使う
+        """
+        self.np_rng = np.random.default_rng(seed)
+        if grids is None:
+            grids = generate_maze_batch(self.num_envs, *self.maze_size, self.coin_count,
+                                        seed=self.np_rng.integers(1 << 63), algorithm=self.algorithm)
+        self._reset_envs(np.arange(self.num_envs), grids)
+        return self._observation(), self._info()
+
+    def _reset_envs(self, envs: np.ndarray, grids: np.ndarray):
+        """環境envsをタイルグリッドgridsの迷路で始め直す（スタートからゴールの方向を向く）"""
+        width = self.maze_size[0]
+        self.grids[envs] = grids
+        flat = self.grids[envs].reshape(len(envs), -1)
+        start_row, start_col = np.divmod(np.argmax(flat == TileType.START, axis=1), width)
+        goal_row, goal_col = np.divmod(np.argmax(flat == TileType.GOAL, axis=1), width)
+        self.x[envs] = self.grid_offset_x + start_col * self.tile_size
+        self.z[envs] = self.grid_offset_z + start_row * self.tile_size
+        goal_x = self.grid_offset_x + goal_col * self.tile_size
+        goal_z = self.grid_offset_z + goal_row * self.tile_size
+        self.yaw[envs] = np.arctan2(goal_z - self.z[envs], goal_x - self.x[envs])
+        # Map.get_initial_view_direction()と同じく少し下を向く
+        self.pitch[envs] = -0.1
+        self.coins_remaining[envs] = (flat == TileType.COIN).sum(axis=1)
+        self.coins_collected[envs] = 0
+        self.coins_spent[envs] = 0
+        self.steps[envs] = 0
+
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, dict]:
+        """
+        各環境の行動actionsを1ステップ進め、(観測, 報酬, ゴールしたか, 打ち切られたか, 情報) を返す
+        MazeEnv.step()と同じく向きを変えてから移動し、移動の後で壁を壊す
+        """
+        actions = np.asarray(actions, dtype=np.intp)
+        turn = _TURN[actions]
+        turning = turn != 0
+        self.yaw[turning] = np.mod(self.yaw[turning] + turn[turning], 2 * np.pi)
+
+        forward = _MOVE_FORWARD[actions] * self.move_speed
+        right = _MOVE_RIGHT[actions] * self.move_speed
+        # Cameraの視点ベースの移動と同じく、前進量は見下ろしている分だけ短くなる
+        cos_yaw, sin_yaw = np.cos(self.yaw), np.sin(self.yaw)
+        cos_pitch = np.cos(self.pitch)
+        dx = cos_yaw * cos_pitch * forward + -sin_yaw * right
+        dz = sin_yaw * cos_pitch * forward + cos_yaw * right
+
+        # Map.sweep_move()と同じくX方向・Z方向の順に移動し、通過したマスを調べる
+        coins_before = self.coins_collected.copy()
+        envs = np.arange(self.num_envs)
+        layout = (self.grid_offset_x, self.grid_offset_z, self.tile_size)
+        new_x, _ = sweep_axis(self.grids, self.x, self.z, dx, self.radius, True, *layout, layers=envs)
+        passed_goal = self._collect_path_events(self.x, new_x, self.z, along_x=True)
+        new_z, _ = sweep_axis(self.grids, self.z, new_x, dz, self.radius, False, *layout, layers=envs)
+        passed_goal |= self._collect_path_events(self.z, new_z, new_x, along_x=False)
+        self.x, self.z = new_x, new_z
+
+        self._destroy_walls(actions == Action.DESTROY_WALL)
+
+        # 移動後の位置がゴールのマス上にあるか（Map.check_goal_reached()と同じ判定）
+        col = world_to_cell(self.x, self.grid_offset_x, self.tile_size)
+        row = world_to_cell(self.z, self.grid_offset_z, self.tile_size)
+        terminated = passed_goal | (tiles_at(self.grids, col, row, envs) == TileType.GOAL)
+        rewards = (STEP_REWARD + COIN_REWARD * (self.coins_collected - coins_before) +
+                   GOAL_REWARD * terminated)
+        self.steps += 1
+        if self.max_steps is None:
+            truncated = np.zeros(self.num_envs, dtype=bool)
+        else:
+            truncated = ~terminated & (self.steps >= self.max_steps)
+
+        info = self._info()
+        done = np.flatnonzero(terminated | truncated)
+        if len(done):
+            info['final_observation'] = self._observation()[done]
+            info['done_envs'] = done
+            grids = generate_maze_batch(len(done), *self.maze_size, self.coin_count,
+                                        seed=self.np_rng.integers(1 << 63), algorithm=self.algorithm)
+            self._reset_envs(done, grids)
+        return self._observation(), rewards, terminated, truncated, info
+
+    def _collect_path_events(self, start: np.ndarray, end: np.ndarray, across: np.ndarray,
+                             along_x: bool) -> np.ndarray:
+        """
+        各環境の中心が1軸方向にstartからendまで通過したマスをmap.collect_path_events()で調べ、
+        経路上のコインを取得して、ゴールを通過したかを返す
+        """
+        (envs, cols, rows), (goal_envs, _, _) = collect_path_events(
+            self.grids, start, end, across, along_x, self.grid_offset_x, self.grid_offset_z, self.tile_size,
+            layers=np.arange(self.num_envs))
+        # 取得したコインはすぐに取り除くため、Z方向の移動で同じコインを2度数えない
+        self.grids[envs, rows, cols] = TileType.EMPTY
+        np.add.at(self.coins_collected, envs, 1)
+        np.add.at(self.coins_remaining, envs, -1)
+        passed_goal = np.zeros(self.num_envs, dtype=bool)
+        passed_goal[goal_envs] = True
+        return passed_goal
+
+    def _destroy_walls(self, destroy: np.ndarray):
+        """
+        destroyがTrueでコインを1枚以上所持している環境で、map.find_destroyable_walls()で
+        Map.find_destroyable_wall()と同じ規則で正面1マス以内の壁を探し、壊せればコインを1枚使って壊す
+        """
+        envs = np.flatnonzero(destroy & (self.coins_collected - self.coins_spent > 0))
+        if len(envs) == 0:
+            return
+        found, cols, rows = find_destroyable_walls(self.grids, self.x[envs], self.z[envs], self.yaw[envs],
+                                                   self.grid_offset_x, self.grid_offset_z, self.tile_size,
+                                                   layers=envs)
+        envs, cols, rows = envs[found], cols[found], rows[found]
+        self.grids[envs, rows, cols] = TileType.EMPTY
+        self.coins_spent[envs] += 1
+
+    def _observation(self) -> np.ndarray:
+        """(環境数, OBSERVATION_SIZE) のfloat32配列で、MazeEnvと同じ観測を返す"""
+        return np.stack([
+            (self.x - self.grid_offset_x) / self.tile_size,
+            (self.z - self.grid_offset_z) / self.tile_size,
+            np.cos(self.yaw),
+            np.sin(self.yaw),
+            self.coins_collected - self.coins_spent,
+            self.coins_remaining,
+        ], axis=1).astype(np.float32)
+
+    def _info(self) -> dict:
+        """ワールド座標の位置・向きとコインの取得数などを環境ごとの配列で返す"""
+        return {
+            'x': self.x.copy(),
+            'z': self.z.copy(),
+            'yaw': self.yaw.copy(),
+            'coins_collected': self.coins_collected.copy(),
+            'coins_spent': self.coins_spent.copy(),
+            'steps': self.steps.copy(),
+        }
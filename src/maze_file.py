@@ -0,0 +1,158 @@
+import numpy as np
+
+from tile import TileType
+
+# ファイル先頭の識別子とフォーマットのバージョン
+MAZE_FILE_MAGIC = b'MAZE'
+MAZE_FILE_VERSION = 1
+
+# 各セクションの先頭をこのバイト数に揃える
+_ALIGNMENT = 64
+
+# ヘッダー（リトルエンディアン固定）
+_HEADER_DTYPE = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u2'),
+    ('section_count', '<u2'),
+    ('rows', '<u4'),
+    ('cols', '<u4'),
+    ('tile_size', '<f8'),
+    ('origin', '<f8', (3,)),
+    ('start', '<i4', (2,)),   # (col, row)。無ければ(-1, -1)
+    ('goal', '<i4', (2,)),    # (col, row)。無ければ(-1, -1)
+    ('chunk_size', '<u4'),    # チャンクメッシュのチャンクの大きさ。メッシュが無ければ0
+])
+
+# セクション表の1要素。配列は2次元までで、1次元の場合はshape[1]を0とする
+_SECTION_DTYPE = np.dtype([
+    ('name', 'S16'),
+    ('dtype', 'S8'),
+    ('ndim', '<u4'),
+    ('shape', '<u8', (2,)),
+    ('offset', '<u8'),
+])
+
+class MazeFile:
+    """
+    迷路のバイナリファイルを読み込んだ結果。配列はすべてnp.memmapで、参照した範囲だけが読み込まれる。
+
+    ファイルの構成:
+        ヘッダー(_HEADER_DTYPE) -> セクション表(_SECTION_DTYPE × section_count) -> 各セクションの配列
+        必須のセクションは grid (rows, cols) のタイルコードと coins (コイン数, 2) の(col, row)。
+        任意で tile_counts（タイルコードごとのマス数）、wall_cells / wall_offsets（壁グループ）と、
+        BakedMeshes.ARRAY_NAMES のチャンクメッシュを持つ。
+
+    Members:
+        version (int): フォーマットのバージョン。
+        rows (int): マップの行数。
+        cols (int): マップの列数。
+        tile_size (float): マップ1マスのサイズ。
+        origin_pos (list[float]): マップ描画基点。
+        start (tuple[int,int]|None): スタートのマス(col, row)。
+        goal (tuple[int,int]|None): ゴールのマス(col, row)。
+        chunk_size (int|None): チャンクメッシュを作った時のチャンクの大きさ。メッシュが無ければNone。
+        sections (dict[str, np.ndarray]): セクション名と配列の対応。
+
+    Methods:
+        __init__(): コンストラクタ。
+        __contains__(): セクションがあるかを判定。
+        __getitem__(): セクションの配列を返す。
+    """
+    def __init__(self, header: np.void, sections: dict[str, np.ndarray]):
+        self.version = int(header['version'])
+        self.rows = int(header['rows'])
+        self.cols = int(header['cols'])
+        self.tile_size = float(header['tile_size'])
+        self.origin_pos = header['origin'].tolist()
+        start, goal = tuple(header['start'].tolist()), tuple(header['goal'].tolist())
+        self.start = start if start[0] >= 0 else None
+        self.goal = goal if goal[0] >= 0 else None
+        self.chunk_size = int(header['chunk_size']) or None
+        self.sections = sections
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.sections
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.sections[name]
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+def write_maze_file(path, grid: np.ndarray, tile_size: float, origin_pos: list[float],
+                    start: tuple[int, int] = None, goal: tuple[int, int] = None,
+                    coins: np.ndarray = None, chunk_size: int = None,
+                    extra_sections: dict[str, np.ndarray] = None, tile_counts: np.ndarray = None):
+    """
+    タイルグリッドと付随する情報をバイナリファイルに書き出す
+    coinsとtile_countsを省略した場合はグリッドから求める（読み込み時にグリッドを走査しないよう保存する）
+    extra_sectionsには壁グループやチャンクメッシュなど任意のセクションを名前付きで渡す
+    チャンクメッシュを含める場合はchunk_sizeも指定する
+    """
+    grid = np.ascontiguousarray(grid, dtype=np.uint8)
+    if coins is None:
+        coins = np.argwhere(grid == TileType.COIN)[:, ::-1]
+    if tile_counts is None:
+        tile_counts = np.bincount(grid.ravel(), minlength=len(TileType))
+    sections = {'grid': grid, 'coins': np.asarray(coins, dtype='<i4').reshape(-1, 2),
+                'tile_counts': np.asarray(tile_counts, dtype='<i8')}
+    for name, array in (extra_sections or {}).items():
+        sections[name] = np.ascontiguousarray(array)
+
+    header = np.zeros(1, dtype=_HEADER_DTYPE)
+    header['magic'] = MAZE_FILE_MAGIC
+    header['version'] = MAZE_FILE_VERSION
+    header['section_count'] = len(sections)
+    header['rows'], header['cols'] = grid.shape
+    header['tile_size'] = tile_size
+    header['origin'] = origin_pos
+    header['start'] = start if start is not None else (-1, -1)
+    header['goal'] = goal if goal is not None else (-1, -1)
+    header['chunk_size'] = chunk_size or 0
+
+    table = np.zeros(len(sections), dtype=_SECTION_DTYPE)
+    offset = _align(_HEADER_DTYPE.itemsize + _SECTION_DTYPE.itemsize * len(sections))
+    for entry, (name, array) in zip(table, sections.items()):
+        if array.ndim > 2:
+            raise ValueError(f"section '{name}' must be at most 2-dimensional")
+        entry['name'] = name.encode('ascii')
+        entry['dtype'] = array.dtype.newbyteorder('<').str.encode('ascii')
+        entry['ndim'] = array.ndim
+        entry['shape'] = (array.shape + (0, 0))[:2]
+        entry['offset'] = offset
+        offset = _align(offset + array.nbytes)
+
+    with open(path, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(table.tobytes())
+        for entry, array in zip(table, sections.values()):
+            f.seek(int(entry['offset']))
+            f.write(array.astype(array.dtype.newbyteorder('<'), copy=False).tobytes())
+        f.truncate(offset)
+
+def read_maze_file(path) -> MazeFile:
+    """
+    バイナリファイルを開き、各セクションをnp.memmapとして返す（内容の解析やコピーは行わない）
+    gridは書き換え可能なコピーオンライトで開くため、マップを変更してもファイルは変わらない
+    """
+    header = np.fromfile(path, dtype=_HEADER_DTYPE, count=1)
+    if len(header) == 0 or header['magic'][0] != MAZE_FILE_MAGIC:
+        raise ValueError(f"{path} is not a maze file")
+    header = header[0]
+    if header['version'] > MAZE_FILE_VERSION:
+        raise ValueError(f"unsupported maze file version {int(header['version'])}")
+
+    table = np.fromfile(path, dtype=_SECTION_DTYPE, count=int(header['section_count']),
+                        offset=_HEADER_DTYPE.itemsize)
+    sections = {}
+    for entry in table:
+        name = entry['name'].decode('ascii')
+        shape = tuple(int(n) for n in entry['shape'][:int(entry['ndim'])])
+        if np.prod(shape) == 0:
+            # 空の配列はmemmapできないため通常の配列で表す
+            sections[name] = np.zeros(shape, dtype=entry['dtype'].decode('ascii'))
+            continue
+        sections[name] = np.memmap(path, dtype=entry['dtype'].decode('ascii'),
+                                   mode='c' if name == 'grid' else 'r',
+                                   offset=int(entry['offset']), shape=shape)
+    return MazeFile(header, sections)
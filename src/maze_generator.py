@@ -1,6 +1,13 @@
 import random
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterator, Sequence
 from enum import Enum
 from typing import Tuple, Optional
+import numpy as np
+
+from tile import TileType, grid_to_rows
+from packed_grid import PackedTileGrid
 
 class StartEndStrategy(Enum):
     """
@@ -10,12 +17,292 @@ class StartEndStrategy(Enum):
         DIAGONAL: 対角配置
         RANDOM: ランダム配置
         MANUAL: 手動指定
-        MIN_DISTANCE: 最小距離保証
+        MIN_DISTANCE: 最小距離保証（マンハッタン距離、ランダムに試行）
+        FARTHEST_PAIR: 通路に沿った距離が最も遠い2マス（2回の幅優先探索）
+        MIN_PATH_DISTANCE: 通路に沿った最小距離保証（幅優先探索で条件を満たすマスから選ぶため再試行しない）
     """
     DIAGONAL = "diagonal"          # 対角に配置
     RANDOM = "random"             # ランダムに配置
     MANUAL = "manual"             # 明示的に指定
     MIN_DISTANCE = "min_distance"  # 最小距離を保証
+    FARTHEST_PAIR = "farthest_pair"          # 経路長が最大の2マス
+    MIN_PATH_DISTANCE = "min_path_distance"  # 経路長の最小距離を保証
+
+class MazeAlgorithm(Enum):
+    """
+    迷路を掘るアルゴリズムを定義する列挙型。
+
+    Values:
+        DEPTH_FIRST: 深さ優先探索（長い通路の多い迷路、元の実装）
+        KRUSKAL: ランダムな重みの最小全域木（ランダム順のクラスカル法と同じ分布）を配列演算で求める高速版
+        ELLER: エラーのアルゴリズムで1行ずつ掘る（eller_rows()を使う）
+        BINARY_TREE: 各節点から上か左へランダムにつなぐ（偏りが強いが、多数の迷路を配列演算でまとめて生成できる）
+        SIDEWINDER: 行ごとに横へ伸ばした通路から上へ1本つなぐ（多数の迷路を配列演算でまとめて生成できる）
+    """
+    DEPTH_FIRST = "depth_first"  # 深さ優先探索
+    KRUSKAL = "kruskal"          # 配列演算によるランダム全域木
+    ELLER = "eller"              # 行単位のエラーのアルゴリズム
+    BINARY_TREE = "binary_tree"  # 上か左へつなぐ二分木
+    SIDEWINDER = "sidewinder"    # 行の通路から上へつなぐ
+
+# carve_maze_batch()でまとめて生成できるアルゴリズム
+BATCH_ALGORITHMS = (MazeAlgorithm.BINARY_TREE, MazeAlgorithm.SIDEWINDER)
+
+def random_spanning_tree(nx: int, ny: int, np_rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """
+    nx × ny の格子グラフのランダムな全域木を求める
+    各辺にランダムな異なる重みを付けた最小全域木（ランダム順のクラスカル法と同じ結果）を、
+    ブルーフカ法で全成分の最小辺を配列演算でまとめて選ぶことで求める（ラウンド数はO(log 頂点数)）
+    戻り値は (横方向の辺が使われたか (ny, nx-1), 縦方向の辺が使われたか (ny-1, nx))
+    """
+    index = np.arange(nx * ny, dtype=np.int32).reshape(ny, nx)
+    u = np.concatenate([index[:, :-1].ravel(), index[:-1, :].ravel()])
+    v = np.concatenate([index[:, 1:].ravel(), index[1:, :].ravel()])
+    weights = np.argsort(np_rng.random(len(u))).astype(np.int32)
+    selected = np.zeros(len(u), dtype=bool)
+    component = np.arange(nx * ny, dtype=np.int32)
+
+    edges = np.arange(len(u), dtype=np.int32)
+    while True:
+        cu, cv = component[u[edges]], component[v[edges]]
+        crossing = cu != cv
+        edges, cu, cv = edges[crossing], cu[crossing], cv[crossing]
+        if len(edges) == 0:
+            break
+        # 各成分から出る辺のうち最も軽いものを選ぶ（重みが異なるため閉路はできない）
+        w = weights[edges]
+        best = np.full(nx * ny, len(u), dtype=np.int32)
+        np.minimum.at(best, cu, w)
+        np.minimum.at(best, cv, w)
+        chosen = (best[cu] == w) | (best[cv] == w)
+        selected[edges[chosen]] = True
+
+        # 選んだ辺でつながる成分を、最小のラベルへ伝播とポインタジャンプでまとめる
+        a, b = cu[chosen], cv[chosen]
+        label = np.arange(nx * ny, dtype=np.int32)
+        while True:
+            smaller = np.minimum(label[a], label[b])
+            previous = label.copy()
+            np.minimum.at(label, a, smaller)
+            np.minimum.at(label, b, smaller)
+            label = label[label]
+            if np.array_equal(label, previous):
+                break
+        component = label[component]
+
+    horizontal_count = (nx - 1) * ny
+    return (selected[:horizontal_count].reshape(ny, nx - 1),
+            selected[horizontal_count:].reshape(ny - 1, nx))
+
+def eller_rows(width: int, seed: int = None, height: int = None, block_rows: int = 16) -> Iterator[np.ndarray]:
+    """
+    エラーのアルゴリズムで迷路を上から1行ずつ生成し、タイルコード(WALLまたはEMPTY)のuint8配列として返すジェネレータ
+    保持するのは現在の行の集合ラベル（幅に比例）のみのため、heightを省略すると終わりなく行を生成し続けられる
+    heightを指定すると最後の行で全ての集合をつなぎ、generate_grid()と同じ大きさの完全迷路になる
+    乱数はblock_rowsの通路の行ごとにseedとブロック番号から作り直すため、同じseedなら同じ行の列になる
+    マスの配置はgenerate_grid()と同じく、(1, 1)から始まる奇数座標のマスを2マスおきの通路の節点とする
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    nx = (width - 1) // 2
+    node_rows = None if height is None else (height - 1) // 2
+    wall_row = np.full(width, TileType.WALL, dtype=np.uint8)
+    yield wall_row.copy()
+
+    # 節点ごとの集合ラベル（0は下の行からつながっていない節点）
+    sets = np.zeros(nx, dtype=np.int64)
+    next_set = 1
+    k = 0
+    while node_rows is None or k < node_rows:
+        if k % block_rows == 0:
+            rng = random.Random(f"{seed}:{k // block_rows}")
+        is_last = node_rows is not None and k == node_rows - 1
+
+        # 上とつながっていない節点に新しい集合を割り当てる
+        fresh = np.flatnonzero(sets == 0)
+        sets[fresh] = np.arange(next_set, next_set + len(fresh))
+        next_set += len(fresh)
+
+        # 隣の節点と異なる集合なら、ランダムに（最後の行では必ず）横につなぐ
+        # 集合の併合はこの行の集合を詰めた番号のUnion-Findで行い、併合した集合は左側の集合のラベルを引き継ぐ
+        labels, index = np.unique(sets, return_inverse=True)
+        parent = list(range(len(labels)))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]  # 経路半減
+                x = parent[x]
+            return x
+
+        cell_row = wall_row.copy()
+        cell_row[1:2 * nx:2] = TileType.EMPTY
+        index_list = index.tolist()
+        for i in range(nx - 1):
+            left, right = find(index_list[i]), find(index_list[i + 1])
+            if left != right and (is_last or rng.random() < 0.5):
+                cell_row[2 * i + 2] = TileType.EMPTY
+                parent[right] = left
+        sets = labels[[find(x) for x in range(len(labels))]][index]
+        yield cell_row
+        if is_last:
+            break
+
+        # 各集合から少なくとも1つの節点を下の行へつなぐ（下へつながる節点の無い集合はラベルの順に1つ選ぶ）
+        down = np.array([rng.random() < 0.5 for _ in range(nx)], dtype=bool)
+        _, index, counts = np.unique(sets, return_inverse=True, return_counts=True)
+        members = np.argsort(index, kind='stable')
+        starts = np.cumsum(counts) - counts
+        has_down = np.bincount(index, weights=down, minlength=len(counts)) > 0
+        for label in np.flatnonzero(~has_down).tolist():
+            down[members[starts[label] + rng.randrange(counts[label])]] = True
+        link_row = wall_row.copy()
+        link_row[1:2 * nx:2][down] = TileType.EMPTY
+        yield link_row
+        sets[~down] = 0
+        k += 1
+
+    # 最後の節点の行より下は壁
+    if height is not None:
+        for _ in range(height - max(1, 2 * node_rows)):
+            yield wall_row.copy()
+
+def carve_maze_batch(count: int, width: int, height: int, algorithm: MazeAlgorithm,
+                     np_rng: np.random.Generator) -> np.ndarray:
+    """
+    count個の迷路をまとめて掘り、壁ならTrueの (count, height, width) の配列を返す
+    algorithmはBATCH_ALGORITHMSのいずれかで、どちらも各節点の選択が独立なため迷路と節点の全体を配列演算で処理する
+    マスの配置はgenerate_grid()と同じく、(1, 1)から始まる奇数座標のマスを節点とする
+    """
+    if algorithm not in BATCH_ALGORITHMS:
+        raise ValueError(f"{algorithm} cannot be generated in a batch")
+    nx, ny = (width - 1) // 2, (height - 1) // 2
+    walls = np.ones((count, height, width), dtype=bool)
+    if nx == 0 or ny == 0:
+        # 深さ優先探索と同じく、小さな迷路でも(1, 1)は掘る
+        walls[:, 1:2, 1:2] = False
+        return walls
+    walls[:, 1:2 * ny:2, 1:2 * nx:2] = False
+
+    if algorithm == MazeAlgorithm.BINARY_TREE:
+        # 節点ごとに上(True)か左(False)を選ぶ。上端の行は左へ、左端の列は上へしかつなげない
+        north = np_rng.random((count, ny, nx)) < 0.5
+        north[:, 0, :] = False
+        north[:, :, 0] = True
+        north[:, 0, 0] = False
+        west = ~north
+        west[:, 0, 0] = False
+    else:
+        # 上端の行は1本の通路。他の行は節点ごとにランダムに（右端では必ず）通路を区切り、
+        # 区切られた通路の中からランダムな1節点を上へつなぐ
+        close = np_rng.random((count, ny, nx)) < 0.5
+        close[:, :, -1] = True
+        close[:, 0, :] = False
+        close[:, 0, -1] = True
+        west = np.zeros((count, ny, nx), dtype=bool)
+        west[:, :, 1:] = ~close[:, :, :-1]
+        # 通路ごとに乱数のキーが最大の節点を選ぶ（通路は平らに並べても連続している）
+        keys = np_rng.random((count, ny, nx)).ravel()
+        ends = np.flatnonzero(close.ravel())
+        starts = np.concatenate([[0], ends[:-1] + 1])
+        run_max = np.maximum.reduceat(keys, starts)
+        run_index = np.repeat(np.arange(len(starts)), ends - starts + 1)
+        north = (keys == run_max[run_index]).reshape(count, ny, nx)
+        north[:, 0, :] = False
+
+    walls[:, 0:2 * ny - 1:2, 1:2 * nx:2] &= ~north
+    walls[:, 1:2 * ny:2, 0:2 * nx - 1:2] &= ~west
+    return walls
+
+def generate_maze_batch(count: int, width: int, height: int, coin_count: int = None, seed: int = None,
+                        algorithm: MazeAlgorithm = MazeAlgorithm.SIDEWINDER) -> np.ndarray:
+    """
+    count個の迷路を生成し、タイルコードの (count, height, width) のuint8配列で返す
+    スタートとゴールはStartEndStrategy.DIAGONALと同じく x + y が最小・最大の空きマス（同じ値なら行優先で先のマス）
+    コインは迷路ごとにスタート・ゴール以外の空きマスからcoin_count個（省略時は空きマスの1/30）を重複なく選ぶ
+    迷路の生成から配置まで、迷路ごとのPythonのループを使わずに配列演算で行う
+    """
+    np_rng = np.random.default_rng(seed)
+    grids = carve_maze_batch(count, width, height, algorithm, np_rng).astype(np.uint8).reshape(count, -1)
+    empty = grids == TileType.EMPTY
+
+    # 対角の両端の空きマス（argmin/argmaxは最初に見つかった位置を返すため行優先で先のマスになる）
+    ys, xs = np.divmod(np.arange(width * height), width)
+    diagonal = xs + ys
+    batch = np.arange(count)
+    start = np.argmin(np.where(empty, diagonal, width + height), axis=1)
+    goal = np.argmax(np.where(empty, diagonal, -1), axis=1)
+    grids[batch, start] = TileType.START
+    grids[batch, goal] = TileType.GOAL
+
+    # 空きマスに一様な乱数のキーを付け、キーが小さい順にcoin_count個を選ぶ
+    empty = grids == TileType.EMPTY
+    if coin_count is None:
+        coin_count = int(empty.sum(axis=1).min()) // 30
+    coin_count = min(coin_count, int(empty.sum(axis=1).min()))
+    if coin_count > 0:
+        keys = np.where(empty, np_rng.random(grids.shape), np.inf)
+        coins = np.argpartition(keys, coin_count - 1, axis=1)[:, :coin_count]
+        grids[batch[:, None], coins] = TileType.COIN
+    return grids.reshape(count, height, width)
+
+class EmptyCells(Sequence):
+    """
+    迷路の空きマス(x, y)を行優先の順に並べた読み取り専用の列。
+    行ごとの空きマス数の累積だけを持ち、要素は参照された行だけを展開して求めるため、
+    巨大な迷路でも全空きマスのリストを作らずにrandom.sample()などへ渡せる。
+
+    Members:
+        grid (PackedTileGrid): 対象のグリッド。
+        cumulative (np.ndarray): 行ごとの空きマス数の累積和。
+
+    Methods:
+        __init__(): コンストラクタ。
+        __len__(): 空きマスの数を返す。
+        __getitem__(): i番目の空きマスを返す。
+        take(): 複数の番号の空きマスをまとめて返す。
+        __contains__(): マスが空きマスかを判定。
+    """
+    def __init__(self, grid: PackedTileGrid):
+        self.grid = grid
+        self.cumulative = np.cumsum(grid.count_empty_per_row())
+
+    def __len__(self) -> int:
+        return int(self.cumulative[-1]) if len(self.cumulative) else 0
+
+    def __getitem__(self, index: int) -> Tuple[int, int]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('empty cell index out of range')
+        y = int(np.searchsorted(self.cumulative, index, side='right'))
+        offset = index - (int(self.cumulative[y - 1]) if y else 0)
+        x = int(np.flatnonzero(self.grid[y, :] == TileType.EMPTY)[offset])
+        return x, y
+
+    def take(self, indices) -> np.ndarray:
+        """
+        番号の列に対応する空きマスを、与えた順に (個数, 2) の(x, y)の配列で返す
+        1マスずつ行を展開する__getitem__と違い、行のブロックごとにまとめて展開する
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        result = np.zeros((len(indices), 2), dtype=np.intp)
+        rows, cols = self.grid.shape
+        block_rows = max(1, (1 << 20) // max(1, cols))
+        for y0 in range(0, rows, block_rows):
+            y1 = min(rows, y0 + block_rows)
+            first = int(self.cumulative[y0 - 1]) if y0 else 0
+            inside = np.flatnonzero((indices >= first) & (indices < int(self.cumulative[y1 - 1])))
+            if len(inside) == 0:
+                continue
+            cells = np.flatnonzero(self.grid[y0:y1, :] == TileType.EMPTY)[indices[inside] - first]
+            result[inside, 1], result[inside, 0] = np.divmod(cells, cols)
+            result[inside, 1] += y0
+        return result
+
+    def __contains__(self, pos) -> bool:
+        x, y = pos
+        return (0 <= x < self.grid.cols and 0 <= y < self.grid.rows and
+                self.grid[y, x] == TileType.EMPTY)
 
 class MazeGenerator:
     """
@@ -24,25 +311,58 @@ class MazeGenerator:
     Members:
         width (int): 迷路の幅。
         height (int): 迷路の高さ。
-        maze (list[list[str]]): 迷路データ。
+        maze (PackedTileGrid): 迷路データ。壁を1マス1ビットで持ち、スタート・ゴール・コインは疎な表で持つ。
+        rng (random.Random): 迷路の生成に使う乱数生成器。generate()で設定される。
 
     Methods:
         __init__(): コンストラクタ。
-        _get_empty_spaces(): 空きマスの位置を取得。
+        _get_empty_spaces(): 空きマスの位置の列を取得。
+        _find_diagonal_ends(): 左上・右下に最も近い空きマスを求める。
         _calculate_distance(): 2点間のマンハッタン距離を計算。
         _are_adjacent(): 2つの位置が隣接しているかチェック。
+        _open_cells(): 外周を壁で埋めた通路マスのフラットな配列を作る。
+        _bfs(): 1マスから幅優先探索し、各マスの経路長と訪れた順のマスを返す。
+        _find_farthest_pair(): 2回の幅優先探索で経路長が最大の2マスを求める。
+        _find_path_distance_pair(): 経路長がmin_distance以上の2マスを幅優先探索で選ぶ。
         _place_start_end(): スタートとゴールを配置。
-            generate(): 迷路の生成実行。
+        _carve(): 深さ優先探索で迷路を掘る。
+        _carve_spanning_tree(): ランダムな全域木を配列演算で求めて迷路を掘る。
+        _carve_rows(): エラーのアルゴリズムで1行ずつ迷路を掘る。
+        _carve_batch(): carve_maze_batch()で1つの迷路を掘る。
+        generate_grid(): 迷路を生成し、ビット詰めのグリッドのまま返す。
+        generate(): 迷路を生成し、文字列のリストで返す。seedまたはrngを指定すると同じ迷路を再現できる。
+        generate_floors(): 階段でつながった複数の階の迷路を生成し、(階, 高さ, 幅) のグリッドで返す。
     """
     def __init__(self, width, height):
         self.width = width
         self.height = height
-        self.maze = [['#' for x in range(width)] for y in range(height)]
+        self.maze = PackedTileGrid(height, width, fill_wall=True)
+        self.rng = random
         
-    def _get_empty_spaces(self) -> list[Tuple[int, int]]:
-        """空きマスの位置をリストで返す"""
-        return [(x, y) for y in range(self.height) 
-               for x in range(self.width) if self.maze[y][x] == ' ']
+    def _get_empty_spaces(self) -> EmptyCells:
+        """空きマスの位置を行優先の順に並べた列で返す（リストは作らない）"""
+        return EmptyCells(self.maze)
+
+    def _find_diagonal_ends(self) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """
+        x + y が最小（左上）と最大（右下）の空きマスを返す。同じ値なら行優先で先のマス
+        グリッドを行のブロックごとに展開して調べる
+        """
+        block_rows = max(1, (1 << 20) // max(1, self.width))
+        best_min = best_max = None
+        for y0 in range(0, self.height, block_rows):
+            ys, xs = np.nonzero(self.maze[y0:y0 + block_rows, :] == TileType.EMPTY)
+            if len(xs) == 0:
+                continue
+            diagonal = xs + ys + y0
+            i, j = int(np.argmin(diagonal)), int(np.argmax(diagonal))
+            if best_min is None or diagonal[i] < best_min[0]:
+                best_min = (int(diagonal[i]), (int(xs[i]), int(ys[i]) + y0))
+            if best_max is None or diagonal[j] > best_max[0]:
+                best_max = (int(diagonal[j]), (int(xs[j]), int(ys[j]) + y0))
+        if best_min is None:
+            raise ValueError("The maze has no empty cell")
+        return best_min[1], best_max[1]
 
     def _calculate_distance(self, pos1: Tuple[int, int], pos2: Tuple[int, int]) -> int:
         """2点間のマンハッタン距離を計算"""
@@ -52,22 +372,87 @@ class MazeGenerator:
         """2つの位置が隣接しているかチェック"""
         return self._calculate_distance(pos1, pos2) == 1
 
+    def _open_cells(self) -> tuple[bytes, int]:
+        """
+        外周を1マスの壁で囲んだグリッドで、通路(壁以外)のマスを1とするフラットなバイト列と、その行の幅を返す
+        マス(x, y)は (y + 1) * 幅 + (x + 1) の位置になる
+        """
+        walls = np.unpackbits(self.maze.bits, axis=1, count=self.width, bitorder='little')
+        return np.pad(walls == 0, 1, constant_values=False).astype(np.uint8).tobytes(), self.width + 2
+
+    def _bfs(self, passable: bytes, stride: int, source: int) -> tuple[array, array]:
+        """
+        _open_cells()のバイト列上でsourceから幅優先探索し、(経路長の配列, 訪れた順のマスの配列) を返す
+        到達できないマスの経路長は-1。訪れた順のマスは経路長の昇順に並ぶ
+        """
+        distance = array('i', [-1]) * len(passable)
+        distance[source] = 0
+        order = array('i', [source])
+        head = 0
+        while head < len(order):
+            cell = order[head]
+            head += 1
+            next_distance = distance[cell] + 1
+            for neighbor in (cell + 1, cell - 1, cell + stride, cell - stride):
+                if passable[neighbor] and distance[neighbor] < 0:
+                    distance[neighbor] = next_distance
+                    order.append(neighbor)
+        return distance, order
+
+    def _find_farthest_pair(self) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """
+        任意の通路マスから最も遠いマスaを求め、aから最も遠いマスbとの組を返す（2回の幅優先探索）
+        分岐の無い完全迷路では通路に沿った距離が最大の2マスになる
+        """
+        passable, stride = self._open_cells()
+        first = passable.find(1)
+        if first < 0:
+            raise ValueError("The maze has no empty cell")
+        _, order = self._bfs(passable, stride, first)
+        _, order = self._bfs(passable, stride, order[-1])
+        (ay, ax), (by, bx) = divmod(order[0], stride), divmod(order[-1], stride)
+        return (ax - 1, ay - 1), (bx - 1, by - 1)
+
+    def _find_path_distance_pair(self, empty_spaces: EmptyCells,
+                                 min_distance: int) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """
+        ランダムなスタートから幅優先探索し、経路長がmin_distance以上のマスからゴールをランダムに選ぶ
+        スタートから十分遠いマスが無ければ、最も遠いマス（迷路の端）をスタートにして探索し直す
+        それでも無ければ条件を満たす組は存在しないためValueError
+        """
+        passable, stride = self._open_cells()
+        if len(empty_spaces) < 2:
+            raise ValueError("The maze needs at least two empty cells")
+        x, y = empty_spaces[self.rng.randrange(len(empty_spaces))]
+        distance, order = self._bfs(passable, stride, (y + 1) * stride + x + 1)
+        if distance[order[-1]] < min_distance:
+            distance, order = self._bfs(passable, stride, order[-1])
+            if distance[order[-1]] < min_distance:
+                raise ValueError("Could not find positions with required minimum distance")
+        # 訪れた順は経路長の昇順なので、min_distance以上のマスは末尾の連続した範囲になる
+        first = bisect_left(order, min_distance, key=distance.__getitem__)
+        end = order[self.rng.randrange(first, len(order))]
+        (sy, sx), (ey, ex) = divmod(order[0], stride), divmod(end, stride)
+        return (sx - 1, sy - 1), (ex - 1, ey - 1)
+
     def _place_start_end(self, strategy: StartEndStrategy, 
                         start_pos: Optional[Tuple[int, int]], 
                         end_pos: Optional[Tuple[int, int]],
                         min_distance: Optional[int]) -> Tuple[Tuple[int, int], Tuple[int, int]]:
         """指定された戦略でスタートとゴールを配置"""
         empty_spaces = self._get_empty_spaces()
-        
+
+        if not min_distance:
+            min_distance = (self.width + self.height) // 4
+
         if strategy == StartEndStrategy.DIAGONAL:
             # 左上に最も近い空きマスと右下に最も近い空きマスを選択
-            start = min(empty_spaces, key=lambda p: p[0] + p[1])
-            end = max(empty_spaces, key=lambda p: p[0] + p[1])
+            start, end = self._find_diagonal_ends()
             
         elif strategy == StartEndStrategy.RANDOM:
             # ランダムに2つ選択（隣接チェック付き）
             while True:
-                start, end = random.sample(empty_spaces, 2)
+                start, end = self.rng.sample(empty_spaces, 2)
                 if not self._are_adjacent(start, end):
                     break
                     
@@ -81,68 +466,201 @@ class MazeGenerator:
             
         elif strategy == StartEndStrategy.MIN_DISTANCE:
             # 指定された最小距離を満たすようにランダムに配置
-            if not min_distance:
-                min_distance = (self.width + self.height) // 4
             max_attempts = 100
             for _ in range(max_attempts):
-                start, end = random.sample(empty_spaces, 2)
+                start, end = self.rng.sample(empty_spaces, 2)
                 if self._calculate_distance(start, end) >= min_distance:
                     break
             else:
                 raise ValueError("Could not find positions with required minimum distance")
+
+        elif strategy == StartEndStrategy.FARTHEST_PAIR:
+            start, end = self._find_farthest_pair()
+
+        elif strategy == StartEndStrategy.MIN_PATH_DISTANCE:
+            start, end = self._find_path_distance_pair(empty_spaces, min_distance)
                 
         return start, end
 
-    def generate(self, coin_count=None, 
-                strategy: StartEndStrategy = StartEndStrategy.DIAGONAL,
-                start_pos: Tuple[int, int] = None,
-                end_pos: Tuple[int, int] = None,
-                min_distance: int = None) -> list[str]:
-        # まず迷路を掘る（元の実装）
+    def _carve(self):
+        """(1, 1)から深さ優先探索で2マスずつ掘り進める（スタックはフラットインデックスの配列）"""
+        width, height = self.width, self.height
+        # 壁のビット列をバイト単位で直接読み書きする（1マス1ビット、各行はstrideバイト）
+        bits = memoryview(self.maze.bits).cast('B')
+        stride = self.maze.bits.shape[1]
+
+        def is_wall(x, y):
+            return bits[y * stride + (x >> 3)] >> (x & 7) & 1
+
+        def dig(x, y):
+            bits[y * stride + (x >> 3)] &= ~(1 << (x & 7)) & 0xFF
+
         start_x = 1
         start_y = 1
-        self.maze[start_y][start_x] = ' '
+        dig(start_x, start_y)
 
-        stack = [(start_x, start_y)]
+        stack = array('i', [start_y * width + start_x])
         directions = [(0, 2), (2, 0), (0, -2), (-2, 0)]
 
         while stack:
-            current_x, current_y = stack[-1]
-            random.shuffle(directions)
+            current_y, current_x = divmod(stack[-1], width)
+            self.rng.shuffle(directions)
             
             can_dig = False
             for dx, dy in directions:
                 new_x = current_x + dx
                 new_y = current_y + dy
                 
-                if (0 < new_x < self.width-1 and 
-                    0 < new_y < self.height-1 and 
-                    self.maze[new_y][new_x] == '#'):
-                    self.maze[new_y][new_x] = ' '
-                    self.maze[current_y + dy//2][current_x + dx//2] = ' '
-                    stack.append((new_x, new_y))
+                if (0 < new_x < width-1 and 
+                    0 < new_y < height-1 and 
+                    is_wall(new_x, new_y)):
+                    dig(new_x, new_y)
+                    dig(current_x + dx//2, current_y + dy//2)
+                    stack.append(new_y * width + new_x)
                     can_dig = True
                     break
             
             if not can_dig:
                 stack.pop()
 
+    def _carve_spanning_tree(self):
+        """
+        奇数座標のマスを頂点とする格子のランダムな全域木を求め、頂点と使われた辺のマスを掘る
+        深さ優先探索と同じく (1, 1) から width-2, height-2 までの奇数座標のマスがすべてつながる
+        """
+        nx, ny = (self.width - 1) // 2, (self.height - 1) // 2
+        walls = np.ones((self.height, self.width), dtype=bool)
+        if nx == 0 or ny == 0:
+            # 深さ優先探索と同じく、小さな迷路でも(1, 1)は掘る
+            walls[1:2, 1:2] = False
+        else:
+            np_rng = np.random.default_rng(self.rng.getrandbits(64))
+            horizontal, vertical = random_spanning_tree(nx, ny, np_rng)
+            walls[1:2 * ny:2, 1:2 * nx:2] = False
+            walls[1:2 * ny:2, 2:2 * nx - 1:2] = ~horizontal
+            walls[2:2 * ny - 1:2, 1:2 * nx:2] = ~vertical
+        self.maze.bits = np.packbits(walls, axis=1, bitorder='little')
+
+    def _carve_rows(self):
+        """eller_rows()の行を順に壁のビット列へ詰める（グリッド全体をuint8で持たない）"""
+        for y, row in enumerate(eller_rows(self.width, self.rng.getrandbits(64), self.height)):
+            self.maze.bits[y] = np.packbits(row == TileType.WALL, bitorder='little')
+        if min(self.width, self.height) > 1 and ((self.width - 1) // 2 == 0 or (self.height - 1) // 2 == 0):
+            # 深さ優先探索と同じく、小さな迷路でも(1, 1)は掘る
+            self.maze.set_wall(1, 1, False)
+
+    def _carve_batch(self, algorithm: MazeAlgorithm):
+        """carve_maze_batch()で迷路を1つだけ掘り、壁のビット列へ詰める"""
+        np_rng = np.random.default_rng(self.rng.getrandbits(64))
+        walls = carve_maze_batch(1, self.width, self.height, algorithm, np_rng)[0]
+        self.maze.bits = np.packbits(walls, axis=1, bitorder='little')
+
+    def generate_grid(self, coin_count=None, 
+                      strategy: StartEndStrategy = StartEndStrategy.DIAGONAL,
+                      start_pos: Tuple[int, int] = None,
+                      end_pos: Tuple[int, int] = None,
+                      min_distance: int = None,
+                      seed: int = None,
+                      rng: random.Random = None,
+                      algorithm: MazeAlgorithm = MazeAlgorithm.DEPTH_FIRST) -> PackedTileGrid:
+        """
+        迷路を生成し、ビット詰めのグリッド(PackedTileGrid)のまま返す
+        DEPTH_FIRSTは文字列やuint8のグリッドを作らないため、非常に大きな迷路も少ないメモリで生成できる
+        KRUSKALは辺の配列を持つ分メモリを使うが、大きな迷路を何十倍も速く生成できる
+        """
+        # 乱数生成器を決定（どちらも省略した場合はrandomモジュールの共有の乱数を使う）
+        if rng is not None:
+            self.rng = rng
+        elif seed is not None:
+            self.rng = random.Random(seed)
+        else:
+            self.rng = random
+
+        # まず迷路を掘る
+        if algorithm == MazeAlgorithm.KRUSKAL:
+            self._carve_spanning_tree()
+        elif algorithm == MazeAlgorithm.ELLER:
+            self._carve_rows()
+        elif algorithm in BATCH_ALGORITHMS:
+            self._carve_batch(algorithm)
+        else:
+            self._carve()
+
         # スタート・ゴール位置を決定
         start, end = self._place_start_end(strategy, start_pos, end_pos, min_distance)
         
         # スタート・ゴールを配置
-        self.maze[start[1]][start[0]] = 's'
-        self.maze[end[1]][end[0]] = 'g'
+        self.maze[start[1], start[0]] = TileType.START
+        self.maze[end[1], end[0]] = TileType.GOAL
 
         # コインを配置
-        empty_spaces = [(x, y) for y in range(self.height) for x in range(self.width) 
-                       if self.maze[y][x] == ' ']
+        empty_spaces = self._get_empty_spaces()
         
         if coin_count is None:
             coin_count = len(empty_spaces) // 30
         coin_count = min(coin_count, len(empty_spaces))
         
-        for x, y in random.sample(empty_spaces, coin_count):
-            self.maze[y][x] = '.'
+        # 番号だけを選んでからまとめて位置に直す（rng.sample(empty_spaces, ...)と同じ結果になる）
+        coins = empty_spaces.take(self.rng.sample(range(len(empty_spaces)), coin_count))
+        self.maze.set_tiles(coins[:, 1], coins[:, 0], TileType.COIN)
+
+        return self.maze
+
+    def generate(self, coin_count=None, 
+                strategy: StartEndStrategy = StartEndStrategy.DIAGONAL,
+                start_pos: Tuple[int, int] = None,
+                end_pos: Tuple[int, int] = None,
+                min_distance: int = None,
+                seed: int = None,
+                rng: random.Random = None,
+                algorithm: MazeAlgorithm = MazeAlgorithm.DEPTH_FIRST) -> list[str]:
+        grid = self.generate_grid(coin_count, strategy, start_pos, end_pos, min_distance, seed, rng, algorithm)
+        return grid_to_rows(np.asarray(grid))
+
+    def generate_floors(self, floors: int, coin_count=None,
+                        seed: int = None,
+                        rng: random.Random = None,
+                        algorithm: MazeAlgorithm = MazeAlgorithm.DEPTH_FIRST) -> np.ndarray:
+        """
+        階段でつながったfloors階分の迷路を生成し、タイルコードの (floors, height, width) のuint8配列で返す
+        スタートは0階の左上（StartEndStrategy.DIAGONALと同じ）、ゴールは最上階に置く
+        各階では到着したマスから通路に沿って最も遠いマスを、上の階でも通路のマスから選び、
+        その階のSTAIRS_UPと上の階のSTAIRS_DOWNを同じ位置に置く（最後の階ではそこをゴールにする）
+        コインは階ごとにcoin_count個（省略時は空きマスの1/30）を置く
+        """
+        if floors < 1:
+            raise ValueError("floors must be at least 1")
+        if rng is None:
+            rng = random.Random(seed) if seed is not None else random
+        # 各階の迷路を掘る（スタート・ゴールは0階のスタート以外を後で消す）
+        generators = [self] + [MazeGenerator(self.width, self.height) for _ in range(floors - 1)]
+        grids = np.stack([np.asarray(generator.generate_grid(coin_count=0, rng=rng, algorithm=algorithm))
+                          for generator in generators])
+        start = np.argwhere(grids[0] == TileType.START)[0]
+        grids[(grids == TileType.START) | (grids == TileType.GOAL)] = TileType.EMPTY
+        grids[0][tuple(start)] = TileType.START
+
+        arrival = tuple(start)
+        for floor, generator in enumerate(generators):
+            passable, stride = generator._open_cells()
+            distance, _ = generator._bfs(passable, stride, (arrival[0] + 1) * stride + arrival[1] + 1)
+            distance = np.frombuffer(distance, dtype=np.int32).reshape(self.height + 2, stride)[1:-1, 1:-1]
+            if floor + 1 < floors:
+                # 上の階で壁になっているマスには階段を置けない
+                distance = np.where(grids[floor + 1] != TileType.WALL, distance, -1)
+            target = np.unravel_index(np.argmax(distance), distance.shape)
+            if distance[target] <= 0:
+                raise ValueError(f"No cell for the stairs on floor {floor}")
+            if floor + 1 < floors:
+                grids[floor][target] = TileType.STAIRS_UP
+                grids[floor + 1][target] = TileType.STAIRS_DOWN
+                arrival = target
+            else:
+                grids[floor][target] = TileType.GOAL
 
-        return [''.join(row) for row in self.maze]
+        # コインを配置（階ごとに空きマスを行優先に並べた番号から選ぶ）
+        for grid in grids:
+            empty = np.flatnonzero(grid == TileType.EMPTY)
+            count = len(empty) // 30 if coin_count is None else min(coin_count, len(empty))
+            grid.flat[empty[rng.sample(range(len(empty)), count)]] = TileType.COIN
+        return grids
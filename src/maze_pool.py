@@ -0,0 +1,120 @@
+import multiprocessing
+import random
+import threading
+from collections import deque
+
+import numpy as np
+
+from map import Map, MazeSpec
+from maze_generator import MazeAlgorithm, StartEndStrategy
+from packed_grid import PackedTileGrid
+
+def build_maze_arrays(width: int, height: int, tile_size: float, coin_count: int, seed: int,
+                      chunk_size: int) -> dict[str, np.ndarray]:
+    """
+    迷路を生成して壁グループとチャンクメッシュまで構築し、名前付きの配列で返す（ワーカープロセスで実行する）
+    配列の名前はMap.export_geometry()と同じで、タイルグリッドは'grid'
+    """
+    map_instance = Map.generate_maze_map(width, height, [0, 0, 0], tile_size, coin_count=coin_count, seed=seed)
+    # ビット詰めのグリッドの大きな迷路は、チャンクメッシュを描画時にチャンクごとに構築する
+    arrays = {} if isinstance(map_instance.grid, PackedTileGrid) else map_instance.export_geometry(chunk_size)
+    arrays['grid'] = map_instance.grid
+    return arrays
+
+class MazePool:
+    """
+    迷路とその静的メッシュをバックグラウンドのプロセスで事前に生成しておくプール。
+    常にcapacity個の迷路が生成済みか生成中になるよう補充し、get()ですぐに渡す。
+
+    Members:
+        maze_size (tuple[int,int]): 生成する迷路の大きさ (幅, 高さ)。
+        capacity (int): 用意しておく迷路の数。
+        tile_size (float): マップ1マスのサイズ。
+        coin_count (int): 迷路に置くコインの数。
+        chunk_size (int): 事前に構築するチャンクメッシュのチャンクの大きさ。
+        process_pool (multiprocessing.pool.Pool|None): 迷路を生成するプロセスプール。終了後はNone。
+        pending (deque[tuple[int, AsyncResult]]): 要求した順の (シード, 生成結果) の列。
+        lock (threading.Lock): pendingとprocess_poolを操作する間に取るロック（get()は複数のスレッドから呼ばれる）。
+
+    Methods:
+        __init__(): コンストラクタ。プロセスプールを作り、迷路の生成を始める。
+        fill(): 用意している迷路がcapacity個になるまで生成を要求する。
+        ready_count(): 生成済みの迷路の数を返す。
+        get(): 用意した迷路を1つ取り出し、(Map, シード) を返す。
+        shutdown(): プロセスプールを終了する。
+    """
+    def __init__(self, maze_size: tuple[int, int] = (15, 15), capacity: int = 2, tile_size: float = 100,
+                 coin_count: int = 3, chunk_size: int = 8, max_workers: int = None):
+        self.maze_size = maze_size
+        self.capacity = capacity
+        self.tile_size = tile_size
+        self.coin_count = coin_count
+        self.chunk_size = chunk_size
+        # pyxelを初期化した親プロセスをforkしないよう、ワーカーは新しいプロセスとして起動する
+        self.process_pool = multiprocessing.get_context('spawn').Pool(max_workers or capacity)
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self.fill()
+
+    def fill(self):
+        """用意している（生成済みまたは生成中の）迷路がcapacity個になるまで生成を要求する"""
+        with self.lock:
+            if self.process_pool is None:
+                return
+            while len(self.pending) < self.capacity:
+                seed = random.getrandbits(32)
+                result = self.process_pool.apply_async(build_maze_arrays, (*self.maze_size, self.tile_size,
+                                                                           self.coin_count, seed, self.chunk_size))
+                self.pending.append((seed, result))
+
+    def ready_count(self) -> int:
+        """生成済みの迷路の数を返す"""
+        with self.lock:
+            return sum(result.ready() for _, result in self.pending)
+
+    def get(self) -> tuple[Map, int]:
+        """
+        生成済みの迷路を1つ取り出して (Map, シード) を返し、取り出した分の生成を要求する
+        生成済みの迷路が無ければ最も早く要求した迷路の完成を待ち、プールが使えなければその場で生成する
+        複数のスレッドから呼んでも、同じ迷路を2回渡すことはない
+        """
+        # 取り出す迷路はロックを取って選び、完成を待つのはロックの外で行う
+        with self.lock:
+            entry = next((entry for entry in self.pending if entry[1].ready()), None)
+            if entry is None and self.pending:
+                entry = self.pending[0]
+            if entry is not None:
+                self.pending.remove(entry)
+        arrays = None
+        if entry is not None:
+            seed, result = entry
+            # 待っている間にshutdown()されると結果が届かないため、プールが使える間だけ待つ
+            while not result.ready() and self.process_pool is not None:
+                result.wait(0.1)
+            try:
+                arrays = result.get() if result.ready() else None
+            except Exception:
+                # ワーカーで生成に失敗した場合はプールを使わずに生成する
+                self.shutdown()
+        if arrays is None:
+            seed = random.getrandbits(32)
+            arrays = build_maze_arrays(*self.maze_size, self.tile_size, self.coin_count, seed, self.chunk_size)
+        self.fill()
+
+        map_instance = Map(arrays.pop('grid'), [0, 0, 0], self.tile_size)
+        map_instance.import_geometry(arrays, self.chunk_size)
+        map_instance.spec = MazeSpec(*self.maze_size, self.coin_count, StartEndStrategy.DIAGONAL, None, seed,
+                                     MazeAlgorithm.DEPTH_FIRST)
+        return map_instance, seed
+
+    def shutdown(self):
+        """
+        プロセスプールを終了する（生成中の迷路は破棄する）
+        生成中のワーカーは終わるのを待たずに止める（止めないとインタープリタの終了時に生成が終わるまで待たされる）
+        """
+        with self.lock:
+            if self.process_pool is not None:
+                self.process_pool.terminate()
+                self.process_pool.join()
+                self.process_pool = None
+            self.pending.clear()
@@ -0,0 +1,125 @@
+import numpy as np
+
+from chunk import Chunk, ChunkGrid, is_box_visible
+from map import Map
+from maze_generator import MazeAlgorithm, MazeGenerator
+from tile import TileType
+
+class MultiFloorMap:
+    """
+    階段でつながった複数の階からなる迷路。階ごとにMapを持ち、プレイヤーのいる階を切り替えて使う。
+    floor階目のMapはorigin_posからfloor_heightずつ上（yの負の方向）にずらして置くため、
+    床・壁のチャンクメッシュは階ごとに独立して構築される。
+    描画するのはプレイヤーのいる階と、階段の開口部から見える隣の階の階段のチャンクのみで、階の数には依存しない。
+
+    Members:
+        floors (list[Map]): 階ごとのマップ。0階が一番下で、スタートは0階、ゴールは最上階にある。
+        floor_height (float): 階の間隔（ワールド座標）。
+        current (int): プレイヤーのいる階。
+        stair_cells (list[dict[TileType, list[tuple[int,int]]]]): 階ごとの、上り・下りの階段のマス (col, row) のリスト。
+        stream_radius (float|None): 各階のChunkGridのストリーミング半径。Noneなら階全体を覆う半径にする。
+
+    Methods:
+        generate(): 迷路を生成してMultiFloorMapを返す。
+        __init__(): コンストラクタ。
+        map: プレイヤーのいる階のMap。
+        get_chunk_grid(): 階のChunkGridを返す（初回呼び出し時に生成）。
+        use_stairs(): 階段のマスに入った時に、つながっている階へ移動する。
+        get_initial_view_direction(): 今の階の上り階段（最上階ではゴール）の方向を返す。
+        get_remaining_coins(): 全ての階の残りのコイン数を返す。
+        get_visible_chunks(): 今の階と、階段の開口部から見える隣の階のチャンクのうち視錐台と交わるものを返す。
+        restore_pristine(): 全ての階を生成時の状態に戻し、0階のスタート位置に戻る。
+    """
+    @classmethod
+    def generate(cls, width: int, height: int, floor_count: int, origin_pos: list[float], tile_size: float,
+                 coin_count: int = None, seed: int = None,
+                 algorithm: MazeAlgorithm = MazeAlgorithm.DEPTH_FIRST,
+                 stream_radius: float = None) -> 'MultiFloorMap':
+        """MazeGenerator.generate_floors()でfloor_count階分の迷路を生成してMultiFloorMapを返す"""
+        grids = MazeGenerator(width, height).generate_floors(floor_count, coin_count=coin_count, seed=seed,
+                                                             algorithm=algorithm)
+        return cls(grids, origin_pos, tile_size, stream_radius=stream_radius)
+
+    def __init__(self, grids: np.ndarray, origin_pos: list[float], tile_size: float,
+                 floor_height: float = None, stream_radius: float = None):
+        # 既定では1階分の壁の高さだけ上に重ね、下の階の壁の上端を上の階の床にする
+        self.floor_height = tile_size if floor_height is None else floor_height
+        self.floors = [Map(grid, [origin_pos[0], origin_pos[1] - floor * self.floor_height, origin_pos[2]],
+                           tile_size)
+                       for floor, grid in enumerate(grids)]
+        self.current = 0
+        self.stair_cells = [{tile: [(int(col), int(row)) for row, col in np.argwhere(grid == tile)]
+                             for tile in (TileType.STAIRS_UP, TileType.STAIRS_DOWN)}
+                            for grid in grids]
+        self.stream_radius = stream_radius
+
+    @property
+    def map(self) -> Map:
+        """プレイヤーのいる階のMap"""
+        return self.floors[self.current]
+
+    def get_chunk_grid(self, floor: int = None) -> ChunkGrid:
+        """
+        floor階（省略時は今の階）のChunkGridを返す
+        隣の階では階段のチャンクのみを構築するよう、ChunkGridは常にストリーミングモードで作る
+        stream_radiusがNoneなら階全体を覆う半径にし、プレイヤーのいる階では全チャンクが読み込まれる
+        """
+        floor_map = self.floors[self.current if floor is None else floor]
+        stream_radius = self.stream_radius
+        if stream_radius is None:
+            stream_radius = max(floor_map.rows, floor_map.cols) * floor_map.tile_size
+        return floor_map.get_chunk_grid(stream_radius=stream_radius)
+
+    def use_stairs(self, col: int, row: int) -> Map | None:
+        """
+        今の階のマス(col, row)が階段なら、つながっている階へ移動してその階のMapを返す（階段でなければNone）
+        移動先の階のカメラ位置は、同じマスの上で床からの高さが同じ位置にする
+        """
+        tile = self.map.get_tile(col, row)
+        if tile == TileType.STAIRS_UP and self.current + 1 < len(self.floors):
+            floor = self.current + 1
+        elif tile == TileType.STAIRS_DOWN and self.current > 0:
+            floor = self.current - 1
+        else:
+            return None
+        x, y, z = self.map.get_camera_position()
+        y -= self.map.origin_pos[1]
+        self.current = floor
+        self.map.camera_position = [x, self.map.origin_pos[1] + y, z]
+        return self.map
+
+    def get_initial_view_direction(self) -> tuple[float, float]:
+        """カメラ位置から今の階の上り階段（最上階ではゴール）を向く (yaw, pitch) を返す"""
+        stairs = self.stair_cells[self.current][TileType.STAIRS_UP]
+        if stairs:
+            x, z = self.map.grid_to_world(*stairs[0])
+        else:
+            x, _, z = self.map.goal_position
+        position = self.map.get_camera_position()
+        return np.arctan2(z - position[2], x - position[0]), -0.1
+
+    def get_remaining_coins(self) -> int:
+        """全ての階の残りのコイン数を返す"""
+        return sum(floor.get_remaining_coins() for floor in self.floors)
+
+    def get_visible_chunks(self, view_projection_matrix, width: float, height: float) -> list[Chunk]:
+        """
+        今の階のチャンクと、今の階とつながる隣の階の階段（上の階の下り階段・下の階の上り階段）を含むチャンクのうち、
+        視錐台と交わるものを返す。隣の階のチャンクは階段の周りのみ構築する
+        """
+        chunks = self.get_chunk_grid().get_visible_chunks(view_projection_matrix, width, height)
+        for floor, tile in ((self.current + 1, TileType.STAIRS_DOWN), (self.current - 1, TileType.STAIRS_UP)):
+            if not 0 <= floor < len(self.floors):
+                continue
+            chunk_grid = self.get_chunk_grid(floor)
+            keys = sorted({chunk_grid.chunk_key(col, row) for col, row in self.stair_cells[floor][tile]})
+            chunks.extend(chunk for chunk in chunk_grid.get_chunks_at(keys)
+                          if is_box_visible(view_projection_matrix, chunk.bounds_min, chunk.bounds_max,
+                                            width, height))
+        return chunks
+
+    def restore_pristine(self):
+        """全ての階の取得されたコインと壊された壁を元に戻し、0階のスタート位置に戻る"""
+        for floor in self.floors:
+            floor.restore_pristine()
+        self.current = 0
@@ -0,0 +1,188 @@
+import numpy as np
+
+from tile import TileType
+
+# バイトごとの立っているビット数
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+class PackedTileGrid:
+    """
+    壁/通路を1マス1ビットで保持するタイルグリッド。大きな迷路をuint8のグリッドより少ないメモリで扱う。
+    壁のビットは各行をnp.packbits(bitorder='little')で詰めて持ち、コイン・スタート・ゴールは
+    フラットインデックス順に並べた疎な表に保持する。Mapのuint8グリッドと同じ添字で読み書きできる。
+
+    Members:
+        rows (int): 行数。
+        cols (int): 列数。
+        bits (np.ndarray): (rows, ceil(cols / 8)) の壁のビット列。
+        item_cells (np.ndarray): 壁・通路以外のタイルがあるマスのフラットインデックス（昇順）。
+        item_tiles (np.ndarray): item_cellsの各マスのタイルコード。
+
+    Methods:
+        __init__(): コンストラクタ。全マスを壁または通路で埋める。
+        from_array(): uint8のタイルグリッドから作る。
+        shape: (rows, cols) を返す。
+        nbytes: 使用しているバイト数を返す。
+        is_wall(): マスが壁かを判定。
+        set_wall(): マスを壁または通路にする。
+        _find_items(): フラットインデックスの配列に対応する表の位置と、表にあるかを返す。
+        _decode(): 指定した範囲をuint8のタイルグリッドに展開する。
+        __getitem__(): grid[row, col]、grid[r0:r1, c0:c1]、grid[行の配列, 列の配列] でタイルコードを返す。
+        __setitem__(): grid[row, col] = tile でタイルコードを書き換える。
+        set_tiles(): 複数のマスのタイルコードをまとめて書き換える。
+        __array__(): 全体をuint8のタイルグリッドに展開する。
+        to_arrays(): 保存用に名前付きの配列として返す。
+        from_arrays(): to_arrays()で保存した配列から作る。
+        find(): 表にあるタイルのマスを (row, col) の配列で返す。
+        count_tiles(): タイルコードごとのマス数を返す。
+        count_empty_per_row(): 行ごとの通路(EMPTY)のマス数を返す。
+    """
+    def __init__(self, rows: int, cols: int, fill_wall: bool = True):
+        self.rows = rows
+        self.cols = cols
+        row_bits = np.packbits(np.full(cols, fill_wall, dtype=bool), bitorder='little')
+        self.bits = np.tile(row_bits, (rows, 1))
+        self.item_cells = np.zeros(0, dtype=np.int64)
+        self.item_tiles = np.zeros(0, dtype=np.uint8)
+
+    @classmethod
+    def from_array(cls, grid: np.ndarray) -> 'PackedTileGrid':
+        """uint8のタイルグリッドから作る"""
+        grid = np.asarray(grid, dtype=np.uint8)
+        packed = cls(*grid.shape, fill_wall=False)
+        packed.bits = np.packbits(grid == TileType.WALL, axis=1, bitorder='little')
+        packed.item_cells = np.flatnonzero(grid > TileType.WALL).astype(np.int64)
+        packed.item_tiles = grid.ravel()[packed.item_cells]
+        return packed
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.rows, self.cols
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes + self.item_cells.nbytes + self.item_tiles.nbytes
+
+    def is_wall(self, row: int, col: int) -> bool:
+        """マス(col, row)が壁かを判定"""
+        return bool((self.bits[row, col >> 3] >> (col & 7)) & 1)
+
+    def set_wall(self, row: int, col: int, wall: bool):
+        """マス(col, row)を壁または通路にする（表のタイルは変更しない）"""
+        if wall:
+            self.bits[row, col >> 3] |= 1 << (col & 7)
+        else:
+            self.bits[row, col >> 3] &= ~(1 << (col & 7)) & 0xFF
+
+    def _find_items(self, flat: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """フラットインデックスの配列について、表での位置と表にあるかどうかを返す"""
+        index = np.searchsorted(self.item_cells, flat)
+        found = index < len(self.item_cells)
+        found[found] = self.item_cells[index[found]] == flat[found]
+        return index, found
+
+    def _decode(self, r0: int, r1: int, c0: int, c1: int) -> np.ndarray:
+        """[r0, r1) × [c0, c1) の範囲をuint8のタイルグリッドに展開する"""
+        b0, b1 = c0 >> 3, -(-c1 // 8)
+        bits = np.unpackbits(self.bits[r0:r1, b0:b1], axis=1, bitorder='little')
+        window = bits[:, c0 - b0 * 8:c1 - b0 * 8]
+        # 範囲内にある表のタイルを重ねる
+        start, end = np.searchsorted(self.item_cells, [r0 * self.cols, r1 * self.cols])
+        if start < end:
+            item_rows, item_cols = np.divmod(self.item_cells[start:end], self.cols)
+            inside = (item_cols >= c0) & (item_cols < c1)
+            window[item_rows[inside] - r0, item_cols[inside] - c0] = self.item_tiles[start:end][inside]
+        return window
+
+    def __getitem__(self, key):
+        row, col = key
+        if isinstance(row, slice) or isinstance(col, slice):
+            r0, r1, _ = (row if isinstance(row, slice) else slice(row, row + 1)).indices(self.rows)
+            c0, c1, _ = (col if isinstance(col, slice) else slice(col, col + 1)).indices(self.cols)
+            window = self._decode(r0, max(r0, r1), c0, max(c0, c1))
+            return window[0 if not isinstance(row, slice) else slice(None),
+                          0 if not isinstance(col, slice) else slice(None)]
+        if np.ndim(row) == 0 and np.ndim(col) == 0:
+            row, col = int(row), int(col)
+            if self.is_wall(row, col):
+                return TileType.WALL.value
+            index, found = self._find_items(np.array([row * self.cols + col]))
+            return int(self.item_tiles[index[0]]) if found[0] else TileType.EMPTY.value
+        rows, cols = np.broadcast_arrays(np.asarray(row, dtype=np.intp), np.asarray(col, dtype=np.intp))
+        tiles = ((self.bits[rows, cols >> 3] >> (cols & 7)) & 1).astype(np.uint8)
+        index, found = self._find_items((rows * self.cols + cols).astype(np.int64))
+        tiles[found] = self.item_tiles[index[found]]
+        return tiles
+
+    def __setitem__(self, key, tile):
+        row, col = int(key[0]), int(key[1])
+        tile = int(tile)
+        self.set_wall(row, col, tile == TileType.WALL)
+        flat = row * self.cols + col
+        index, found = self._find_items(np.array([flat]))
+        index, found = int(index[0]), bool(found[0])
+        if tile in (TileType.WALL, TileType.EMPTY):
+            if found:
+                self.item_cells = np.delete(self.item_cells, index)
+                self.item_tiles = np.delete(self.item_tiles, index)
+        elif found:
+            self.item_tiles[index] = tile
+        else:
+            self.item_cells = np.insert(self.item_cells, index, flat)
+            self.item_tiles = np.insert(self.item_tiles, index, tile)
+
+    def set_tiles(self, rows: np.ndarray, cols: np.ndarray, tile: TileType):
+        """複数のマス(cols, rows)をまとめて同じタイルコードに書き換える（表は1回だけ作り直す）"""
+        rows = np.asarray(rows, dtype=np.intp).ravel()
+        cols = np.asarray(cols, dtype=np.intp).ravel()
+        masks = np.left_shift(1, cols & 7).astype(np.uint8)
+        if tile == TileType.WALL:
+            np.bitwise_or.at(self.bits, (rows, cols >> 3), masks)
+        else:
+            np.bitwise_and.at(self.bits, (rows, cols >> 3), ~masks)
+        flat = rows.astype(np.int64) * self.cols + cols
+        keep = ~np.isin(self.item_cells, flat)
+        cells, tiles = self.item_cells[keep], self.item_tiles[keep]
+        if tile not in (TileType.WALL, TileType.EMPTY):
+            cells = np.concatenate([cells, np.unique(flat)])
+            tiles = np.concatenate([tiles, np.full(len(cells) - len(tiles), tile, dtype=np.uint8)])
+            order = np.argsort(cells, kind='stable')
+            cells, tiles = cells[order], tiles[order]
+        self.item_cells, self.item_tiles = cells, tiles
+
+    def __array__(self, dtype=None, copy=None):
+        grid = self._decode(0, self.rows, 0, self.cols)
+        return grid if dtype is None else grid.astype(dtype)
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """保存用に、大きさ・壁のビット列・表を名前付きの配列として返す（グリッドは展開しない）"""
+        return {'shape': np.array(self.shape, dtype=np.int64), 'bits': self.bits,
+                'item_cells': self.item_cells, 'item_tiles': self.item_tiles}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> 'PackedTileGrid':
+        """to_arrays()で保存した配列から作る（配列はコピーせずに使う）"""
+        grid = cls.__new__(cls)
+        grid.rows, grid.cols = (int(value) for value in arrays['shape'])
+        grid.bits = arrays['bits']
+        grid.item_cells = arrays['item_cells']
+        grid.item_tiles = arrays['item_tiles']
+        return grid
+
+    def find(self, tile: TileType) -> np.ndarray:
+        """表にあるタイル（コイン・スタート・ゴール）のマスを、フラットインデックス順に (row, col) の配列で返す"""
+        cells = self.item_cells[self.item_tiles == tile]
+        return np.column_stack(np.divmod(cells, self.cols))
+
+    def count_tiles(self) -> np.ndarray:
+        """タイルコードごとのマス数を返す（グリッドを展開しない）"""
+        counts = np.bincount(self.item_tiles, minlength=len(TileType)).astype(np.int64)
+        counts[TileType.WALL] = int(_POPCOUNT[self.bits].sum(dtype=np.int64))
+        counts[TileType.EMPTY] = self.rows * self.cols - counts.sum()
+        return counts
+
+    def count_empty_per_row(self) -> np.ndarray:
+        """行ごとの通路(EMPTY)のマス数を返す（グリッドを展開しない）"""
+        walls = _POPCOUNT[self.bits].sum(axis=1, dtype=np.int64)
+        items = np.bincount(self.item_cells // self.cols, minlength=self.rows)
+        return self.cols - walls - items
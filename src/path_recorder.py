@@ -0,0 +1,75 @@
+import numpy as np
+
+class PathRecorder:
+    """
+    プレイヤーの移動経路を固定長のリングバッファに記録するクラス。
+    上限を超えると古い点から上書きし、simplify_toleranceを指定すると直線上に並ぶ点を間引きながら記録する。
+
+    Members:
+        capacity (int): 保持できる点の最大数。
+        simplify_tolerance (float|None): 間引きの許容距離。Noneなら間引かない。
+        buffer (np.ndarray): (capacity, 4) の同次座標の点を格納する配列。
+        start (int): 最も古い点のbuffer上の位置。
+        count (int): 記録されている点の数。
+
+    Methods:
+        __init__(): コンストラクタ。
+        __len__(): 記録されている点の数を返す。
+        _index(): 古い順で数えた点のbuffer上の位置を返す。
+        _is_redundant(): 最後の点が、1つ前の点と新しい点を結ぶ線分上にあるかを判定。
+        append(): 点を記録する。
+        get_points(): 記録されている点を古い順に (点数, 4) の配列で返す。
+        clear(): 記録を消去する。
+    """
+    def __init__(self, capacity: int = 4096, simplify_tolerance: float = None):
+        self.capacity = capacity
+        self.simplify_tolerance = simplify_tolerance
+        self.buffer = np.zeros((capacity, 4), dtype=float)
+        self.start = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _index(self, i: int) -> int:
+        return (self.start + i) % self.capacity
+
+    def _is_redundant(self, point: np.ndarray) -> bool:
+        """最後の点が、1つ前の点と新しい点を結ぶ線分から許容距離以内にあるかを判定"""
+        previous = self.buffer[self._index(self.count - 2), :3]
+        last = self.buffer[self._index(self.count - 1), :3]
+        segment = point[:3] - previous
+        length_sq = segment @ segment
+        if length_sq == 0:
+            return np.linalg.norm(last - previous) <= self.simplify_tolerance
+        t = np.clip((last - previous) @ segment / length_sq, 0, 1)
+        return np.linalg.norm(previous + segment * t - last) <= self.simplify_tolerance
+
+    def append(self, x: float, y: float, z: float):
+        """
+        点(x, y, z)を記録する
+        間引きが有効で、最後の点が直前の点と新しい点を結ぶ線分上にあれば、最後の点を新しい点で置き換える
+        """
+        point = np.array([x, y, z, 1.0])
+        if self.simplify_tolerance is not None and self.count >= 2 and self._is_redundant(point):
+            self.buffer[self._index(self.count - 1)] = point
+            return
+        if self.count < self.capacity:
+            self.buffer[self._index(self.count)] = point
+            self.count += 1
+        else:
+            # 満杯なら最も古い点を上書きする
+            self.buffer[self.start] = point
+            self.start = (self.start + 1) % self.capacity
+
+    def get_points(self) -> np.ndarray:
+        """記録されている点を古い順に (点数, 4) の配列で返す"""
+        end = self.start + self.count
+        if end <= self.capacity:
+            return self.buffer[self.start:end]
+        return np.concatenate([self.buffer[self.start:], self.buffer[:end - self.capacity]])
+
+    def clear(self):
+        """記録を消去する"""
+        self.start = 0
+        self.count = 0
@@ -2,7 +2,10 @@ from abc import ABC, abstractmethod
 import pyxel
 import numpy as np
 from camera import Camera
-from map import Map
+from map import Map, MapChangeKind
+from endless_map import EndlessMap
+from multi_floor_map import MultiFloorMap
+from path_recorder import PathRecorder
 from sphere import RotatingSphere, PsychedelicSphere
 from cube import RotatingCube
 import PyxelUniversalFont as puf
@@ -10,6 +13,9 @@ from typing import List
 from tri_sprite import TriSprite
 from global_state import GlobalState
 from draw_object import DrawObject
+from game_snapshot import GameSnapshot
+import os
+import random
 import time
 
 def init_sound():
@@ -92,6 +98,7 @@ class StartScene(Scene):
         title_camera (Camera): タイトル画面のカメラ。
         global_state (GlobalState): 全体入力状態を保持。
         tile_size (int): 背景タイルサイズ。
+        has_snapshot (bool): 途中の状態を保存したファイルがあるかどうか。
         bgm_data (list): BGM用の音楽データ。
 
     Methods:
@@ -116,7 +123,7 @@ class StartScene(Scene):
         self.global_state = global_state
 
         self.tile_size = 80
-        
+        self.has_snapshot = os.path.exists(GameScene.SNAPSHOT_FILE)
 
     def update(self):
         self.global_state.update()
@@ -130,7 +137,32 @@ class StartScene(Scene):
             # 効果音を再生
             pyxel.play(3, 33)
 
-            return GameScene(self.global_state)
+            return GameScene.create(self.global_state)
+        if pyxel.btnp(pyxel.KEY_E):
+            # 終わりの無い迷路のモード
+            pyxel.stop(0)
+            pyxel.stop(1)
+            pyxel.stop(2)
+            pyxel.play(3, 33)
+
+            return GameScene(self.global_state, map_instance=EndlessMap(15, [0, 0, 0], 100))
+        if pyxel.btnp(pyxel.KEY_F):
+            # 階段でつながった階を重ねた迷路のモード
+            pyxel.stop(0)
+            pyxel.stop(1)
+            pyxel.stop(2)
+            pyxel.play(3, 33)
+
+            return GameScene(self.global_state,
+                             floors=MultiFloorMap.generate(15, 15, 3, [0, 0, 0], 100, coin_count=1))
+        if pyxel.btnp(pyxel.KEY_C) and self.has_snapshot:
+            # 保存した途中の状態から再開
+            pyxel.stop(0)
+            pyxel.stop(1)
+            pyxel.stop(2)
+            pyxel.play(3, 33)
+
+            return GameScene.from_snapshot(self.global_state, GameSnapshot.load(GameScene.SNAPSHOT_FILE))
         return self
 
     def draw(self):
@@ -152,6 +184,10 @@ class StartScene(Scene):
         # 軽めの明滅処理を追加
         if pyxel.frame_count % 30 < 27:
             self.writer.draw(self.center[0]-165, pyxel.height-95, "Press Space", 60, pyxel.COLOR_BLACK)
+            self.writer.draw(self.center[0]-120, pyxel.height-35, "E: Endless Mode", 30, pyxel.COLOR_BLACK)
+            self.writer.draw(self.center[0]+150, pyxel.height-35, "F: Floors", 30, pyxel.COLOR_BLACK)
+            if self.has_snapshot:
+                self.writer.draw(self.center[0]-120, pyxel.height-135, "C: Continue", 30, pyxel.COLOR_BLACK)
 
         # BGMの再生を追加
         from bgm_data import start_scene_bgm_data
@@ -166,34 +202,87 @@ class GameScene(Scene):
     メインのプレイシーン
 
     Members:
-        map (Map): 迷路マップデータ。
+        map (Map): 迷路マップデータ。階を重ねた迷路ではプレイヤーのいる階のMap。
+        floors (MultiFloorMap|None): 階を重ねた迷路。1階だけの迷路ではNone。
+        seed (int|None): 迷路の生成に使ったシード。
         camera (Camera): プレイヤー視点を管理するカメラ。
-        planes (list[Plane]): 床面を表すPlaneオブジェクト群。
-        walls (list[DrawObject]): 壁を表すDrawObject群。
-        spheres (list[RotatingSphere]): 回転する球体オブジェクト。
-        path_points (list): プレイヤーが移動した位置履歴。
+        chunk_grid (ChunkGrid): 床・壁をチャンク単位で保持する静的ジオメトリ（プレイヤーのいる階のもの）。
+        stairs_cell (tuple[int,int]): 階段の判定をした最後のプレイヤーのマス。
+        spheres (dict[tuple[int,int], RotatingSphere]): プレイヤー周辺のコインのマスごとの回転する球体オブジェクト。
+        sphere_focus_cell (tuple[int,int]|None): 球体を読み込んだ時のプレイヤーのマス。
+        path_recorder (PathRecorder): プレイヤーが移動した位置履歴（リングバッファ）。
         is_bird_view (bool): 鳥瞰モードかどうか。
         highlighted_wall (DrawObject|None): ハイライトされている壁。
         coin_count (int): コインの総数。
         is_goal_reached (bool): ゴールしたかどうか。
+        clock (Callable[[], float]): 固定の時間刻みに使う時計[秒]。
+        accumulator (float): まだ_tick()で進めていない経過時間[秒]。
+        last_update_time (float): 前回update()を呼んだ時のclock()の値。
+        tick_count (int): _tick()で進めた回数。遷移やアニメーションの時刻に使う。
+        previous_pose (tuple[np.ndarray,float,float,float]): 直前の_tick()の前のカメラの (位置, yaw, pitch, fov)。
         bgm_data (list): BGM用の音楽データ。
         writer (Writer): テキストの描画用ライター。
 
     Methods:
         __init__(): マップ・カメラ・BGMなどを初期化し、ゲームを準備する。
-        update(): 入力や壁破壊判定、鳥瞰モード切り替えなどゲーム状態を更新する。
-        _highlight_wall_in_front(): カメラ正面の壁をハイライトする内部処理。
+        prepare_map(): 迷路の生成とチャンクメッシュの構築のみ行う（ワーカースレッドから呼べる）。
+        take_next_level(): 準備済みの次の迷路を取り出すか、ワーカースレッドで準備を始める。
+        create(): prepare_map()で準備した迷路でGameSceneを作る。
+        retry(): 同じ迷路に再挑戦するGameSceneを作る。
+        from_snapshot(): 保存した途中の状態からGameSceneを作る。
+        to_snapshot(): 途中の状態をGameSnapshotにする。
+        _player_pose(): 鳥瞰視点の間も含めて、プレイヤーの位置と向きを返す。
+        update(): 入力や壁破壊判定、鳥瞰モード切り替えを処理し、経過時間分だけ_tick()を呼ぶ。
+        _tick(): 移動や視点の遷移、ゴール判定などのゲーム状態を固定の時間刻みで1回分進める。
+        _camera_pose(): カメラの位置・向き・視野角を返す。
+        _set_camera_pose(): カメラの位置・向き・視野角を設定する。
+        _interpolated_pose(): 直前の_tick()の前後で補間したカメラの位置・向き・視野角を返す。
+        _highlight_wall_in_front(): カメラ正面に光線を飛ばし、当たった壁をハイライトする内部処理。
         _destroy_highlighted_wall(): ハイライト中の壁を破壊し、マップを更新する。
-        draw(): 3D空間とUIの描画を行う。
+        _use_stairs(): 階段のマスに入ったら、つながっている階へ移動する。
+        _remaining_coins(): 全ての階の残りのコイン数を返す。
+        _update_nearby_spheres(): プレイヤー周辺のコインの球体のみを保持する。
+        _apply_map_changes(): Mapの変更を球体や壁などの描画オブジェクトへ反映する。
+        draw(): 補間したカメラとアニメーションの状態で、3D空間とUIの描画を行う。
         draw_path(): プレイヤーの移動経路を線で描画する。
     """
-    def __init__(self, global_state):
-        # マップを生成
-        self.map = Map.generate_maze_map(15, 15, [0, 0, 0], 100, coin_count=3)
+    # 一辺のマス数がこれを超える迷路は、プレイヤー周辺のチャンクのみをストリーミングで構築する
+    STREAMING_MAP_SIZE = 64
+    # ストリーミング時にチャンクを構築し、コインの球体を保持するプレイヤーからの半径（ワールド座標）
+    STREAM_RADIUS = 2400
+    # 壁との衝突判定に用いるプレイヤーの半径（ワールド座標）
+    PLAYER_RADIUS = 20
+    # 移動経路の点を間引く際の許容距離（ワールド座標）
+    PATH_SIMPLIFY_TOLERANCE = 5
+    # 途中の状態を保存するファイル
+    SNAPSHOT_FILE = "savegame.snap"
+    # ゲーム状態を進める固定の時間刻み（1秒あたりの回数）。移動速度などはこの1回あたりの量で決まる
+    TICK_RATE = 30
+    TICK_SECONDS = 1 / TICK_RATE
+    # 1回のupdate()で進める経過時間の上限[秒]（読み込みなどで止まった後に大量の_tick()を呼ばないため）
+    MAX_FRAME_TIME = 0.25
+
+    def __init__(self, global_state, map_instance: Map = None, maze_size: tuple[int, int] = (15, 15),
+                 stream_radius: float = None, seed: int = None, maze_cache=None, spheres: dict = None,
+                 floors: MultiFloorMap = None):
+        # マップを生成（ファイルから読み込んだマップなどが渡された場合はそれを使う）
+        # seedを指定すると同じ迷路になり、maze_cacheがあれば生成済みの迷路と静的メッシュを再利用する
+        # floorsを渡すと、階を重ねた迷路のプレイヤーのいる階から始める
+        self.floors = floors
+        if floors is not None:
+            map_instance = floors.map
+        elif map_instance is None:
+            if seed is None:
+                # 途中から保存・再開できるよう、シードを決めて生成する（ランダムな迷路はキャッシュしない）
+                seed, maze_cache = random.getrandbits(32), None
+            map_instance = Map.generate_maze_map(maze_size[0], maze_size[1], [0, 0, 0], 100, coin_count=3,
+                                                 seed=seed, cache=maze_cache)
+        self.map = map_instance
+        self.seed = seed
         
-        # カメラの初期位置を取得（スタート位置）
-        start_pos = self.map.get_start_position()
-        initial_yaw, initial_pitch = self.map.get_initial_view_direction()
+        # カメラの初期位置を取得（スタート位置。途中から再開する場合はその位置）
+        start_pos = self.map.get_camera_position()
+        initial_yaw, initial_pitch = (self.floors or self.map).get_initial_view_direction()
         
         self.camera = Camera(
             position=np.array(start_pos),
@@ -204,16 +293,26 @@ class GameScene(Scene):
             z_near=0.005,
             z_far=1000,
             view_based_movement=False,
-            map_instance=self.map
+            map_instance=self.map,
+            collision_radius=self.PLAYER_RADIUS
         )
         
         self.camera.init_mouse_pos((pyxel.mouse_x, pyxel.mouse_y))
         
-        # 描画オブジェクトを設定
-        self.planes = self.map.get_floor_objects()
-        self.walls = self.map.get_wall_objects()   
-        self.spheres = [RotatingSphere(pos, radius=30, segments=8) 
-                       for pos in self.map.sphere_positions]
+        # 描画オブジェクトを設定（床・壁はチャンク単位）
+        if stream_radius is None and max(self.map.rows, self.map.cols) > self.STREAMING_MAP_SIZE:
+            stream_radius = self.STREAM_RADIUS
+        if self.floors is not None:
+            self.floors.stream_radius = stream_radius
+            self.chunk_grid = self.floors.get_chunk_grid()
+        else:
+            self.chunk_grid = self.map.get_chunk_grid(stream_radius=stream_radius)
+        self.chunk_grid.update_focus(start_pos[0], start_pos[2])
+        self.stairs_cell = self.map.world_to_grid(start_pos[0], start_pos[2])
+        # 同じ迷路に再挑戦する場合は、前回のコインの球体を使い回す
+        self.spheres = dict(spheres or {})
+        self.sphere_focus_cell = None
+        self._update_nearby_spheres(start_pos[0], start_pos[2])
         
         self.start_time = time.time()
         self.elapsed_time = 0
@@ -221,7 +320,7 @@ class GameScene(Scene):
 
         self.is_transitioning = False
         self.transition_start_time = 0
-        self.transition_duration = 30  # 30フレームで遷移する
+        self.transition_duration = 30  # 30ティック(1秒)で遷移する
         self.is_bird_view = False
         
         # 視点遷移用の状態を保存
@@ -243,15 +342,23 @@ class GameScene(Scene):
         self.normal_fov = 90
         self.bird_fov = 50
 
-        self.coin_count = len([pos for row in self.map.map_data for pos in row if pos == '.'])
+        self.coin_count = self._remaining_coins()
 
         self.highlighted_wall = None
         self.writer = puf.Writer("misaki_gothic.ttf")  # フォントファイル名は適宜調整してください
-        self.path_points = []
-        self.last_recorded_time = time.time()  # フレームカウントから時間に変更
-        self.path_record_interval = 0.2  # 記録間隔を1秒に設定
+        # 直線上に並ぶ点は間引いて記録する
+        self.path_recorder = PathRecorder(simplify_tolerance=self.PATH_SIMPLIFY_TOLERANCE)
+        self.last_recorded_time = 0  # ゲーム内の時間[秒]
+        self.path_record_interval = 0.2  # 記録間隔を0.2秒に設定
         self.is_goal_reached = False
 
+        # 固定の時間刻みでゲーム状態を進め、描画時にはその間を補間する
+        self.clock = time.perf_counter
+        self.accumulator = 0.0
+        self.last_update_time = self.clock()
+        self.tick_count = 0
+        self.previous_pose = self._camera_pose()
+
         # BGMの再生を追加
         from bgm_data import game_scene_bgm_data
         self.bgm_data = game_scene_bgm_data
@@ -260,7 +367,109 @@ class GameScene(Scene):
                 pyxel.sounds[ch].set(*sound)
                 pyxel.play(ch, ch, loop=True) 
 
+    @classmethod
+    def prepare_map(cls, global_state, maze_size: tuple[int, int] = (15, 15)) -> tuple[Map, int | None]:
+        """
+        GameSceneの準備のうち重い処理（迷路の生成とスタート周辺のチャンクメッシュの構築）のみ行い、(Map, シード) を返す
+        global_stateに迷路のプールがあればそこから取り出す。pyxelの状態に触れないため、ワーカースレッドからも呼べる
+        """
+        if global_state.maze_pool is not None:
+            map_instance, seed = global_state.maze_pool.get()
+        else:
+            seed = random.getrandbits(32)
+            map_instance = Map.generate_maze_map(maze_size[0], maze_size[1], [0, 0, 0], 100, coin_count=3, seed=seed)
+        stream_radius = cls.STREAM_RADIUS if max(map_instance.rows, map_instance.cols) > cls.STREAMING_MAP_SIZE else None
+        start_pos = map_instance.get_start_position()
+        map_instance.get_chunk_grid(stream_radius=stream_radius).update_focus(start_pos[0], start_pos[2])
+        return map_instance, seed
+
+    @classmethod
+    def take_next_level(cls, global_state):
+        """
+        スコア画面で準備したまま使われなかった次の迷路があれば取り出し、
+        無ければglobal_stateのワーカースレッド(level_executor)で準備を始める
+        (Map, シード) を結果とするFutureを返す
+        """
+        future, global_state.next_level = global_state.next_level, None
+        if future is None:
+            future = global_state.level_executor.submit(cls.prepare_map, global_state)
+        return future
+
+    @classmethod
+    def create(cls, global_state) -> 'GameScene':
+        """prepare_map()で準備した迷路（スコア画面で準備したまま使われなかった迷路があればそれ）でGameSceneを作る"""
+        if global_state.next_level is not None:
+            future, global_state.next_level = global_state.next_level, None
+            map_instance, seed = future.result()
+        else:
+            map_instance, seed = cls.prepare_map(global_state)
+        return cls(global_state, map_instance=map_instance, seed=seed)
+
+    def retry(self) -> 'GameScene':
+        """
+        同じ迷路に再挑戦するGameSceneを作る
+        マップは変更のあったマスのみ生成時の状態に戻し、チャンクメッシュとコインの球体は作り直さずに使い回す
+        """
+        if self.floors is not None:
+            # 階を重ねた迷路では、球体は最後にいた階のものなので使い回さない
+            self.floors.restore_pristine()
+            return GameScene(self.global_state, floors=self.floors)
+        self.map.restore_pristine()
+        return GameScene(self.global_state, map_instance=self.map, seed=self.seed, spheres=self.spheres)
+
+    @classmethod
+    def from_snapshot(cls, global_state, snapshot: GameSnapshot, maze_cache=None) -> 'GameScene':
+        """
+        保存した途中の状態からGameSceneを作る
+        迷路は生成条件から作り直して変更を加え直す（maze_cacheがあれば生成済みの迷路と静的メッシュを使う）
+        """
+        spec = snapshot.spec
+        map_instance = Map.generate_maze_map(spec.width, spec.height, snapshot.origin_pos, snapshot.tile_size,
+                                             coin_count=spec.coin_count, strategy=spec.strategy,
+                                             min_distance=spec.min_distance, seed=spec.seed, cache=maze_cache,
+                                             algorithm=spec.algorithm)
+        map_instance.replay_edits(snapshot.edits)
+        # 変更はチャンクなどを作る前に加えたため、描画オブジェクトへ反映する必要は無い
+        map_instance.drain_changes()
+        map_instance.camera_position = list(snapshot.position)
+
+        scene = cls(global_state, map_instance=map_instance, seed=spec.seed)
+        scene.camera.yaw, scene.camera.pitch = snapshot.yaw, snapshot.pitch
+        scene.coin_count = snapshot.coin_total
+        scene.elapsed_time = snapshot.elapsed_time
+        scene.start_time = time.time() - snapshot.elapsed_time
+        scene.previous_pose = scene._camera_pose()
+        for x, y, z in snapshot.path.tolist():
+            scene.path_recorder.append(x, y, z)
+        return scene
+
+    def to_snapshot(self) -> GameSnapshot:
+        """
+        途中の状態をGameSnapshotにする
+        迷路は生成条件と変更の列だけを持つため、生成条件から再現できない迷路（Endlessモードなど）はValueError
+        """
+        if self.map.spec is None:
+            raise ValueError("this maze cannot be reproduced from a seed")
+        position, yaw, pitch = self._player_pose()
+        return GameSnapshot(self.map.spec, self.map.tile_size, self.map.origin_pos,
+                            [(change.kind, change.col, change.row) for change in self.map.edits],
+                            position, yaw, pitch, time.time() - self.start_time, self.coin_count,
+                            self.path_recorder.get_points())
+
+    def _player_pose(self) -> tuple[np.ndarray, float, float]:
+        """鳥瞰視点やその遷移中も含めて、プレイヤーの (位置, yaw, pitch) を返す"""
+        if self.is_transitioning and self.is_bird_view:
+            # 鳥瞰視点から戻る途中は、戻る先がプレイヤーの視点
+            return self.target_position, self.target_yaw, self.target_pitch
+        if self.is_transitioning or self.is_bird_view:
+            return self.original_position, self.original_yaw, self.original_pitch
+        return self.camera.position, self.camera.yaw, self.camera.pitch
+
     def update(self):
+        """
+        入力を受け取り、前回の呼び出しからの経過時間分だけ_tick()で固定の時間刻みのゲーム状態を進める
+        描画が遅れて呼び出しの間隔が空いても、移動の速さや遷移・経過時間は変わらない
+        """
         self.global_state.update()
         
         if pyxel.btnp(pyxel.KEY_Q):
@@ -270,13 +479,17 @@ class GameScene(Scene):
             pyxel.stop(2)
             return None
         
+        # F5キーで途中の状態を保存（生成条件から再現できる迷路のみ）
+        if pyxel.btnp(pyxel.KEY_F5) and self.map.spec is not None:
+            self.to_snapshot().save(self.SNAPSHOT_FILE)
+
         self.camera.view_based_movement = self.global_state.is_view_based_movement
 
         if not self.global_state.is_master_view and pyxel.btnp(pyxel.KEY_B):
             if not self.is_transitioning:
                 pyxel.play(3, 30)  # 切り替え時の効果音再生
                 self.is_transitioning = True
-                self.transition_start_time = pyxel.frame_count
+                self.transition_start_time = self.tick_count
                 
                 if not self.is_bird_view:
                     # 通常視点から鳥瞰視点への遷移開始
@@ -302,10 +515,63 @@ class GameScene(Scene):
                     self.original_position = np.array(bird_pos)
                     self.original_yaw = bird_yaw
                     self.original_pitch = bird_pitch
-        
+
+        if not self.is_transitioning and not self.is_bird_view and not self.global_state.keyboard_state['ctrl']:
+            # 視点の回転はマウスの移動量なので、時間刻みに関わらず毎回反映する
+            # 補間の前の状態にも同じだけ回転を加え、描画時の補間で視点の操作が遅れないようにする
+            yaw, pitch = self.camera.yaw, self.camera.pitch
+            self.camera.process_mouse_movement((pyxel.mouse_x, pyxel.mouse_y))
+            position, previous_yaw, previous_pitch, fov = self.previous_pose
+            self.previous_pose = (position, previous_yaw + self.camera.yaw - yaw,
+                                  previous_pitch + self.camera.pitch - pitch, fov)
+
+        if self.global_state.keyboard_state['ctrl']:
+            # Ctrlキーで移動などを無効化して、マウスの現在位置を表示
+            pyxel.mouse(True)
+            self.camera.init_mouse_pos((pyxel.mouse_x, pyxel.mouse_y))
+        else:
+            pyxel.mouse(False)
+
+        # 経過時間を固定の時間刻みに分けてゲーム状態を進める（遅れが大きすぎる分は切り捨てる）
+        now = self.clock()
+        self.accumulator += min(now - self.last_update_time, self.MAX_FRAME_TIME)
+        self.last_update_time = now
+        while self.accumulator >= self.TICK_SECONDS:
+            self.accumulator -= self.TICK_SECONDS
+            next_scene = self._tick()
+            if next_scene is not self:
+                return next_scene
+
+        # ハイライトかつ壁破壊の処理を追加
+        if not self.is_transitioning:
+            if self.global_state.keyboard_state['focus'] and self.coin_count - self._remaining_coins() > 0:
+                # コインを1枚以上所持している場合のみ Tキーでハイライト
+                self._highlight_wall_in_front()
+            else:
+                # Tキーが押されなくなったらハイライトを削除
+                self.highlighted_wall = None
+                
+
+            # ハイライト表示中に左クリックで壁破壊
+            if self.highlighted_wall and pyxel.btnp(pyxel.MOUSE_BUTTON_LEFT):
+                pyxel.play(3, 32)  # ★ 効果音再生
+                # 壁破壊処理
+                self._destroy_highlighted_wall()
+
+        self.elapsed_time = time.time() - self.start_time
+        return self
+
+    def _tick(self):
+        """
+        ゲーム状態をTICK_SECONDS秒分進める（移動・視点の遷移・チャンクの読み込み・経路の記録・ゴール判定）
+        ゴールした場合はScoreSceneを、それ以外は自身を返す
+        """
+        self.previous_pose = self._camera_pose()
+        self.tick_count += 1
+
         if self.is_transitioning:
             # 遷移アニメーション中の処理
-            progress = min(1.0, (pyxel.frame_count - self.transition_start_time) / self.transition_duration)
+            progress = min(1.0, (self.tick_count - self.transition_start_time) / self.transition_duration)
             
             # 線形補間で位置と視点を更新
             self.camera.position = self.original_position + (self.target_position - self.original_position) * progress
@@ -329,63 +595,36 @@ class GameScene(Scene):
         if not self.is_transitioning:
             # 通常の更新処理
             if not self.is_bird_view and not self.global_state.keyboard_state['ctrl']:
-                self.camera.process_mouse_movement((pyxel.mouse_x, pyxel.mouse_y))
                 if self.camera.move_and_is_coin_collected(self.global_state.keyboard_state, self.global_state):
                     pyxel.play(3, 31)  # coin 効果音再生
-                    # コイン取得後に球体オブジェクトを更新
-                    self.spheres = [RotatingSphere(pos, radius=30, segments=8) 
-                                for pos in self.map.sphere_positions]
-                    
-        if self.global_state.keyboard_state['ctrl']:
-            # Ctrlキーで移動などを無効化して、マウスの現在位置を表示
-            pyxel.mouse(True)
-            self.camera.init_mouse_pos((pyxel.mouse_x, pyxel.mouse_y))
-        else:
-            pyxel.mouse(False)
-                
-        # キューブの回転アニメーション
-        if self.show_player_cube:
-            self.player_cube.update()
-            
-        # 球体の回転アニメーション
-        for sphere in self.spheres:
-            sphere.update()
-            
-        # ハイライトかつ壁破壊の処理を追加
-        if not self.is_transitioning:
-            if self.global_state.keyboard_state['focus'] and self.coin_count - self.map.get_remaining_coins() > 0:
-                # コインを1枚以上所持している場合のみ Tキーでハイライト
-                self._highlight_wall_in_front()
-            else:
-                # Tキーが押されなくなったらハイライトを削除
-                self.highlighted_wall = None
-                
-
-            # ハイライト表示中に左クリックで壁破壊
-            if self.highlighted_wall and pyxel.btnp(pyxel.MOUSE_BUTTON_LEFT):
-                pyxel.play(3, 32)  # ★ 効果音再生
-                # 壁破壊処理
-                self._destroy_highlighted_wall()
-
-        # パス記録の判定を時間ベースに変更
-        current_time = time.time()
-        if hasattr(self, 'camera') and (current_time - self.last_recorded_time >= self.path_record_interval):
+                    # 取得されたコインの球体のみ取り除く
+                    self._apply_map_changes()
+                self._use_stairs()
+
+        # プレイヤー周辺のチャンク（ストリーミング時のみ）とコインの球体を読み込む
+        focus = self.player_cube.position if self.show_player_cube else self.camera.position
+        remaining = self.map.get_remaining_coins()
+        if self.map.update_focus(focus[0], focus[2]):
+            # 終わりの無い迷路で行が入れ替わった分、コインの総数を増減する
+            self.coin_count += self.map.get_remaining_coins() - remaining
+            self._apply_map_changes()
+        self.chunk_grid.update_focus(focus[0], focus[2])
+        self._update_nearby_spheres(focus[0], focus[2])
+
+        # パスの記録（ゲーム内の時間で一定間隔）
+        current_time = self.tick_count * self.TICK_SECONDS
+        if current_time - self.last_recorded_time >= self.path_record_interval:
+            floor_y = self.map.get_floor_height()
             if not self.is_bird_view and not self.is_transitioning:
-                pos_4d = np.array([self.camera.position[0], 
-                                50, 
-                                self.camera.position[2], 
-                                1.0])
+                self.path_recorder.append(self.camera.position[0], floor_y, self.camera.position[2])
             else:
-                pos_4d = np.array([self.player_cube.position[0],
-                                50,
-                                self.player_cube.position[2],
-                                1.0])
-
-            self.path_points.append(pos_4d)
+                self.path_recorder.append(self.player_cube.position[0], floor_y, self.player_cube.position[2])
             self.last_recorded_time = current_time
 
-        # ゴール到達判定
-        if self.map.check_goal_reached(self.camera.position[0], self.camera.position[2]):
+        # ゴール到達判定（高速移動でゴールのマスを通り過ぎた場合も含む）
+        move_result = self.camera.last_move_result
+        passed_goal = move_result is not None and len(move_result.goal_cells) > 0
+        if passed_goal or self.map.check_goal_reached(self.camera.position[0], self.camera.position[2]):
             # BGMを停止
             pyxel.stop(0)
             pyxel.stop(1)
@@ -393,7 +632,7 @@ class GameScene(Scene):
 
             # 先に鳥瞰視点へ移行
             if not self.is_bird_view:
-                self.path_points.append(np.array([self.camera.position[0], 50, self.camera.position[2], 1.0]))
+                self.path_recorder.append(self.camera.position[0], self.map.get_floor_height(), self.camera.position[2])
 
                 # 鳥瞰視点に切り替えるための処理を挟む
                 self.is_bird_view = True
@@ -402,98 +641,157 @@ class GameScene(Scene):
                 self.camera.yaw = bird_yaw
                 self.camera.pitch = bird_pitch
                 self.camera.fov = self.bird_fov
+                # 視点を切り替えた直後なので、描画時に前の視点と補間しない
+                self.previous_pose = self._camera_pose()
 
             self.is_goal_reached = True
 
             # ScoreSceneへ移行
+            self.elapsed_time = time.time() - self.start_time
             return ScoreScene(self, self.elapsed_time, self.global_state)
 
-        self.elapsed_time = time.time() - self.start_time
         return self
 
+    def _camera_pose(self) -> tuple[np.ndarray, float, float, float]:
+        """カメラの (位置, yaw, pitch, fov) を返す"""
+        return self.camera.position.copy(), self.camera.yaw, self.camera.pitch, self.camera.fov
+
+    def _set_camera_pose(self, pose: tuple[np.ndarray, float, float, float]):
+        """カメラを (位置, yaw, pitch, fov) にする"""
+        self.camera.position, self.camera.yaw, self.camera.pitch, self.camera.fov = pose
+
+    def _interpolated_pose(self, alpha: float) -> tuple[np.ndarray, float, float, float]:
+        """直前の_tick()の前後のカメラの状態を alpha (0〜1) で線形補間した (位置, yaw, pitch, fov) を返す"""
+        return tuple(previous + (current - previous) * alpha
+                     for previous, current in zip(self.previous_pose, self._camera_pose()))
+
     def _highlight_wall_in_front(self):
         """
-        カメラの正面方向にあるタイルを判定し、
-        もし壁(#)なら HighlightedWall をセットする例
+        カメラの正面1タイル以内にある壊せる壁(#)を HighlightedWall で示す
+        ハイライトは同じオブジェクトを移動して使い回す
         """
-        camera_pos = self.camera.position
         tile_size = self.map.tile_size
-        
-        # カメラ前方1タイル分を確認
-        forward_vec = np.array([
-            np.cos(self.camera.yaw),
-            0,
-            np.sin(self.camera.yaw)
-        ])
-        check_pos = camera_pos + forward_vec * tile_size
-        
-        # タイル座標を取得
-        offset = tile_size / 2
-        mx = int((offset + check_pos[0] + len(self.map.map_data[0]) * tile_size / 2) / tile_size)
-        mz = int((offset + check_pos[2] + len(self.map.map_data) * tile_size / 2) / tile_size)
-        
-        # 範囲内かどうか
-        if 0 <= mx < len(self.map.map_data[0]) and 0 <= mz < len(self.map.map_data):
-            # 端の壁はスキップ
-            rows = len(self.map.map_data)
-            cols = len(self.map.map_data[0])
-            if mz in (0, rows - 1) or mx in (0, cols - 1):
-                return
-
-            # 隣接が ' ' または '.' の場所があるかチェック
-            if (self.map.map_data[mz][mx] == '#' and
-                ((self.map.map_data[mz][mx - 1] in [' ', '.']) or
-                 (self.map.map_data[mz][mx + 1] in [' ', '.']) or
-                 (self.map.map_data[mz - 1][mx] in [' ', '.']) or
-                 (self.map.map_data[mz + 1][mx] in [' ', '.']))):
-                # ワールド座標計算
-                ox = -len(self.map.map_data[0]) * tile_size / 2
-                oz = -len(self.map.map_data) * tile_size / 2
-                wx = ox + mx * tile_size
-                wz = oz + mz * tile_size
-                from wall import HighlightedWall
-                self.highlighted_wall = HighlightedWall([wx, self.map.origin_pos[1], wz], tile_size)
+        camera_pos = self.camera.position
+        cell = self.map.find_destroyable_wall(camera_pos[0], camera_pos[2], self.camera.yaw)
+        if cell is None:
+            self.highlighted_wall = None
+            return
+        mx, mz = cell
+
+        # ワールド座標計算
+        wx, wz = self.map.grid_to_world(mx, mz)
+        position = [wx, self.map.origin_pos[1], wz]
+        if self.highlighted_wall is None:
+            from wall import HighlightedWall
+            self.highlighted_wall = HighlightedWall(position, tile_size)
+        elif self.highlighted_wall.position != position:
+            self.highlighted_wall.move_to(position)
 
     def _destroy_highlighted_wall(self):
         """
         ハイライトしている壁の '#' タイルを ' ' に変更してマップ更新し、
-        walls/floor など再取得後にコインを1枚減らす
+        変更を反映後にコインを1枚減らす
         """
-        tile_size = self.map.tile_size
-        offset = tile_size / 2
         x, _, z = self.highlighted_wall.position
-        mx = int((offset + x + len(self.map.map_data[0]) * tile_size / 2) / tile_size)
-        mz = int((offset + z + len(self.map.map_data) * tile_size / 2) / tile_size)
-
-        # 対象タイルを ' ' に置き換え
-        row_list = list(self.map.map_data[mz])
-        row_list[mx] = ' '
-        self.map.map_data[mz] = ''.join(row_list)
-
-        # 再処理
-        self.map.floor_objects = []
-        self.map.wall_positions = []
-        self.map.sphere_positions = []
-        self.map._process_map()
-
-        # GameScene 側で再取得
-        self.planes = self.map.get_floor_objects()
-        self.walls = self.map.get_wall_objects()
-        self.spheres = [RotatingSphere(pos, radius=30, segments=8) 
-                        for pos in self.map.sphere_positions]
+        mx, mz = self.map.world_to_grid(x, z)
+
+        # 対象タイルを ' ' に置き換え（床と該当する壁グループのみ更新される）
+        self.map.remove_wall(mx, mz)
+
+        # GameScene 側へ変更を反映
+        self._apply_map_changes()
 
         # ハイライト解除 & コインを1枚減らす
         self.highlighted_wall = None
         self.coin_count -= 1
 
+    def _use_stairs(self):
+        """
+        プレイヤーが階段のマスに入ったら、つながっている階へ移動してマップ・カメラ・チャンクを切り替える
+        移動先でも同じマスの階段の上にいるため、一度マスを出てから入り直すまでは戻らない
+        """
+        cell = self.map.world_to_grid(self.camera.position[0], self.camera.position[2])
+        if cell == self.stairs_cell:
+            return
+        self.stairs_cell = cell
+        if self.floors is None:
+            return
+        map_instance = self.floors.use_stairs(*cell)
+        if map_instance is None:
+            return
+        pyxel.play(3, 30)
+        self.map = map_instance
+        self.camera.map = map_instance
+        self.camera.position = np.array(map_instance.get_camera_position(), dtype=float)
+        # 階を移動した直後なので、描画時に前の階の位置と補間しない
+        self.previous_pose = self._camera_pose()
+        self.chunk_grid = self.floors.get_chunk_grid()
+        self.highlighted_wall = None
+        # 球体は移動先の階のコインで読み込み直す
+        self.spheres = {}
+        self.sphere_focus_cell = None
+
+    def _remaining_coins(self) -> int:
+        """残りのコイン数を返す（階を重ねた迷路では全ての階の合計）"""
+        if self.floors is not None:
+            return self.floors.get_remaining_coins()
+        return self.map.get_remaining_coins()
+
+    def _update_nearby_spheres(self, x: float, z: float):
+        """
+        プレイヤーの周囲STREAM_RADIUS以内にあるコインのみ球体オブジェクトを保持する
+        コインの索引を近傍検索するため、マップ全体のコイン数には依存しない
+        """
+        focus_cell = self.map.world_to_grid(x, z)
+        if focus_cell == self.sphere_focus_cell:
+            return
+        self.sphere_focus_cell = focus_cell
+        nearby = self.map.get_coins_near(x, z, self.STREAM_RADIUS)
+        self.spheres = {cell: self.spheres.get(cell) or RotatingSphere(pos, radius=30, segments=8)
+                        for cell, pos in nearby.items()}
+
+    def _apply_map_changes(self):
+        """Mapに記録された変更を描画オブジェクトへ反映する"""
+        for change in self.map.drain_changes():
+            if change.kind == MapChangeKind.COIN_REMOVED:
+                self.spheres.pop((change.col, change.row), None)
+            elif change.kind == MapChangeKind.ROWS_SHIFTED:
+                # 行番号がずれた分だけ球体のマスをずらす（捨てられた行の球体は破棄）
+                self.spheres = {(col, row - change.row): sphere for (col, row), sphere in self.spheres.items()
+                                if row >= change.row}
+                self.sphere_focus_cell = None
+        # 壁の破壊で変更のあったチャンクのみ作り直す
+        self.chunk_grid.rebuild_dirty()
+
     def draw(self):
         pyxel.cls(pyxel.COLOR_BLACK)
+
+        # 直前の_tick()からの経過時間の割合で、カメラと回転のアニメーションの状態を補間して描画する
+        alpha = self.accumulator / self.TICK_SECONDS
+        phase = self.tick_count + alpha
+        for sphere in self.spheres.values():
+            sphere.set_rotation_angle(sphere.rotation_speed * phase)
+        if self.show_player_cube:
+            self.player_cube.set_rotation_angle(self.player_cube.rotation_speed * phase)
+        pose = self._camera_pose()
+        self._set_camera_pose(self._interpolated_pose(alpha))
         
+        # 視錐台と交わるチャンクのみ描画対象にする
+        view_projection_matrix = self.camera.get_projection_matrix() @ self.camera.get_view_matrix()
+        if self.floors is not None:
+            # 階を重ねた迷路では、今の階と階段の開口部から見える隣の階のチャンクのみ描画する
+            visible_chunks = self.floors.get_visible_chunks(view_projection_matrix, pyxel.width, pyxel.height)
+        else:
+            visible_chunks = self.chunk_grid.get_visible_chunks(view_projection_matrix, pyxel.width, pyxel.height)
+        planes = self.chunk_grid.get_floor_meshes(visible_chunks)
+        walls = self.chunk_grid.get_wall_meshes(visible_chunks)
+
         # 3Dシーンの描画（床、壁+球体の順）
+        spheres = list(self.spheres.values())
         if self.show_player_cube:
-            draw_objects = [self.planes, self.walls + self.spheres + [self.player_cube]]
+            draw_objects = [planes, walls + spheres + [self.player_cube]]
         else:
-            draw_objects = [self.planes, self.walls + self.spheres]
+            draw_objects = [planes, walls + spheres]
             
         self.render_3d_scene(
             self.camera,
@@ -509,6 +807,7 @@ class GameScene(Scene):
                 is_view_wireframe=self.global_state.is_view_wireframe,
                 is_back_culling=False
             )
+        self._set_camera_pose(pose)
 
         # UIの描画
         if not self.is_goal_reached:
@@ -521,9 +820,12 @@ class GameScene(Scene):
                 self.writer.draw(10, pyxel.height - 30, f"{view_mode} Movement", 20, pyxel.COLOR_WHITE)
 
             # コイン数を表示
-            remaining = self.map.get_remaining_coins()
+            remaining = self._remaining_coins()
             collected = self.coin_count - remaining
             self.writer.draw(10, 10, f"Coins: {collected}/{self.coin_count}", 45, pyxel.COLOR_WHITE)
+            if self.floors is not None:
+                self.writer.draw(10, 60, f"Floor: {self.floors.current + 1}/{len(self.floors.floors)}", 30,
+                                 pyxel.COLOR_WHITE)
 
             # 時間表示（ミリ秒まで含める）
             minutes = int(self.elapsed_time // 60)
@@ -538,19 +840,22 @@ class GameScene(Scene):
                 pyxel.rect(pyxel.width // 2 - 1, pyxel.height // 2 - 10, 3, 20, pyxel.COLOR_WHITE)
 
     def draw_path(self):
+        points = self.path_recorder.get_points()
+        if len(points) == 0:
+            return
+        # 全点を1回の行列積で射影し、カメラの前にある点(w > 0)のみ描画する
         vp_matrix = self.camera.get_projection_matrix() @ self.camera.get_view_matrix()
-        for i in range(len(self.path_points)):
-            current = np.array(vp_matrix @ self.path_points[i]).flatten()  # flatten()を追加
-            if current[3] > 0:
-                x1 = current[0] / current[3] + pyxel.width / 2
-                y1 = current[1] / current[3] + pyxel.height / 2
-                pyxel.circ(int(x1), int(y1), 5, pyxel.COLOR_ORANGE)
-                if i > 0:
-                    prev = np.array(vp_matrix @ self.path_points[i - 1]).flatten()  # flatten()を追加
-                    if prev[3] > 0:
-                        x0 = prev[0] / prev[3] + pyxel.width / 2
-                        y0 = prev[1] / prev[3] + pyxel.height / 2
-                    pyxel.line(int(x0), int(y0), int(x1), int(y1), pyxel.COLOR_ORANGE)
+        clip = points @ np.asarray(vp_matrix).T
+        visible = clip[:, 3] > 0
+        screen = np.zeros((len(points), 2), dtype=int)
+        screen[visible] = (clip[visible, :2] / clip[visible, 3:4] + [pyxel.width / 2, pyxel.height / 2]).astype(int)
+
+        # 両端が見えている区間のみ線を引く
+        segments = visible[1:] & visible[:-1]
+        for x0, y0, x1, y1 in np.hstack([screen[:-1], screen[1:]])[segments].tolist():
+            pyxel.line(x0, y0, x1, y1, pyxel.COLOR_ORANGE)
+        for x, y in screen[visible].tolist():
+            pyxel.circ(x, y, 5, pyxel.COLOR_ORANGE)
 
 class ScoreBoard:
     """
@@ -592,6 +897,7 @@ class ScoreBoard:
         # テキストの描画
         self.writer.draw(board_x + 20, board_y + 40, "GOAL REACHED!", 85, pyxel.COLOR_YELLOW)
         self.writer.draw(board_x + 70, board_y + 170, f"Time: {self.time_str}", 60, pyxel.COLOR_WHITE)
+        self.writer.draw(board_x + 150, board_y + 225, "Press Y to retry this maze", 20, pyxel.COLOR_WHITE)
         self.writer.draw(board_x + 140, board_y + 250, "Press Tab to hide scoreboard", 20, pyxel.COLOR_WHITE)
 
         # 適度に明滅させる
@@ -608,10 +914,13 @@ class ScoreScene(Scene):
         global_state (GlobalState): 全体の入力状態。
         is_score_view (bool): スコア表示中かどうか。
         scoreboard (ScoreBoard): スコアボードオブジェクト。
+        next_level (Future): ワーカースレッドで準備中の次の迷路（GameScene.prepare_map()の結果）。
+            使わずにシーンを離れる場合はglobal_stateに預け、次の迷路として使う。
+        is_loading (bool): リスタートが押され、次の迷路の準備を待っているかどうか。
         bgm_data (list): BGM用の音楽データ。
 
     Methods:
-        __init__(): スコアシーンの初期化を行い、ScoreBoardなどを用意する。
+        __init__(): スコアシーンの初期化を行い、ScoreBoardなどを用意して次の迷路の準備を始める。
         update(): 入力を受け取り、リスタートやシーン遷移を管理する。
         draw(): スコア内容を描画し、終了後の演出を行う。
     """
@@ -622,6 +931,11 @@ class ScoreScene(Scene):
         self.is_score_view = True
         self.scoreboard = ScoreBoard(elapsed_time, pyxel.width, pyxel.height)
 
+        # スコアを表示している間に、ワーカースレッドで次の迷路を準備しておく
+        # （前のスコア画面で準備したまま使われなかった迷路があればそれを使う）
+        self.next_level = GameScene.take_next_level(global_state)
+        self.is_loading = False
+
         # BGMの再生を追加
         from bgm_data import score_scene_bgm_data
         self.bgm_data = score_scene_bgm_data
@@ -638,14 +952,30 @@ class ScoreScene(Scene):
         if pyxel.btnp(pyxel.KEY_TAB):
             self.is_score_view = not self.is_score_view
 
-        # リスタート処理
-        if pyxel.btnp(pyxel.KEY_R):
+        # リスタート処理（準備が終わっていなければ終わるまでLoadingを表示する）
+        if pyxel.btnp(pyxel.KEY_R) and not self.is_loading:
             # BGMを停止
             pyxel.stop(0)
             pyxel.stop(1)
             pyxel.stop(2)
-            
-            return GameScene(self.global_state)
+
+            self.is_loading = True
+        if self.is_loading:
+            if not self.next_level.done():
+                return self
+            map_instance, seed = self.next_level.result()
+            return GameScene(self.global_state, map_instance=map_instance, seed=seed)
+
+        # 同じ迷路に再挑戦（迷路の生成とメッシュの構築を行わないため、すぐに始まる）
+        if pyxel.btnp(pyxel.KEY_Y):
+            # BGMを停止
+            pyxel.stop(0)
+            pyxel.stop(1)
+            pyxel.stop(2)
+
+            # 準備した次の迷路は、次にスコア画面やタイトル画面から始める時に使う
+            self.global_state.next_level = self.next_level
+            return self.game_scene.retry()
         
         # タイトル画面に戻る
         if pyxel.btnp(pyxel.KEY_T):
@@ -654,6 +984,7 @@ class ScoreScene(Scene):
             pyxel.stop(1)
             pyxel.stop(2)
             
+            self.global_state.next_level = self.next_level
             return StartScene(self.global_state)
 
         return self
@@ -665,4 +996,7 @@ class ScoreScene(Scene):
 
         # スコアボードの描画
         if self.is_score_view:
-            self.scoreboard.draw()
\ No newline at end of file
+            self.scoreboard.draw()
+
+        if self.is_loading:
+            self.scoreboard.writer.draw(10, pyxel.height - 50, "Loading...", 40, pyxel.COLOR_WHITE)
\ No newline at end of file
@@ -2,7 +2,9 @@ from abc import ABC, abstractmethod
 import pyxel
 import numpy as np
 from camera import Camera
-from map import Map
+from map import Map, MapChangeKind
+from endless_map import EndlessMap
+from path_recorder import PathRecorder
 from sphere import RotatingSphere, PsychedelicSphere
 from cube import RotatingCube
 from typing import List
@@ -121,7 +123,12 @@ class StartScene(Scene):
             # 効果音を再生
             pyxel.play(3, 33)
 
-            return GameScene(self.global_state)
+            return GameScene.create(self.global_state)
+        if pyxel.btnp(pyxel.KEY_E):
+            # 終わりの無い迷路のモード
+            pyxel.play(3, 33)
+
+            return GameScene(self.global_state, map_instance=EndlessMap(15, [0, 0, 0], 100))
         return self
 
     def draw(self):
@@ -144,25 +151,47 @@ class GameScene(Scene):
 
     Members:
         map (Map): 迷路マップデータ。
+        seed (int|None): 迷路の生成に使ったシード。
         camera (Camera): プレイヤーの視点。
-        planes (list[Plane]): 床面となるPlaneのリスト。
-        walls (list[DrawObject]): 壁オブジェクトのリスト。
-        spheres (list[RotatingSphere]): 回転球体のリスト。
+        chunk_grid (ChunkGrid): 床・壁をチャンク単位で保持する静的ジオメトリ。
+        spheres (dict[tuple[int,int], RotatingSphere]): プレイヤー周辺のコインのマスごとの回転球体。
+        sphere_focus_cell (tuple[int,int]|None): 球体を読み込んだ時のプレイヤーのマス。
         is_bird_view (bool): 鳥瞰モードかどうか。
         highlighted_wall (DrawObject|None): ハイライトされている壁。
+        path_recorder (PathRecorder): プレイヤーが移動した位置履歴（リングバッファ）。
         coin_count (int): コインの初期総数。
         is_goal_reached (bool): ゴール済みかどうか。
 
     Methods:
         __init__(): 迷路やカメラなどを初期化する（BGM処理なし）。
+        prepare_map(): 迷路の生成とチャンクメッシュの構築のみ行う（ワーカースレッドから呼べる）。
+        create(): prepare_map()で準備した迷路でGameSceneを作る。
+        retry(): 同じ迷路に再挑戦するGameSceneを作る。
         update(): 入力や壁破壊などの状態更新を行う。
         draw(): 3DオブジェクトとUI要素を描画する。
         _highlight_wall_in_front(): 正面にある壁をハイライトする。
         _destroy_highlighted_wall(): ハイライト中の壁を破壊する。
+        _update_nearby_spheres(): プレイヤー周辺のコインの球体のみを保持する。
+        _apply_map_changes(): Mapの変更を描画オブジェクトへ反映する。
     """
-    def __init__(self, global_state):
-        # マップを生成
-        self.map = Map.generate_maze_map(15, 15, [0, 0, 0], 100, coin_count=3)
+    # 一辺のマス数がこれを超える迷路は、プレイヤー周辺のチャンクのみをストリーミングで構築する
+    STREAMING_MAP_SIZE = 64
+    # ストリーミング時にチャンクを構築し、コインの球体を保持するプレイヤーからの半径（ワールド座標）
+    STREAM_RADIUS = 2400
+    # 壁との衝突判定に用いるプレイヤーの半径（ワールド座標）
+    PLAYER_RADIUS = 20
+    # 移動経路の点を間引く際の許容距離（ワールド座標）
+    PATH_SIMPLIFY_TOLERANCE = 5
+
+    def __init__(self, global_state, map_instance: Map = None, maze_size: tuple[int, int] = (15, 15),
+                 stream_radius: float = None, seed: int = None, maze_cache=None, spheres: dict = None):
+        # マップを生成（ファイルから読み込んだマップなどが渡された場合はそれを使う）
+        # seedを指定すると同じ迷路になり、maze_cacheがあれば生成済みの迷路と静的メッシュを再利用する
+        if map_instance is None:
+            map_instance = Map.generate_maze_map(maze_size[0], maze_size[1], [0, 0, 0], 100, coin_count=3,
+                                                 seed=seed, cache=maze_cache)
+        self.map = map_instance
+        self.seed = seed
         
         # カメラの初期位置を取得（スタート位置）
         start_pos = self.map.get_start_position()
@@ -177,16 +206,21 @@ class GameScene(Scene):
             z_near=0.005,
             z_far=1000,
             view_based_movement=False,
-            map_instance=self.map
+            map_instance=self.map,
+            collision_radius=self.PLAYER_RADIUS
         )
         
         self.camera.init_mouse_pos((pyxel.mouse_x, pyxel.mouse_y))
         
-        # 描画オブジェクトを設定
-        self.planes = self.map.get_floor_objects()
-        self.walls = self.map.get_wall_objects()   
-        self.spheres = [RotatingSphere(pos, radius=30, segments=8) 
-                       for pos in self.map.sphere_positions]
+        # 描画オブジェクトを設定（床・壁はチャンク単位）
+        if stream_radius is None and max(self.map.rows, self.map.cols) > self.STREAMING_MAP_SIZE:
+            stream_radius = self.STREAM_RADIUS
+        self.chunk_grid = self.map.get_chunk_grid(stream_radius=stream_radius)
+        self.chunk_grid.update_focus(start_pos[0], start_pos[2])
+        # 同じ迷路に再挑戦する場合は、前回のコインの球体を使い回す
+        self.spheres = dict(spheres or {})
+        self.sphere_focus_cell = None
+        self._update_nearby_spheres(start_pos[0], start_pos[2])
         
         self.start_time = time.time()
         self.elapsed_time = 0
@@ -216,14 +250,44 @@ class GameScene(Scene):
         self.normal_fov = 90
         self.bird_fov = 50
 
-        self.coin_count = len([pos for row in self.map.map_data for pos in row if pos == '.'])
+        self.coin_count = self.map.get_remaining_coins()
 
         self.highlighted_wall = None
-        self.path_points = []
+        # 直線上に並ぶ点は間引いて記録する
+        self.path_recorder = PathRecorder(simplify_tolerance=self.PATH_SIMPLIFY_TOLERANCE)
         self.last_recorded_time = time.time()  # フレームカウントから時間に変更
         self.path_record_interval = 0.2  # 記録間隔を1秒に設定
         self.is_goal_reached = False
 
+    @classmethod
+    def prepare_map(cls, global_state, maze_size: tuple[int, int] = (15, 15)) -> tuple[Map, int | None]:
+        """
+        GameSceneの準備のうち重い処理（迷路の生成とスタート周辺のチャンクメッシュの構築）のみ行い、(Map, シード) を返す
+        global_stateに迷路のプールがあればそこから取り出す。pyxelの状態に触れないため、ワーカースレッドからも呼べる
+        """
+        if global_state.maze_pool is not None:
+            map_instance, seed = global_state.maze_pool.get()
+        else:
+            map_instance, seed = Map.generate_maze_map(maze_size[0], maze_size[1], [0, 0, 0], 100, coin_count=3), None
+        stream_radius = cls.STREAM_RADIUS if max(map_instance.rows, map_instance.cols) > cls.STREAMING_MAP_SIZE else None
+        start_pos = map_instance.get_start_position()
+        map_instance.get_chunk_grid(stream_radius=stream_radius).update_focus(start_pos[0], start_pos[2])
+        return map_instance, seed
+
+    @classmethod
+    def create(cls, global_state) -> 'GameScene':
+        """prepare_map()で準備した迷路でGameSceneを作る"""
+        map_instance, seed = cls.prepare_map(global_state)
+        return cls(global_state, map_instance=map_instance, seed=seed)
+
+    def retry(self) -> 'GameScene':
+        """
+        同じ迷路に再挑戦するGameSceneを作る
+        マップは変更のあったマスのみ生成時の状態に戻し、チャンクメッシュとコインの球体は作り直さずに使い回す
+        """
+        self.map.restore_pristine()
+        return GameScene(self.global_state, map_instance=self.map, seed=self.seed, spheres=self.spheres)
+
     def update(self):
         self.global_state.update()
         
@@ -292,9 +356,8 @@ class GameScene(Scene):
                 self.camera.process_mouse_movement((pyxel.mouse_x, pyxel.mouse_y))
                 if self.camera.move_and_is_coin_collected(self.global_state.keyboard_state, self.global_state):
                     pyxel.play(3, 31)  # coin 効果音再生
-                    # コイン取得後に球体オブジェクトを更新
-                    self.spheres = [RotatingSphere(pos, radius=30, segments=8) 
-                                for pos in self.map.sphere_positions]
+                    # 取得されたコインの球体のみ取り除く
+                    self._apply_map_changes()
                     
         if self.global_state.keyboard_state['ctrl']:
             # Ctrlキーで移動などを無効化して、マウスの現在位置を表示
@@ -306,8 +369,18 @@ class GameScene(Scene):
         if self.show_player_cube:
             self.player_cube.update()
             
-        # 球体の回転アニメーション
-        for sphere in self.spheres:
+        # プレイヤー周辺のチャンク（ストリーミング時のみ）とコインの球体を読み込む
+        focus = self.player_cube.position if self.show_player_cube else self.camera.position
+        remaining = self.map.get_remaining_coins()
+        if self.map.update_focus(focus[0], focus[2]):
+            # 終わりの無い迷路で行が入れ替わった分、コインの総数を増減する
+            self.coin_count += self.map.get_remaining_coins() - remaining
+            self._apply_map_changes()
+        self.chunk_grid.update_focus(focus[0], focus[2])
+        self._update_nearby_spheres(focus[0], focus[2])
+
+        # 球体の回転アニメーション（プレイヤー周辺のもののみ）
+        for sphere in self.spheres.values():
             sphere.update()
             
         # ハイライトかつ壁破壊の処理を追加
@@ -330,25 +403,19 @@ class GameScene(Scene):
         current_time = time.time()
         if hasattr(self, 'camera') and (current_time - self.last_recorded_time >= self.path_record_interval):
             if not self.is_bird_view and not self.is_transitioning:
-                pos_4d = np.array([self.camera.position[0], 
-                                50, 
-                                self.camera.position[2], 
-                                1.0])
+                self.path_recorder.append(self.camera.position[0], 50, self.camera.position[2])
             else:
-                pos_4d = np.array([self.player_cube.position[0],
-                                50,
-                                self.player_cube.position[2],
-                                1.0])
-
-            self.path_points.append(pos_4d)
+                self.path_recorder.append(self.player_cube.position[0], 50, self.player_cube.position[2])
             self.last_recorded_time = current_time
 
-        # ゴール到達判定
-        if self.map.check_goal_reached(self.camera.position[0], self.camera.position[2]):
+        # ゴール到達判定（高速移動でゴールのマスを通り過ぎた場合も含む）
+        move_result = self.camera.last_move_result
+        passed_goal = move_result is not None and len(move_result.goal_cells) > 0
+        if passed_goal or self.map.check_goal_reached(self.camera.position[0], self.camera.position[2]):
 
             # 先に鳥瞰視点へ移行
             if not self.is_bird_view:
-                self.path_points.append(np.array([self.camera.position[0], 50, self.camera.position[2], 1.0]))
+                self.path_recorder.append(self.camera.position[0], 50, self.camera.position[2])
 
                 # 鳥瞰視点に切り替えるための処理を挟む
                 self.is_bird_view = True
@@ -368,87 +435,85 @@ class GameScene(Scene):
 
     def _highlight_wall_in_front(self):
         """
-        カメラの正面方向にあるタイルを判定し、
-        もし壁(#)なら HighlightedWall をセットする例
+        カメラの正面1タイル以内にある壊せる壁(#)を HighlightedWall で示す
+        ハイライトは同じオブジェクトを移動して使い回す
         """
-        camera_pos = self.camera.position
         tile_size = self.map.tile_size
-        
-        # カメラ前方1タイル分を確認
-        forward_vec = np.array([
-            np.cos(self.camera.yaw),
-            0,
-            np.sin(self.camera.yaw)
-        ])
-        check_pos = camera_pos + forward_vec * tile_size
-        
-        # タイル座標を取得
-        offset = tile_size / 2
-        mx = int((offset + check_pos[0] + len(self.map.map_data[0]) * tile_size / 2) / tile_size)
-        mz = int((offset + check_pos[2] + len(self.map.map_data) * tile_size / 2) / tile_size)
-        
-        # 範囲内かどうか
-        if 0 <= mx < len(self.map.map_data[0]) and 0 <= mz < len(self.map.map_data):
-            # 端の壁はスキップ
-            rows = len(self.map.map_data)
-            cols = len(self.map.map_data[0])
-            if mz in (0, rows - 1) or mx in (0, cols - 1):
-                return
-
-            # 隣接が ' ' または '.' の場所があるかチェック
-            if (self.map.map_data[mz][mx] == '#' and
-                ((self.map.map_data[mz][mx - 1] in [' ', '.']) or
-                 (self.map.map_data[mz][mx + 1] in [' ', '.']) or
-                 (self.map.map_data[mz - 1][mx] in [' ', '.']) or
-                 (self.map.map_data[mz + 1][mx] in [' ', '.']))):
-                # ワールド座標計算
-                ox = -len(self.map.map_data[0]) * tile_size / 2
-                oz = -len(self.map.map_data) * tile_size / 2
-                wx = ox + mx * tile_size
-                wz = oz + mz * tile_size
-                from wall import HighlightedWall
-                self.highlighted_wall = HighlightedWall([wx, self.map.origin_pos[1], wz], tile_size)
+        camera_pos = self.camera.position
+        cell = self.map.find_destroyable_wall(camera_pos[0], camera_pos[2], self.camera.yaw)
+        if cell is None:
+            self.highlighted_wall = None
+            return
+        mx, mz = cell
+
+        # ワールド座標計算
+        wx, wz = self.map.grid_to_world(mx, mz)
+        position = [wx, self.map.origin_pos[1], wz]
+        if self.highlighted_wall is None:
+            from wall import HighlightedWall
+            self.highlighted_wall = HighlightedWall(position, tile_size)
+        elif self.highlighted_wall.position != position:
+            self.highlighted_wall.move_to(position)
 
     def _destroy_highlighted_wall(self):
         """
         ハイライトしている壁の '#' タイルを ' ' に変更してマップ更新し、
-        walls/floor など再取得後にコインを1枚減らす
+        変更を反映後にコインを1枚減らす
         """
-        tile_size = self.map.tile_size
-        offset = tile_size / 2
         x, _, z = self.highlighted_wall.position
-        mx = int((offset + x + len(self.map.map_data[0]) * tile_size / 2) / tile_size)
-        mz = int((offset + z + len(self.map.map_data) * tile_size / 2) / tile_size)
-
-        # 対象タイルを ' ' に置き換え
-        row_list = list(self.map.map_data[mz])
-        row_list[mx] = ' '
-        self.map.map_data[mz] = ''.join(row_list)
-
-        # 再処理
-        self.map.floor_objects = []
-        self.map.wall_positions = []
-        self.map.sphere_positions = []
-        self.map._process_map()
-
-        # GameScene 側で再取得
-        self.planes = self.map.get_floor_objects()
-        self.walls = self.map.get_wall_objects()
-        self.spheres = [RotatingSphere(pos, radius=30, segments=8) 
-                        for pos in self.map.sphere_positions]
+        mx, mz = self.map.world_to_grid(x, z)
+
+        # 対象タイルを ' ' に置き換え（床と該当する壁グループのみ更新される）
+        self.map.remove_wall(mx, mz)
+
+        # GameScene 側へ変更を反映
+        self._apply_map_changes()
 
         # ハイライト解除 & コインを1枚減らす
         self.highlighted_wall = None
         self.coin_count -= 1
 
+    def _update_nearby_spheres(self, x: float, z: float):
+        """
+        プレイヤーの周囲STREAM_RADIUS以内にあるコインのみ球体オブジェクトを保持する
+        コインの索引を近傍検索するため、マップ全体のコイン数には依存しない
+        """
+        focus_cell = self.map.world_to_grid(x, z)
+        if focus_cell == self.sphere_focus_cell:
+            return
+        self.sphere_focus_cell = focus_cell
+        nearby = self.map.get_coins_near(x, z, self.STREAM_RADIUS)
+        self.spheres = {cell: self.spheres.get(cell) or RotatingSphere(pos, radius=30, segments=8)
+                        for cell, pos in nearby.items()}
+
+    def _apply_map_changes(self):
+        """Mapに記録された変更を描画オブジェクトへ反映する"""
+        for change in self.map.drain_changes():
+            if change.kind == MapChangeKind.COIN_REMOVED:
+                self.spheres.pop((change.col, change.row), None)
+            elif change.kind == MapChangeKind.ROWS_SHIFTED:
+                # 行番号がずれた分だけ球体のマスをずらす（捨てられた行の球体は破棄）
+                self.spheres = {(col, row - change.row): sphere for (col, row), sphere in self.spheres.items()
+                                if row >= change.row}
+                self.sphere_focus_cell = None
+        # 壁の破壊で変更のあったチャンクのみ作り直す
+        self.chunk_grid.rebuild_dirty()
+
     def draw(self):
         pyxel.cls(pyxel.COLOR_BLACK)
         
+        # 視錐台と交わるチャンクのみ描画対象にする
+        view_projection_matrix = self.camera.get_projection_matrix() @ self.camera.get_view_matrix()
+        visible_chunks = self.chunk_grid.get_visible_chunks(view_projection_matrix, pyxel.width, pyxel.height)
+        planes = self.chunk_grid.get_floor_meshes(visible_chunks)
+        walls = self.chunk_grid.get_wall_meshes(visible_chunks)
+
         # 3Dシーンの描画（床、壁+球体の順）
+        spheres = list(self.spheres.values())
         if self.show_player_cube:
-            draw_objects = [self.planes, self.walls + self.spheres + [self.player_cube]]
+            draw_objects = [planes, walls + spheres + [self.player_cube]]
         else:
-            draw_objects = [self.planes, self.walls + self.spheres]
+            draw_objects = [planes, walls + spheres]
             
         self.render_3d_scene(
             self.camera,
@@ -473,19 +538,22 @@ class GameScene(Scene):
                 pyxel.rect(pyxel.width // 2 - 1, pyxel.height // 2 - 10, 3, 20, pyxel.COLOR_WHITE)
 
     def draw_path(self):
+        points = self.path_recorder.get_points()
+        if len(points) == 0:
+            return
+        # 全点を1回の行列積で射影し、カメラの前にある点(w > 0)のみ描画する
         vp_matrix = self.camera.get_projection_matrix() @ self.camera.get_view_matrix()
-        for i in range(len(self.path_points)):
-            current = np.array(vp_matrix @ self.path_points[i]).flatten()  # flatten()を追加
-            if current[3] > 0:
-                x1 = current[0] / current[3] + pyxel.width / 2
-                y1 = current[1] / current[3] + pyxel.height / 2
-                pyxel.circ(int(x1), int(y1), 5, pyxel.COLOR_ORANGE)
-                if i > 0:
-                    prev = np.array(vp_matrix @ self.path_points[i - 1]).flatten()  # flatten()を追加
-                    if prev[3] > 0:
-                        x0 = prev[0] / prev[3] + pyxel.width / 2
-                        y0 = prev[1] / prev[3] + pyxel.height / 2
-                    pyxel.line(int(x0), int(y0), int(x1), int(y1), pyxel.COLOR_ORANGE)
+        clip = points @ np.asarray(vp_matrix).T
+        visible = clip[:, 3] > 0
+        screen = np.zeros((len(points), 2), dtype=int)
+        screen[visible] = (clip[visible, :2] / clip[visible, 3:4] + [pyxel.width / 2, pyxel.height / 2]).astype(int)
+
+        # 両端が見えている区間のみ線を引く
+        segments = visible[1:] & visible[:-1]
+        for x0, y0, x1, y1 in np.hstack([screen[:-1], screen[1:]])[segments].tolist():
+            pyxel.line(x0, y0, x1, y1, pyxel.COLOR_ORANGE)
+        for x, y in screen[visible].tolist():
+            pyxel.circ(x, y, 5, pyxel.COLOR_ORANGE)
 
 class ScoreScene(Scene):
     """スコア表示シーン（軽量版）
@@ -516,7 +584,11 @@ class ScoreScene(Scene):
 
         # リスタート処理
         if pyxel.btnp(pyxel.KEY_R):
-            return GameScene(self.global_state)
+            return GameScene.create(self.global_state)
+
+        # 同じ迷路に再挑戦
+        if pyxel.btnp(pyxel.KEY_Y):
+            return self.game_scene.retry()
         
         # タイトル画面に戻る
         if pyxel.btnp(pyxel.KEY_T):
@@ -110,6 +110,7 @@ class RotatingSphere(Sphere):
     Methods:
         __init__(): コンストラクタ。
         update(): フレームごとに回転角度を更新して頂点を再計算。
+        set_rotation_angle(): 回転角度を指定して頂点を再計算。
         _generate_vertices(): 回転を適用した頂点を生成。
     """
     def __init__(self, center_position, radius=50, segments=16, rotation_axis=np.array([0, 1, 0])):
@@ -129,6 +130,11 @@ class RotatingSphere(Sphere):
         # 頂点を更新
         self.vertices = self._generate_vertices()
 
+    def set_rotation_angle(self, angle: float):
+        """回転角度を指定して頂点を再計算（経過時間から求めた角度で描画する場合に使う）"""
+        self.rotation_angle = angle % (2 * np.pi)
+        self.vertices = self._generate_vertices()
+
     def _generate_vertices(self):
         """回転を適用した頂点を生成"""
         if self.base_vertices is None:
@@ -0,0 +1,45 @@
+from enum import IntEnum
+import numpy as np
+
+class TileType(IntEnum):
+    """
+    マップ1マスの種類を表すタイルコード。Mapのuint8グリッドに格納される値。
+
+    Values:
+        EMPTY: 通路(' ')
+        WALL: 壁('#')
+        COIN: コインのある通路('.')
+        START: スタート地点('s')
+        GOAL: ゴール地点('g')
+        STAIRS_UP: 上の階へ上る階段('u')
+        STAIRS_DOWN: 下の階へ下りる階段('d')。床が無く、下の階の階段が見える
+    """
+    EMPTY = 0
+    WALL = 1
+    COIN = 2
+    START = 3
+    GOAL = 4
+    STAIRS_UP = 5
+    STAIRS_DOWN = 6
+
+# タイルコード -> 文字 の対応表（インデックスがタイルコード）
+TILE_CHARS = ' #.sgud'
+
+# 文字 -> タイルコード のルックアップテーブル（未定義の文字は通路として扱う）
+_CHAR_TO_TILE = np.zeros(256, dtype=np.uint8)
+for _code, _char in enumerate(TILE_CHARS):
+    _CHAR_TO_TILE[ord(_char)] = _code
+
+# 通路として移動可能なタイルコード
+PASSABLE_TILES = (TileType.EMPTY, TileType.COIN, TileType.START, TileType.GOAL,
+                  TileType.STAIRS_UP, TileType.STAIRS_DOWN)
+
+def rows_to_grid(rows: list[str]) -> np.ndarray:
+    """文字列のリストで表されたマップを (rows, cols) のuint8タイルグリッドに変換"""
+    buffer = np.frombuffer(''.join(rows).encode('ascii'), dtype=np.uint8)
+    return _CHAR_TO_TILE[buffer].reshape(len(rows), len(rows[0]))
+
+def grid_to_rows(grid: np.ndarray) -> list[str]:
+    """uint8タイルグリッドを文字列のリストに変換（互換用）"""
+    chars = np.frombuffer(TILE_CHARS.encode('ascii'), dtype=np.uint8)[grid]
+    return [row.tobytes().decode('ascii') for row in chars]
@@ -3,6 +3,31 @@ from tri_sprite import TriSprite
 import numpy as np
 import pyxel
 
+# 壁の面の並び（bottom面は床に接して見えないため持たない）
+FACE_NAMES = ('front', 'back', 'top', 'right', 'left')
+
+# 各面が向いている隣接マスの(x, z)方向のオフセット（topは隣接マスを持たない）
+FACE_NEIGHBOR_OFFSETS = {
+    'front': (0, -1),
+    'back': (0, 1),
+    'right': (1, 0),
+    'left': (-1, 0),
+}
+
+# 1つのCube(8頂点)に対する各面の三角形（FACE_NAMESの順に2枚ずつ）
+_CUBE_FACE_TEMPLATE = np.array([
+    [0, 1, 2], [3, 2, 1],  # front
+    [4, 6, 5], [7, 5, 6],  # back
+    [0, 4, 1], [5, 1, 4],  # top
+    [1, 5, 3], [3, 5, 7],  # right
+    [0, 2, 4], [2, 6, 4],  # left
+])
+
+# 1つのCubeの頂点オフセット（z, y, x の順にループした並び）
+_CUBE_VERTEX_OFFSETS = np.array([
+    [x, y, z] for z in [-1, 1] for y in [-1, 1] for x in [-1, 1]
+], dtype=float)
+
 class Wall(DrawObject):
     """
     3D迷路の壁を表現するクラス。
@@ -10,92 +35,66 @@ class Wall(DrawObject):
         positions (list[list[float]]): 壁の位置座標のリスト。
         size (float): 壁の一辺の長さ。
         half_size (float): サイズの半分（計算用）。
+        hidden_faces (np.ndarray): (壁の数, 5) の真偽値配列。FACE_NAMESの順に、描画しない面をTrueとする。
     Methods:
         __init__(): コンストラクタ。壁のパラメータ設定。
-        _generate_vertices(): 頂点の生成。隣接する壁の判定も行う。
-        _generate_faces(): 面と色の生成。
-        _is_adjacent(): 他の壁との隣接判定。
+        _generate_vertices(): 頂点の生成。
+        _compute_hidden_faces(): 位置のハッシュ索引から隣接する壁と接する面を求める。
+        _generate_faces(): 面と色の生成。隠れる面は除外する。
     """
-    def __init__(self, positions: list[list[float]], size: float):
+    def __init__(self, positions: list[list[float]], size: float, hidden_faces: np.ndarray = None):
         self.positions = positions
         self.size = size
         self.half_size = size / 2
+        # 隠れる面が与えられない場合は、壁同士の隣接のみから求める
+        self.hidden_faces = hidden_faces if hidden_faces is not None else self._compute_hidden_faces()
         super().__init__(positions[0])  # 最初の位置を中心として初期化
 
     def _generate_vertices(self):
-        vertices = []
-        for pos in self.positions:
-            # 各位置に対して8つの頂点を生成
-            for z in [-1, 1]:
-                for y in [-1, 1]:
-                    for x in [-1, 1]:
-                        vertex = np.array([
-                            pos[0] + x * self.half_size,
-                            pos[1] + y * self.half_size,
-                            pos[2] + z * self.half_size,
-                            1
-                        ])
-                        vertices.append(vertex)
+        # 各位置に対して8つの頂点を生成
+        positions = np.asarray(self.positions, dtype=float).reshape(-1, 3)
+        corners = positions[:, None, :] + _CUBE_VERTEX_OFFSETS[None, :, :] * self.half_size
+        vertices = np.ones((len(positions) * 8, 4))
+        vertices[:, :3] = corners.reshape(-1, 3)
         return vertices
 
-    def _generate_faces(self):
-        faces = []
-        colors = []
-        cubes_count = len(self.positions)
-        
-        for i in range(cubes_count):
-            base_idx = i * 8  # 各Cubeは8頂点を持つ
-            
-            # 各面の定義（bottom面を除外）
-            cube_faces = {
-                'front':  [[base_idx + 0, base_idx + 1, base_idx + 2],
-                          [base_idx + 3, base_idx + 2, base_idx + 1]],
-                'back':   [[base_idx + 4, base_idx + 6, base_idx + 5],
-                          [base_idx + 7, base_idx + 5, base_idx + 6]],
-                'top':    [[base_idx + 0, base_idx + 4, base_idx + 1],
-                          [base_idx + 5, base_idx + 1, base_idx + 4]],
-                'right':  [[base_idx + 1, base_idx + 5, base_idx + 3],
-                          [base_idx + 3, base_idx + 5, base_idx + 7]],
-                'left':   [[base_idx + 0, base_idx + 2, base_idx + 4],
-                          [base_idx + 2, base_idx + 6, base_idx + 4]]
-            }
-            
-            # 各面の色（bottom面を除外）
-            face_colors = {
-                'front':  [pyxel.COLOR_RED] * 2,
-                'back':   [pyxel.COLOR_GREEN] * 2,
-                'top':    [pyxel.COLOR_DARK_BLUE] * 2,
-                'right':  [pyxel.COLOR_CYAN] * 2,
-                'left':   [pyxel.COLOR_YELLOW] * 2
-            }
-
-            # 隣接する面のチェック
-            for j in range(cubes_count):
-                if i != j:
-                    if self._is_adjacent(self.positions[i], self.positions[j]):
-                        if self.positions[i][0] == self.positions[j][0]:
-                            # Z軸方向で隣接
-                            if self.positions[i][2] < self.positions[j][2]:
-                                cube_faces['back'] = []
-                            else:
-                                cube_faces['front'] = []
-                        elif self.positions[i][2] == self.positions[j][2]:
-                            # X軸方向で隣接
-                            if self.positions[i][0] < self.positions[j][0]:
-                                cube_faces['right'] = []
-                            else:
-                                cube_faces['left'] = []
+    def _compute_hidden_faces(self) -> np.ndarray:
+        """
+        壁の位置を格子上の整数座標に変換したハッシュ索引を作り、
+        各面の向きに隣接する壁があればその面を隠れる面とする
+        """
+        positions = np.asarray(self.positions, dtype=float).reshape(-1, 3)
+        hidden = np.zeros((len(positions), len(FACE_NAMES)), dtype=bool)
+        if len(positions) == 0:
+            return hidden
+        # 最初の壁を基準にした格子座標（浮動小数の誤差を丸める）
+        keys = np.rint((positions[:, [0, 2]] - positions[0, [0, 2]]) / self.size).astype(int).tolist()
+        occupied = set(map(tuple, keys))
+        for face_index, face_name in enumerate(FACE_NAMES):
+            if face_name not in FACE_NEIGHBOR_OFFSETS:
+                continue
+            dx, dz = FACE_NEIGHBOR_OFFSETS[face_name]
+            hidden[:, face_index] = [(kx + dx, kz + dz) in occupied for kx, kz in keys]
+        return hidden
 
-            # 残った面を追加
-            for face_type in cube_faces:
-                faces.extend(cube_faces[face_type])
-                colors.extend(face_colors[face_type][:len(cube_faces[face_type])])
+    def _generate_faces(self):
+        face_colors = np.array([
+            pyxel.COLOR_RED,        # front
+            pyxel.COLOR_GREEN,      # back
+            pyxel.COLOR_DARK_BLUE,  # top
+            pyxel.COLOR_CYAN,       # right
+            pyxel.COLOR_YELLOW,     # left
+        ])
+        cubes_count = len(self.hidden_faces)
 
-        return faces, colors
+        # 各Cubeは8頂点を持つので、テンプレートをずらして全Cubeの面を作る
+        base_idx = np.arange(cubes_count)[:, None, None] * 8
+        all_faces = base_idx + _CUBE_FACE_TEMPLATE[None, :, :]
+        all_colors = np.broadcast_to(np.repeat(face_colors, 2), (cubes_count, len(_CUBE_FACE_TEMPLATE)))
 
-    def _is_adjacent(self, pos1, pos2):
-        return (abs(pos1[0] - pos2[0]) == self.size and pos1[2] == pos2[2]) or \
-               (abs(pos1[2] - pos2[2]) == self.size and pos1[0] == pos2[0])
+        # 隠れる面（1面につき三角形2枚）を除外
+        visible = np.repeat(~self.hidden_faces, 2, axis=1)
+        return all_faces[visible].tolist(), all_colors[visible].tolist()
 
 class HighlightedWall(Wall):
     """
@@ -106,6 +105,7 @@ class HighlightedWall(Wall):
     
     Methods:
         __init__(): コンストラクタ。エッジ付き壁の初期化。
+        move_to(): 作り直さずにハイライトする位置を変更する。
         get_tri_sprites(): エッジ描画用の三角形スプライト生成。
     """
     def __init__(self, position, tile_size):
@@ -113,6 +113,13 @@ class HighlightedWall(Wall):
         self.position = position
         self.edge_width = 3  # エッジの太さを設定
 
+    def move_to(self, position):
+        """ハイライトする位置を変更する（頂点のみ作り直す）"""
+        self.position = position
+        self.positions = [position]
+        self.center = np.array([*position, 1])
+        self.vertices = self._generate_vertices()
+
     def _generate_faces(self):
         # 面は表示しないので空を返す
         return [], []